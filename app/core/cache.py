@@ -0,0 +1,251 @@
+import asyncio
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+class _LeaderCancelled(Exception):
+    """Set on a coalesced computation whose caller was cancelled, so a waiting caller takes it over."""
+
+
+class SqliteStore:
+    """
+    A small on-disk key/value store backed by SQLite. Values are stored as JSON
+    together with the time they were written; the oldest rows are evicted once
+    the table grows past `max_entries`.
+    """
+
+    def __init__(self, path: str, max_entries: int = 10000):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_stored_at ON cache (stored_at)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Returns (value, stored_at) or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT value, stored_at FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key: str, value: Any, stored_at: Optional[float] = None) -> int:
+        """Stores a value and returns how many old rows were evicted to make room."""
+        stored_at = time.time() if stored_at is None else stored_at
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, stored_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), stored_at),
+            )
+            evicted = self._conn.execute(
+                "DELETE FROM cache WHERE key IN ("
+                "  SELECT key FROM cache ORDER BY stored_at DESC LIMIT -1 OFFSET ?"
+                ")",
+                (self.max_entries,),
+            ).rowcount
+            self._conn.commit()
+        return evicted
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class TieredCache:
+    """
+    An in-process LRU in front of an optional SqliteStore, with a TTL on both tiers.
+
+    `get_or_compute()` coalesces concurrent misses for the same key, so only
+    one upstream call is made no matter how many requests are waiting on it.
+    Callers always receive their own copy of the cached value.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 7 * 24 * 3600,
+        disk_path: Optional[str] = None,
+        max_disk_entries: int = 10000,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._memory: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._disk = SqliteStore(disk_path, max_disk_entries) if disk_path else None
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "evictions": 0,
+            "expired": 0,
+        }
+
+    def _is_fresh(self, stored_at: float) -> bool:
+        return time.time() - stored_at < self.ttl_seconds
+
+    def _remember(self, key: str, value: Any, stored_at: float) -> None:
+        self._memory[key] = (value, stored_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _get_memory(self, key: str) -> Optional[Any]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        value, stored_at = entry
+        if not self._is_fresh(stored_at):
+            del self._memory[key]
+            self._stats["expired"] += 1
+            return None
+        self._memory.move_to_end(key)
+        self._stats["memory_hits"] += 1
+        return value
+
+    def _accept_disk_entry(self, key: str, entry: Optional[Tuple[Any, float]]) -> Optional[Any]:
+        """
+        Promotes a fresh disk entry into memory. Expired rows are left for the
+        next set() to replace or eviction to drop, so no disk write happens here
+        (this runs on the event loop).
+        """
+        if entry is None:
+            return None
+        value, stored_at = entry
+        if not self._is_fresh(stored_at):
+            self._stats["expired"] += 1
+            return None
+        self._stats["disk_hits"] += 1
+        self._remember(key, value, stored_at)
+        return value
+
+    def get(self, key: str) -> Optional[Any]:
+        """Looks the key up in memory, then on disk. Does not count a miss."""
+        value = self._get_memory(key)
+        if value is None and self._disk is not None:
+            value = self._accept_disk_entry(key, self._disk.get(key))
+        return copy.deepcopy(value)
+
+    def set(self, key: str, value: Any) -> None:
+        stored_at = time.time()
+        self._remember(key, value, stored_at)
+        if self._disk is not None:
+            self._stats["evictions"] += self._disk.set(key, value, stored_at)
+
+    async def get_async(self, key: str) -> Optional[Any]:
+        """get() for the event loop: only the SQLite read runs in a thread."""
+        value = self._get_memory(key)
+        if value is None and self._disk is not None:
+            value = self._accept_disk_entry(key, await asyncio.to_thread(self._disk.get, key))
+        return copy.deepcopy(value)
+
+    async def set_async(self, key: str, value: Any) -> None:
+        """set() for the event loop: only the SQLite write runs in a thread."""
+        stored_at = time.time()
+        self._remember(key, value, stored_at)
+        if self._disk is not None:
+            self._stats["evictions"] += await asyncio.to_thread(self._disk.set, key, value, stored_at)
+
+    def clear_memory(self) -> None:
+        """Empties the in-memory LRU only; the disk keeps its rows."""
+        self._memory.clear()
+
+    async def invalidate(self, key: Optional[str] = None) -> None:
+        """Drops one key, or everything when no key is given. The SQLite delete runs in a thread."""
+        if key is None:
+            self._memory.clear()
+            if self._disk is not None:
+                await asyncio.to_thread(self._disk.clear)
+        else:
+            self._memory.pop(key, None)
+            if self._disk is not None:
+                await asyncio.to_thread(self._disk.delete, key)
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        should_cache: Callable[[Any], bool] = lambda value: True,
+    ) -> Any:
+        """
+        Returns the cached value for `key`, or awaits `compute()` to produce it.
+        Results rejected by `should_cache` (e.g. error responses) are returned
+        but not stored. Concurrent calls for the same key share one `compute()`;
+        if the caller running it is cancelled, one of the others runs its own.
+        """
+        value = self._get_memory(key)
+        if value is None and self._disk is not None:
+            # Only the SQLite read happens off the event loop; the LRU is not thread-safe
+            value = self._accept_disk_entry(key, await asyncio.to_thread(self._disk.get, key))
+        if value is not None:
+            return copy.deepcopy(value)
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self._stats["coalesced"] += 1
+            try:
+                return copy.deepcopy(await asyncio.shield(in_flight))
+            except _LeaderCancelled:
+                # The leader is gone (and no longer in _in_flight); the first waiter to get here computes
+                return await self.get_or_compute(key, compute, should_cache)
+
+        self._stats["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            # Cancelling the shared future would cancel every coalesced waiter along with this caller
+            future.set_exception(_LeaderCancelled())
+            future.exception()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved in case nobody else was waiting
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+        finally:
+            del self._in_flight[key]
+
+        if should_cache(value):
+            stored_at = time.time()
+            self._remember(key, value, stored_at)
+            if self._disk is not None:
+                self._stats["evictions"] += await asyncio.to_thread(self._disk.set, key, value, stored_at)
+        return copy.deepcopy(value)
+
+    def stats(self) -> Dict[str, int]:
+        stats = dict(self._stats)
+        stats["hits"] = stats["memory_hits"] + stats["disk_hits"]
+        stats["memory_entries"] = len(self._memory)
+        return stats
+
+    def close(self) -> None:
+        if self._disk is not None:
+            self._disk.close()
@@ -5,10 +5,188 @@ class Settings(BaseSettings):
     GOOGLE_API_KEY: str
     MAL_CLIENT_ID: str
 
+    # Inference backend: "eager", "torchscript", "onnxruntime" or "quantized".
+    # The non-eager artifacts are produced by export_model.py.
+    MODEL_BACKEND: str = "eager"
+    CLASS_NAMES_PATH: str = "class_names.json"
+    MODEL_WEIGHTS_PATH: str = "anime_character_model.pth"
+    TORCHSCRIPT_MODEL_PATH: str = "anime_character_model.torchscript.pt"
+    ONNX_MODEL_PATH: str = "anime_character_model.onnx"
+    QUANTIZED_MODEL_PATH: str = "anime_character_model.int8.pt"
+    CHANNELS_LAST: bool = True  # NHWC memory format for the eager and TorchScript backends
+    # Eager backend only: memory-map SHARED_WEIGHTS_PATH (written by
+    # export_model.py) instead of copying the weights into every worker.
+    # Workers then share one read-only copy through the page cache.
+    SHARED_WEIGHTS: bool = False
+    SHARED_WEIGHTS_PATH: str = "anime_character_model.shared.pt"
+
+    # Versioned model bundle (build_model_bundle.py): weights, class names and
+    # preprocessing in one checksummed file, replacing MODEL_WEIGHTS_PATH and
+    # CLASS_NAMES_PATH (eager backend only). The file is checked every
+    # MODEL_BUNDLE_RELOAD_SECONDS (0 disables) and a new bundle is loaded,
+    # warmed up and swapped in without a restart. Requests that started on the
+    # old model get MODEL_SWAP_DRAIN_SECONDS to finish on it before it is freed.
+    MODEL_BUNDLE_PATH: str = ""
+    MODEL_BUNDLE_RELOAD_SECONDS: float = 10.0
+    MODEL_SWAP_DRAIN_SECONDS: float = 30.0
+
+    # Two-stage cascade. Every image first goes through a small student model
+    # distilled from the full one (train.py --distill); only images whose
+    # student top-1 probability is below CASCADE_ESCALATE_BELOW are also run
+    # through MODEL_BACKEND. Has no effect when embeddings are needed
+    # (SIMILARITY_MODE=embedding or RECOGNITION_MODE=gallery).
+    CASCADE_ENABLED: bool = False
+    STUDENT_MODEL_NAME: str = "mobilenetv3_small_100"
+    STUDENT_WEIGHTS_PATH: str = "anime_character_student.pth"
+    CASCADE_ESCALATE_BELOW: float = 0.8
+
+    # Load the model in the background after the server starts accepting
+    # connections; /readyz reports when it is warmed up. When False, startup
+    # blocks until the model is ready.
+    BACKGROUND_MODEL_LOADING: bool = True
+
+    # Dynamic micro-batching for the model forward pass.
+    # Requests arriving within INFERENCE_MAX_WAIT_MS of each other are run as one batch.
+    INFERENCE_MAX_BATCH_SIZE: int = 16
+    INFERENCE_MAX_WAIT_MS: float = 5.0
+
+    # Executor stage for image decode, preprocessing and inference.
+    # 0 means "one per CPU core" for the pool and "torch default" for threads.
+    CPU_POOL_WORKERS: int = 0
+    INFERENCE_WORKERS: int = 1  # Batches that may run through the model concurrently
+    TORCH_NUM_THREADS: int = 0  # Intra-op threads; keep INFERENCE_WORKERS * this <= cores
+    # Server processes on this node (uvicorn --workers and gunicorn read it
+    # too). With TORCH_NUM_THREADS=0 every process gets an equal share of the
+    # cores instead of each starting a thread per core.
+    WEB_CONCURRENCY: int = 1
+    MAX_PENDING_REQUESTS: int = 64  # Requests allowed in the CPU stage before returning 429
+    # Upper bound on images per /recognize/batch request (zip archives included)
+    BATCH_MAX_IMAGES: int = 64
+
+    # /recognize/animation (animated GIF/WebP). Frames are read one at a time;
+    # a frame whose 16x16 grayscale thumbnail differs from the last sampled
+    # frame by less than ANIMATION_FRAME_DIFF (mean absolute difference, 0-255)
+    # is skipped and its display time credited to that frame. At most
+    # ANIMATION_MAX_FRAMES frames are read and ANIMATION_MAX_SAMPLED_FRAMES
+    # go through the model, ANIMATION_BATCH_SIZE per forward pass.
+    ANIMATION_FRAME_DIFF: float = 6.0
+    ANIMATION_MAX_FRAMES: int = 600
+    ANIMATION_MAX_SAMPLED_FRAMES: int = 48
+    ANIMATION_BATCH_SIZE: int = 16
+
+    # Upload limits, all answered with 413. Request bodies over
+    # MAX_REQUEST_BYTES are refused before they are read; single images over
+    # MAX_UPLOAD_BYTES, or whose header declares more than MAX_IMAGE_PIXELS,
+    # are refused before they are decoded. A zip archive in a batch may inflate
+    # to at most MAX_ZIP_INFLATED_BYTES in total (zip bombs).
+    MAX_REQUEST_BYTES: int = 100 * 1024 * 1024
+    MAX_UPLOAD_BYTES: int = 15 * 1024 * 1024
+    MAX_ZIP_INFLATED_BYTES: int = 200 * 1024 * 1024
+    MAX_IMAGE_PIXELS: int = 40_000_000
+
+    # Character image lookups. IMAGE_PROVIDERS (comma-separated: jikan, mal) are
+    # tried in order; each next provider starts as soon as the previous one
+    # misses or fails, or after IMAGE_HEDGE_AFTER_MS while it is still waiting
+    # (0 waits for the answer). "mal,jikan" asks MAL first and falls back to Jikan.
+    IMAGE_PROVIDERS: str = "jikan"
+    IMAGE_HEDGE_AFTER_MS: float = 300.0
+    IMAGE_LOOKUP_TIMEOUT_SECONDS: float = 5.0  # Whole lookup, fallbacks and rate limiting included
+
+    # Shared name -> image URL cache. Misses every provider agreed on are
+    # remembered for IMAGE_URL_NEGATIVE_TTL_SECONDS. Set IMAGE_URL_CACHE_PATH
+    # to an empty string to keep the cache in memory only.
+    IMAGE_URL_CACHE_MAX_ENTRIES: int = 4096
+    IMAGE_URL_CACHE_TTL_SECONDS: float = 7 * 24 * 3600
+    IMAGE_URL_NEGATIVE_TTL_SECONDS: float = 3600.0
+    IMAGE_URL_CACHE_PATH: str = "cache/image_urls.sqlite3"
+    IMAGE_URL_CACHE_MAX_DISK_ENTRIES: int = 50000
+
+    # Jikan API client
+    JIKAN_API_BASE_URL: str = "https://api.jikan.moe/v4"
+    JIKAN_RATE_LIMIT_PER_SECOND: float = 3.0
+    JIKAN_RATE_LIMIT_BURST: float = 3.0
+    JIKAN_TIMEOUT_SECONDS: float = 5.0  # Per HTTP request
+
+    # Official MyAnimeList API client (authenticated with MAL_CLIENT_ID)
+    MAL_API_BASE_URL: str = "https://api.myanimelist.net/v2"
+    MAL_TIMEOUT_SECONDS: float = 5.0  # Per HTTP request
+
+    GEMINI_TIMEOUT_SECONDS: float = 10.0  # Per generate_content call (the SDK's own retries are off)
+    # Threads for the blocking Gemini SDK calls, kept apart from asyncio's default
+    # executor (SQLite caches, tag similarity) so a stuck upstream cannot starve it
+    GEMINI_MAX_WORKERS: int = 8
+
+    # Gemini API host override, e.g. a local stand-in for load tests ("http://127.0.0.1:8001").
+    # When set, the client uses the REST transport.
+    GEMINI_API_ENDPOINT: str = ""
+
+    # Cache for Gemini character details (in-process LRU in front of SQLite).
+    # Set GEMINI_CACHE_PATH to an empty string to keep the cache in memory only.
+    GEMINI_CACHE_MAX_ENTRIES: int = 1024
+    GEMINI_CACHE_TTL_SECONDS: float = 7 * 24 * 3600
+    GEMINI_CACHE_PATH: str = "cache/gemini_details.sqlite3"
+    GEMINI_CACHE_MAX_DISK_ENTRIES: int = 10000
+
+    # Resilience against slow or failing upstreams. Gemini, Jikan and MAL each
+    # have a circuit breaker that refuses calls for BREAKER_RESET_SECONDS once
+    # BREAKER_FAILURE_THRESHOLD calls in a row have failed (0 disables them).
+    # REQUEST_DEADLINE_SECONDS bounds the upstream work of one request: every
+    # timeout is shortened to what is left of it (0 disables). With
+    # DEGRADED_RESPONSES, a request whose Gemini call fails still gets its
+    # prediction, with basic details from the character database and
+    # "degraded": true, instead of a 502.
+    BREAKER_FAILURE_THRESHOLD: int = 5
+    BREAKER_RESET_SECONDS: float = 30.0
+    REQUEST_DEADLINE_SECONDS: float = 15.0
+    DEGRADED_RESPONSES: bool = True
+
+    # Cache of whole /recognize results, keyed by a hash of the uploaded bytes
+    # and the model fingerprint. With RESULT_CACHE_PERCEPTUAL, re-encoded or
+    # slightly resized copies of a cached image also hit when their perceptual
+    # hashes differ by at most RESULT_CACHE_MAX_HAMMING_DISTANCE of 64 bits.
+    # Set RESULT_CACHE_PATH to an empty string to keep the cache in memory only.
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_MAX_ENTRIES: int = 2048
+    RESULT_CACHE_TTL_SECONDS: float = 24 * 3600
+    RESULT_CACHE_PATH: str = "cache/recognition_results.sqlite3"
+    RESULT_CACHE_MAX_DISK_ENTRIES: int = 50000
+    RESULT_CACHE_PERCEPTUAL: bool = True
+    RESULT_CACHE_MAX_HAMMING_DISTANCE: int = 4
+
+    # How uploads are named. "classifier" uses the trained classification head
+    # and class_names.json. "gallery" takes the nearest character among the
+    # reference embeddings in GALLERY_PATH (managed with manage_gallery.py), so
+    # characters can be added or removed without retraining; the file is
+    # re-read whenever it changes. Gallery mode needs the eager backend.
+    RECOGNITION_MODE: str = "classifier"
+    GALLERY_PATH: str = "gallery.npz"
+    GALLERY_MATCH: str = "centroid"  # "centroid" (mean embedding per character) or "knn" (vote of the nearest images)
+    GALLERY_KNN_K: int = 5
+    # Cosine distance above which a gallery match is unidentified; replaces the classifier's confidence threshold
+    GALLERY_MAX_DISTANCE: float = 0.35
+    GALLERY_RELOAD_SECONDS: float = 5  # How often GALLERY_PATH is checked for changes
+
+    # How similar characters are found. "tags" ranks the character database by
+    # Jaccard overlap of Gemini's tags. "embedding" searches EMBEDDING_INDEX_PATH
+    # (built by build_embedding_index.py) with the uploaded image's
+    # penultimate-layer features, so no external call is needed; it requires
+    # the eager backend and falls back to "tags" without one or the index.
+    SIMILARITY_MODE: str = "tags"
+    EMBEDDING_INDEX_PATH: str = "embedding_index.npz"
+    EMBEDDING_IVF_NPROBE: int = 8  # Inverted lists scanned per query, for indexes built with --ivf-lists
+
+    # Artifact written by precompute_enrichment.py. Empty string disables it.
+    PRECOMPUTED_ENRICHMENT_PATH: str = "precomputed_enrichment.bin"
+
+    # Logging and tracing
+    LOG_LEVEL: str = "INFO"
+    LOG_JSON: bool = False  # One JSON object per log line, for log pipelines
+    TRACING_ENABLED: bool = True  # Per-stage timing spans, exported from /metrics
+    TRACE_SAMPLE_RATE: float = 0.0  # Fraction of spans also written to the log
+
     class Config:
         env_file = ".env"
 
 # Create an instance of the settings
 settings = Settings()
 
-print("MAL_ID: ", settings.MAL_CLIENT_ID)
\ No newline at end of file
@@ -0,0 +1,84 @@
+import asyncio
+import contextlib
+import os
+from concurrent.futures import Executor, ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+
+class PoolSaturatedError(Exception):
+    """Raised when the CPU stage already has as many requests as it may queue."""
+
+
+class EngineStoppedError(RuntimeError):
+    """Raised for a prediction asked of an inference engine that has been stopped (e.g. swapped out)."""
+
+
+class CpuWorkerPool:
+    """
+    A dedicated thread pool for CPU-bound work (image decode, preprocessing and
+    the model forward pass), so none of it runs on the asyncio event loop.
+
+    `admit()` bounds how many requests may be inside the CPU stage at once;
+    past that limit new requests are rejected instead of queueing forever.
+    """
+
+    def __init__(self, max_workers: int = 0, max_pending: int = 64):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self._in_flight = 0
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="cpu-worker")
+
+    @property
+    def executor(self) -> Executor:
+        return self._executor
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @contextlib.contextmanager
+    def admit(self) -> Iterator[None]:
+        """Reserves a slot for one request, or raises PoolSaturatedError."""
+        if self._in_flight >= self.max_pending:
+            raise PoolSaturatedError(f"{self._in_flight} requests already pending.")
+        self._in_flight += 1
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+
+    async def run(self, fn: Callable[..., T], *args) -> T:
+        """Runs `fn(*args)` on the pool and awaits the result."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(fn, *args))
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def available_cores() -> int:
+    """The cores this process may run on (its CPU affinity, e.g. a container's cpuset)."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def configure_torch_threads(num_threads: int, processes: int = 1, inference_workers: int = 1) -> int:
+    """
+    Bounds torch's intra-op thread pool. With several inference workers each
+    running a forward pass, the total should not exceed the number of cores.
+    `num_threads=0` gives each of `processes` server processes, and each of
+    their `inference_workers`, an equal share of the cores; with a single
+    process and inference worker it leaves torch's default. Returns the
+    thread count now in use.
+    """
+    import torch  # Imported here so importing this module stays cheap
+
+    if num_threads <= 0 and processes * inference_workers > 1:
+        num_threads = max(1, available_cores() // (processes * inference_workers))
+    if num_threads > 0:
+        torch.set_num_threads(num_threads)
+    return torch.get_num_threads()
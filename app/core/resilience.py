@@ -0,0 +1,143 @@
+import contextlib
+import contextvars
+import threading
+import time
+from typing import Dict, Optional
+
+from .telemetry import registry
+
+upstream_timeouts = registry.counter(
+    "recognizer_upstream_timeouts_total",
+    "Upstream calls abandoned because their timeout or the request deadline ran out.",
+    labelnames=["upstream"],
+)
+breaker_rejections = registry.counter(
+    "recognizer_circuit_breaker_rejections_total",
+    "Upstream calls failed fast because the upstream's circuit breaker was open.",
+    labelnames=["upstream"],
+)
+breaker_transitions = registry.counter(
+    "recognizer_circuit_breaker_transitions_total",
+    "Circuit breaker state changes, by the state entered.",
+    labelnames=["upstream", "state"],
+)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Stops calling an upstream after `failure_threshold` consecutive failures.
+
+    While open, calls are refused straight away. After `reset_seconds` one
+    trial call is let through (half-open): success closes the breaker, failure
+    opens it again for another `reset_seconds`. Thread-safe, since Gemini
+    calls finish on worker threads.
+    """
+
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+    # Exported as recognizer_circuit_breaker_state
+    STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        breakers[name] = self
+
+    def _enter(self, state: str) -> None:
+        if state != self.state:
+            self.state = state
+            breaker_transitions.inc(upstream=self.name, state=state)
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now. Every allowed call must be followed by record()."""
+        if self.failure_threshold <= 0:
+            return True
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self._enter(self.HALF_OPEN)
+                self._trial_in_flight = False
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+        breaker_rejections.inc(upstream=self.name)
+        return False
+
+    def check(self) -> None:
+        """allow(), raising CircuitOpenError when the call may not go ahead."""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} is unavailable (circuit breaker open).")
+
+    def release(self) -> None:
+        """Ends an allowed call that finished without an outcome (it was cancelled)."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record(self, success: bool) -> None:
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            self._trial_in_flight = False
+            if success:
+                self._failures = 0
+                self._enter(self.CLOSED)
+                return
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._enter(self.OPEN)
+
+
+# Every breaker by upstream name, for the state gauge
+breakers: Dict[str, CircuitBreaker] = {}
+
+registry.callback(
+    "recognizer_circuit_breaker_state",
+    "Circuit breaker state per upstream: 0 closed, 1 half-open, 2 open.",
+    lambda: {(name,): CircuitBreaker.STATE_VALUES[breaker.state] for name, breaker in list(breakers.items())},
+    labelnames=["upstream"],
+)
+
+
+# --------------------------------------------------------------------------
+# Request deadlines
+# --------------------------------------------------------------------------
+# The time.monotonic() by which the current request must be answered. Context
+# variables are copied into tasks and asyncio.to_thread() calls, so every
+# upstream call made on behalf of a request sees that request's deadline.
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("deadline", default=None)
+
+
+@contextlib.contextmanager
+def deadline_scope(seconds: float):
+    """Gives the enclosed work `seconds` to finish (0 = no deadline). Nested scopes keep the earlier deadline."""
+    if seconds <= 0:
+        yield
+        return
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    _deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        # set() rather than reset(token): an abandoned streaming generator is
+        # closed from another task, where the token would not be valid
+        _deadline.set(current)
+
+
+def time_left(timeout: float) -> float:
+    """`timeout`, shortened to what is left of the current request's deadline (never negative)."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return timeout
+    return max(0.0, min(timeout, deadline - time.monotonic()))
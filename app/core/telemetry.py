@@ -0,0 +1,286 @@
+import bisect
+import contextlib
+import json
+import logging
+import random
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(labelnames: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Counter:
+    """A monotonically increasing value, optionally split by labels."""
+    metric_type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(labels.get(name, "") for name in self.labelnames), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Histogram:
+    """Observations bucketed by upper bound, in the Prometheus cumulative format."""
+    metric_type = "histogram"
+    DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [bucket counts..., +Inf count], sum
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    def render(self) -> List[str]:
+        lines = []
+        with self._lock:
+            items = [(key, list(counts), total[0]) for key, (counts, total) in self._values.items()]
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class CallbackMetric:
+    """
+    A metric whose value is read from `fn` at scrape time, for state that
+    already lives elsewhere (cache stats, pool occupancy, ...). `fn` returns a
+    number, or a {label values tuple: number} dict when labelnames are given.
+    """
+
+    def __init__(self, name: str, help: str, fn: Callable[[], Union[float, Dict[LabelValues, float]]],
+                 metric_type: str = "gauge", labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.metric_type = metric_type
+        self.labelnames = tuple(labelnames)
+
+    def render(self) -> List[str]:
+        value = self.fn()
+        if not isinstance(value, dict):
+            value = {(): value}
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in value.items()]
+
+
+class MetricsRegistry:
+    """Holds every metric exported by the /metrics endpoint."""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def _register(self, metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = Histogram.DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def callback(self, name: str, help: str, fn, metric_type: str = "gauge",
+                 labelnames: Sequence[str] = ()) -> CallbackMetric:
+        # Callbacks are replaced rather than reused, so a reloaded component can re-register
+        metric = CallbackMetric(name, help, fn, metric_type, labelnames)
+        self._metrics[name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Renders every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in list(self._metrics.values()):
+            try:
+                samples = metric.render()
+            except Exception:
+                logger.exception("Failed to collect metric %s", metric.name)
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+stage_duration = registry.histogram(
+    "recognizer_stage_duration_seconds", "Time spent in each pipeline stage.", ["stage"]
+)
+stage_errors = registry.counter(
+    "recognizer_stage_errors_total", "Pipeline stages that ended with an exception.", ["stage"]
+)
+
+
+# --------------------------------------------------------------------------
+# Timing spans
+# --------------------------------------------------------------------------
+_tracing_enabled = True
+_trace_sample_rate = 0.0
+_NOOP_SPAN = contextlib.nullcontext()
+
+
+class _Span:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        stage_duration.observe(elapsed, stage=self.stage)
+        if exc_type is not None:
+            stage_errors.inc(stage=self.stage)
+        if _trace_sample_rate and random.random() < _trace_sample_rate:
+            logger.info("span finished", extra={"stage": self.stage, "duration_ms": round(elapsed * 1000, 3)})
+        return False
+
+
+def span(stage: str):
+    """
+    Times a pipeline stage and records it in recognizer_stage_duration_seconds.
+
+    Works around both sync and async code (`with span("gemini"): await ...`).
+    When tracing is disabled this returns a shared no-op context manager, so
+    the call costs nothing beyond the function call itself.
+    """
+    if not _tracing_enabled:
+        return _NOOP_SPAN
+    return _Span(stage)
+
+
+def configure_tracing(enabled: bool, sample_rate: float = 0.0) -> None:
+    """Turns spans on or off; `sample_rate` is the fraction of spans also written to the log."""
+    global _tracing_enabled, _trace_sample_rate
+    _tracing_enabled = enabled
+    _trace_sample_rate = min(max(sample_rate, 0.0), 1.0)
+
+
+# --------------------------------------------------------------------------
+# Process memory
+# --------------------------------------------------------------------------
+# smaps_rollup fields summed into each reported kind
+_MEMORY_FIELDS = {
+    "rss": ("Rss",),
+    "pss": ("Pss",),
+    "shared": ("Shared_Clean", "Shared_Dirty"),
+    "private": ("Private_Clean", "Private_Dirty"),
+}
+
+
+def process_memory(pid: Union[int, str] = "self") -> Dict[str, int]:
+    """
+    Memory of a process in bytes: resident (rss), its proportional share of
+    pages mapped by several processes (pss), and the shared and private parts
+    of rss. Read from /proc, so Linux only; elsewhere returns {}.
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return {}
+    fields = {}
+    for line in lines:
+        name, _, value = line.partition(":")
+        if value.strip().endswith("kB"):
+            fields[name] = int(value.split()[0]) * 1024
+    return {kind: sum(fields.get(name, 0) for name in names) for kind, names in _MEMORY_FIELDS.items()}
+
+
+# --------------------------------------------------------------------------
+# Logging
+# --------------------------------------------------------------------------
+_STANDARD_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including any `extra={...}` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_RECORD_FIELDS:
+                payload[key] = value
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+def configure_logging(level: str = "INFO", json_format: bool = False,
+                      logger_names: Iterable[str] = ("app",)) -> None:
+    """Sets up level-gated logging for the application's loggers."""
+    handler = logging.StreamHandler()
+    if json_format:
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    for name in logger_names:
+        app_logger = logging.getLogger(name)
+        app_logger.handlers = [handler]
+        app_logger.setLevel(level.upper())
+        app_logger.propagate = False
@@ -0,0 +1,62 @@
+import json
+
+
+class RequestTooLargeError(Exception):
+    """Raised from receive() once the body has crossed the limit."""
+
+
+class BodySizeLimitMiddleware:
+    """
+    Rejects request bodies larger than `max_bytes` with a 413 before they are
+    buffered: up front when Content-Length is declared, otherwise as soon as
+    the streamed body crosses the limit.
+    """
+
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.max_bytes:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_bytes:
+            await self._reject(send)
+            return
+
+        received = 0
+        rejected = False
+
+        async def limited_receive():
+            nonlocal received, rejected
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes and not rejected:
+                    rejected = True
+                    await self._reject(send)
+                    raise RequestTooLargeError()
+            return message
+
+        async def guarded_send(message):
+            # Once the 413 has gone out, whatever the app answers is dropped
+            if not rejected:
+                await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            # The app may re-raise (or wrap) the error; the client already has its 413
+            if not rejected:
+                raise
+
+    async def _reject(self, send) -> None:
+        body = json.dumps({"detail": f"Request body exceeds {self.max_bytes:,} bytes."}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
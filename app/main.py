@@ -1,23 +1,388 @@
+import asyncio
 import io
+import itertools
 import json
+import logging
+import os
+import time
+import zipfile
+from contextlib import asynccontextmanager, contextmanager
+from typing import List
 from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from PIL import Image
-import torch
-import timm
-from torchvision import transforms
 from fastapi.middleware.cors import CORSMiddleware
 
+# Measured from here, since the module import is the first thing a worker does
+_IMPORT_STARTED = time.perf_counter()
+
 # Import all three of our services
-from .services import gemini_service, similarity_service, jikan_service
+from .services import gemini_service, similarity_service, image_providers
+from .services.precomputed_service import PrecomputedStore
+from .services.image_service import ImageTooLargeError, decode_image
+from .services.result_cache import RecognitionCache, content_digest, perceptual_hash
+from .core.config import settings
+from .core.executors import CpuWorkerPool, EngineStoppedError, PoolSaturatedError, configure_torch_threads
+from .core.resilience import deadline_scope, time_left, upstream_timeouts
+from .core.telemetry import configure_logging, configure_tracing, process_memory, registry, span
+from .core.uploads import BodySizeLimitMiddleware
+
+configure_logging(settings.LOG_LEVEL, json_format=settings.LOG_JSON)
+configure_tracing(settings.TRACING_ENABLED, settings.TRACE_SAMPLE_RATE)
+logger = logging.getLogger(__name__)
 
 # --------------------------------------------------------------------------
-# (Sections 1-4: App, Class Names, Model, Transforms - remain the same)
+# Per-worker state. Nothing heavy happens at import time: the model, class
+# names and service clients are loaded by the lifespan handler below, so the
+# worker can accept connections (and answer /healthz) straight away.
+# --------------------------------------------------------------------------
+model_runtime = None      # ModelRuntime: backend, class names and transform
+inference_engine = None   # BatchInferenceEngine wrapping model_runtime.backend
+embedding_index = None    # EmbeddingIndex when SIMILARITY_MODE=embedding
+gallery = None            # Gallery when RECOGNITION_MODE=gallery, swapped whenever the file changes
+precomputed_store = PrecomputedStore("")
+startup_error = None
+startup_timings = {}
+startup_memory = {}       # process_memory() before loading the model and once it is warmed up
+# Gallery reloads and model swaps both replace `gallery` after loading in a
+# thread; taking turns keeps a slower load from overwriting a newer one
+_reload_lock = asyncio.Lock()
+_retiring = set()         # Tasks stopping swapped-out inference engines
+
+cpu_pool = CpuWorkerPool(
+    max_workers=settings.CPU_POOL_WORKERS,
+    max_pending=settings.MAX_PENDING_REQUESTS,
+)
+
+# Whole /recognize results for uploads seen before (see RESULT_CACHE_* settings)
+result_cache = RecognitionCache(
+    max_entries=settings.RESULT_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.RESULT_CACHE_TTL_SECONDS,
+    disk_path=settings.RESULT_CACHE_PATH or None,
+    max_disk_entries=settings.RESULT_CACHE_MAX_DISK_ENTRIES,
+    perceptual=settings.RESULT_CACHE_PERCEPTUAL,
+    max_hamming_distance=settings.RESULT_CACHE_MAX_HAMMING_DISTANCE,
+) if settings.RESULT_CACHE_ENABLED else None
+
+
+RECOGNITION_MODES = ("classifier", "gallery")
+SIMILARITY_MODES = ("tags", "embedding")
+
+
+def _load_embedding_index(runtime):
+    """The embedding index for SIMILARITY_MODE=embedding, or None to fall back to tags."""
+    from .services.embedding_index import EmbeddingIndex
+
+    if not runtime.backend.supports_embeddings:
+        logger.warning("SIMILARITY_MODE=embedding needs the eager backend; using tag similarity.")
+        return None
+    index = EmbeddingIndex.load(settings.EMBEDDING_INDEX_PATH, nprobe=settings.EMBEDDING_IVF_NPROBE)
+    if index is None:
+        logger.warning("%s not found; using tag similarity. Create it with build_embedding_index.py.",
+                       settings.EMBEDDING_INDEX_PATH)
+    elif index.backbone != runtime.backend.weights_id:
+        # Embeddings from other weights are not comparable with this model's, so its neighbours would be wrong
+        logger.warning("%s was embedded with different model weights; using tag similarity. "
+                       "Rebuild it with build_embedding_index.py.", settings.EMBEDDING_INDEX_PATH)
+        return None
+    elif index.num_labels > len(runtime.class_names):
+        logger.warning("%s has more classes than %s; rebuild it for the current model.",
+                       settings.EMBEDDING_INDEX_PATH, settings.CLASS_NAMES_PATH)
+    else:
+        logger.info("Loaded embedding index: %d vectors.", len(index))
+    return index
+
+
+def _load_gallery(runtime):
+    """The gallery at GALLERY_PATH, or an empty one until manage_gallery.py creates it."""
+    from .services.gallery import Gallery
+
+    loaded = Gallery.load(settings.GALLERY_PATH)
+    if loaded is None:
+        logger.warning("%s not found; uploads are unidentified until characters are added with manage_gallery.py.",
+                       settings.GALLERY_PATH)
+        return Gallery.empty()
+    # The weights actually served, wherever they were loaded from (file, SHARED_WEIGHTS or a bundle)
+    if loaded.backbone != runtime.backend.weights_id:
+        logger.warning("%s was embedded with different model weights; rebuild it with manage_gallery.py.",
+                       settings.GALLERY_PATH)
+    logger.info("Loaded gallery: %d characters, %d reference images.", len(loaded.characters), len(loaded))
+    return loaded
+
+
+def _load_model(startup: bool = True):
+    """
+    Loads class names and the model backend (plus the embedding index and
+    gallery when enabled), then warms the model up. Runs in a worker thread,
+    at startup and for every model swap (which leaves startup_timings and
+    startup_memory alone).
+    """
+    started = time.perf_counter()
+    # Imported here so that importing app.main doesn't pull in torch and timm
+    from .services.model_service import ModelRuntime
+
+    if settings.RECOGNITION_MODE not in RECOGNITION_MODES:
+        raise ValueError(f"Unknown RECOGNITION_MODE '{settings.RECOGNITION_MODE}'. "
+                         f"Choose one of: {', '.join(RECOGNITION_MODES)}.")
+    if settings.SIMILARITY_MODE not in SIMILARITY_MODES:
+        raise ValueError(f"Unknown SIMILARITY_MODE '{settings.SIMILARITY_MODE}'. "
+                         f"Choose one of: {', '.join(SIMILARITY_MODES)}.")
+    threads = configure_torch_threads(settings.TORCH_NUM_THREADS, settings.WEB_CONCURRENCY, settings.INFERENCE_WORKERS)
+    logger.info("Using %d torch threads per inference worker.", threads)
+    if startup:
+        startup_memory["before_model"] = process_memory()
+    runtime = ModelRuntime.load(settings)
+    index = _load_embedding_index(runtime) if settings.SIMILARITY_MODE == "embedding" else None
+    loaded_gallery = None
+    if settings.RECOGNITION_MODE == "gallery":
+        if not runtime.backend.supports_embeddings:
+            raise ValueError("RECOGNITION_MODE=gallery needs MODEL_BACKEND=eager.")
+        loaded_gallery = _load_gallery(runtime)
+    if settings.CASCADE_ENABLED and (index is not None or loaded_gallery is not None):
+        logger.warning("CASCADE_ENABLED has no effect: every image needs the full model's embedding.")
+    loaded = time.perf_counter()
+    runtime.warm_up()
+    if startup:
+        startup_timings["model_load"] = loaded - started
+        startup_timings["warm_up"] = time.perf_counter() - loaded
+        startup_memory["after_model"] = process_memory()
+    return runtime, index, loaded_gallery
+
+
+def _inference_model(runtime, embeddings: bool):
+    """What the forward pass calls: the backend, or its logits-plus-embeddings variant."""
+    return runtime.backend.forward_with_embeddings if embeddings else runtime.backend
+
+
+def _needs_embeddings() -> bool:
+    return embedding_index is not None or gallery is not None
+
+
+def _result_cache_model_key() -> str:
+    """Results depend on the model and on whichever embedding index and gallery are in use."""
+    parts = [model_runtime.fingerprint]
+    if embedding_index is not None:
+        parts.append(embedding_index.fingerprint)
+    if gallery is not None:
+        parts.append(gallery.fingerprint)
+    return ":".join(parts)
+
+
+def _start_engine(runtime, embeddings: bool):
+    from .services.batch_inference import BatchInferenceEngine
+
+    # Decode, preprocessing and inference run off the event loop, and
+    # concurrent requests are batched into a single forward pass
+    engine = BatchInferenceEngine(
+        _inference_model(runtime, embeddings),
+        max_batch_size=settings.INFERENCE_MAX_BATCH_SIZE,
+        max_wait_ms=settings.INFERENCE_MAX_WAIT_MS,
+        executor=cpu_pool.executor,
+        max_concurrent_batches=settings.INFERENCE_WORKERS,
+    )
+    engine.start()
+    return engine
+
+
+async def _start_model() -> None:
+    global model_runtime, inference_engine, embedding_index, gallery, startup_error
+
+    try:
+        runtime, index, loaded_gallery = await asyncio.to_thread(_load_model)
+    except Exception as e:
+        startup_error = str(e)
+        logger.exception("Failed to load the model.")
+        return
+
+    engine = _start_engine(runtime, index is not None or loaded_gallery is not None)
+    model_runtime, inference_engine, embedding_index, gallery = runtime, engine, index, loaded_gallery
+    if result_cache is not None:
+        result_cache.set_model(_result_cache_model_key())
+    startup_timings["ready"] = time.perf_counter() - _IMPORT_STARTED
+    logger.info("Model ready %.2fs after import (load %.2fs, warm-up %.2fs).",
+                startup_timings["ready"], startup_timings["model_load"], startup_timings["warm_up"])
+    if startup_memory["after_model"]:
+        before, after = startup_memory["before_model"], startup_memory["after_model"]
+        logger.info("Worker RSS %.0f MB before loading the model, %.0f MB after (%.0f MB private, %.0f MB shared).",
+                    before["rss"] / 2**20, after["rss"] / 2**20, after["private"] / 2**20, after["shared"] / 2**20)
+
+
+def _file_state(path: str):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _gallery_changed() -> bool:
+    from .services.gallery import file_fingerprint
+
+    if not os.path.exists(settings.GALLERY_PATH):
+        return bool(len(gallery))
+    return file_fingerprint(settings.GALLERY_PATH) != gallery.fingerprint
+
+
+async def _watch_gallery() -> None:
+    """
+    Swaps in GALLERY_PATH whenever it changes, so characters added or removed
+    with manage_gallery.py are recognized without a restart. Requests already
+    running keep the gallery they started with.
+    """
+    global gallery
+    last_state = None
+    while True:
+        await asyncio.sleep(settings.GALLERY_RELOAD_SECONDS)
+        state = _file_state(settings.GALLERY_PATH)
+        # Stat first so an unchanged file costs nothing; the content check rules out touch-only changes
+        if gallery is None or state == last_state:
+            continue
+        last_state = state
+        async with _reload_lock:
+            try:
+                if not await asyncio.to_thread(_gallery_changed):
+                    continue
+                gallery = await asyncio.to_thread(_load_gallery, model_runtime)
+            except Exception:
+                logger.exception("Failed to reload %s; keeping the current gallery.", settings.GALLERY_PATH)
+                continue
+            if result_cache is not None:
+                result_cache.set_model(_result_cache_model_key())
+
+
+def _bundle_state():
+    """MODEL_BUNDLE_PATH's target and its file state; changes when the file, or a symlink to it, is replaced."""
+    state = _file_state(settings.MODEL_BUNDLE_PATH)
+    return state and (os.path.realpath(settings.MODEL_BUNDLE_PATH), *state)
+
+
+def _bundle_changed() -> bool:
+    from .services.model_bundle import ModelBundle
+
+    # Memory-mapped and unverified, so only the metadata is actually read
+    bundle = ModelBundle.load(settings.MODEL_BUNDLE_PATH, mmap=True, verify=False)
+    return bundle.checksum != model_runtime.checksum
+
+
+async def _retire_engine(engine) -> None:
+    """
+    Stops a swapped-out engine MODEL_SWAP_DRAIN_SECONDS after the swap (requests
+    that picked it up may still be reading their upload), once no prediction
+    is waiting on it.
+    """
+    await asyncio.sleep(settings.MODEL_SWAP_DRAIN_SECONDS)
+    while engine.pending:
+        await asyncio.sleep(0.05)
+    await engine.stop()
+
+
+async def _swap_model() -> None:
+    """
+    Loads and warms up MODEL_BUNDLE_PATH (with the embedding index and gallery
+    when enabled) while the current model keeps serving, then swaps it in.
+    Requests already running finish on the model they started with; the old
+    engine is retired in the background, so the next bundle can follow at once.
+    """
+    global model_runtime, inference_engine, embedding_index, gallery
+    started = time.perf_counter()
+    async with _reload_lock:
+        try:
+            runtime, index, loaded_gallery = await asyncio.to_thread(_load_model, False)
+        except Exception:
+            model_swaps.inc(outcome="failed")
+            logger.exception("Failed to load %s; still serving model %s.",
+                             settings.MODEL_BUNDLE_PATH, model_runtime.version)
+            return
+
+        engine = _start_engine(runtime, index is not None or loaded_gallery is not None)
+        previous_version, previous_engine = model_runtime.version, inference_engine
+        # One assignment between awaits, so every request sees either the old model or the new one
+        model_runtime, inference_engine, embedding_index, gallery = runtime, engine, index, loaded_gallery
+        if result_cache is not None:
+            result_cache.set_model(_result_cache_model_key())
+    model_swaps.inc(outcome="success")
+    logger.info("Swapped model %s for %s (loaded and warmed up in %.2fs).",
+                previous_version, runtime.version, time.perf_counter() - started)
+
+    task = asyncio.create_task(_retire_engine(previous_engine))
+    _retiring.add(task)
+    task.add_done_callback(_retiring.discard)
+
+
+async def _watch_model_bundle() -> None:
+    """
+    Hot-swaps MODEL_BUNDLE_PATH whenever it changes, so a new model deploys
+    without a restart: replace the file (build_model_bundle.py writes it
+    atomically) or repoint a symlink. A bundle that fails to load or verify
+    leaves the current model in place.
+    """
+    last_state = None
+    while True:
+        await asyncio.sleep(settings.MODEL_BUNDLE_RELOAD_SECONDS)
+        state = _bundle_state()
+        # Stat first so an unchanged file costs nothing; the checksum rules out touch-only changes
+        if model_runtime is None or state is None or state == last_state:
+            continue
+        last_state = state
+        try:
+            if not await asyncio.to_thread(_bundle_changed):
+                continue
+        except Exception:
+            model_swaps.inc(outcome="failed")
+            logger.exception("Failed to read %s; still serving model %s.",
+                             settings.MODEL_BUNDLE_PATH, model_runtime.version)
+            continue
+        await _swap_model()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global precomputed_store
+    startup_timings["import"] = time.perf_counter() - _IMPORT_STARTED
+
+    # Precomputed enrichment for every class (see precompute_enrichment.py)
+    precomputed_store = PrecomputedStore(settings.PRECOMPUTED_ENRICHMENT_PATH)
+    if len(precomputed_store):
+        logger.info("Loaded precomputed enrichment for %d classes.", len(precomputed_store))
+
+    model_task = asyncio.create_task(_start_model())
+    # Build the similarity index now rather than on the first request
+    index_task = asyncio.create_task(asyncio.to_thread(similarity_service.get_index))
+    if not settings.BACKGROUND_MODEL_LOADING:
+        await asyncio.gather(model_task, index_task)
+    gallery_task = asyncio.create_task(_watch_gallery()) if settings.RECOGNITION_MODE == "gallery" else None
+    bundle_task = None
+    if settings.MODEL_BUNDLE_PATH and settings.MODEL_BUNDLE_RELOAD_SECONDS > 0:
+        bundle_task = asyncio.create_task(_watch_model_bundle())
+
+    yield
+
+    model_task.cancel()
+    if gallery_task is not None:
+        gallery_task.cancel()
+    if bundle_task is not None:
+        bundle_task.cancel()
+    for task in list(_retiring):
+        task.cancel()
+    if inference_engine is not None:
+        await inference_engine.stop()
+    cpu_pool.shutdown()
+    await image_providers.close()
+    gemini_service.executor.shutdown(wait=False, cancel_futures=True)
+    gemini_service.details_cache.close()
+    if result_cache is not None:
+        result_cache.close()
+    precomputed_store.close()
+
+
 # --------------------------------------------------------------------------
 # 1. Initialize the FastAPI App
+# --------------------------------------------------------------------------
 app = FastAPI(
     title="Anime Character Recognizer API",
     description="Full pipeline API to identify characters, get details, find similar ones, and provide image URLs.",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 origins = [
@@ -32,117 +397,859 @@ app.add_middleware(
     allow_methods=["*"], # Allows all methods (GET, POST, etc.)
     allow_headers=["*"], # Allows all headers
 )
+app.add_middleware(BodySizeLimitMiddleware, max_bytes=settings.MAX_REQUEST_BYTES)
+
+registry.callback(
+    "recognizer_cpu_pool_in_flight", "Requests currently inside the CPU stage.", lambda: cpu_pool.in_flight
+)
+registry.callback(
+    "recognizer_gemini_cache_events_total", "Gemini details cache lookups by outcome.",
+    lambda: {
+        (event,): count for event, count in gemini_service.details_cache.stats().items()
+        if event in ("memory_hits", "disk_hits", "misses", "coalesced", "evictions", "expired")
+    },
+    metric_type="counter", labelnames=["event"],
+)
+registry.callback(
+    "recognizer_image_url_cache_events_total", "Character image URL cache lookups by outcome.",
+    lambda: {
+        (event,): count for event, count in image_providers.cache_stats().items()
+        if event in ("memory_hits", "disk_hits", "misses", "coalesced", "evictions", "expired")
+    },
+    metric_type="counter", labelnames=["event"],
+)
+registry.callback(
+    "recognizer_result_cache_events_total", "Recognition result cache lookups by outcome.",
+    lambda: {
+        (event,): count for event, count in (result_cache.stats() if result_cache else {}).items()
+        if event in ("memory_hits", "disk_hits", "perceptual_hits", "misses", "coalesced", "evictions", "expired")
+    },
+    metric_type="counter", labelnames=["event"],
+)
+result_cache_saved = registry.counter(
+    "recognizer_result_cache_saved_seconds_total",
+    "Pipeline time that result cache hits did not have to spend (the original compute time of each hit).",
+)
+model_swaps = registry.counter(
+    "recognizer_model_swaps_total",
+    "Model bundle hot swaps by outcome; a failed swap keeps the current model.",
+    labelnames=["outcome"],
+)
+degraded_responses = registry.counter(
+    "recognizer_degraded_responses_total",
+    "Characters answered with fallback details from the character database because Gemini failed.",
+)
+registry.callback(
+    "recognizer_process_memory_bytes",
+    "Memory of this worker: resident (rss), proportional share of pages shared with other processes (pss), "
+    "and the shared and private parts of rss.",
+    lambda: {(kind,): value for kind, value in process_memory().items()},
+    labelnames=["kind"],
+)
+registry.callback(
+    "recognizer_startup_seconds", "Cold-start time of this worker by phase.",
+    lambda: {(phase,): seconds for phase, seconds in startup_timings.items()},
+    labelnames=["phase"],
+)
+
+
+def _require_model():
+    """Returns (runtime, engine), or answers 503 while the model is still loading."""
+    if model_runtime is None or inference_engine is None:
+        raise HTTPException(
+            status_code=503,
+            detail="The model is still loading, please try again shortly." if startup_error is None
+            else f"The model failed to load: {startup_error}",
+            headers={"Retry-After": "2"},
+        )
+    return model_runtime, inference_engine
+
+
+@contextmanager
+def _cpu_stage():
+    """
+    Admits a request to the CPU pool, answering 429 when it is saturated, 413
+    for oversized images and 503 when the model it started on was swapped out.
+    """
+    try:
+        with cpu_pool.admit():
+            yield
+    except PoolSaturatedError:
+        raise HTTPException(
+            status_code=429,
+            detail="Server is busy, please try again shortly.",
+            headers={"Retry-After": "1"},
+        )
+    except EngineStoppedError:
+        raise HTTPException(
+            status_code=503,
+            detail="The model was replaced while this request was running; please retry.",
+            headers={"Retry-After": "1"},
+        )
+    except ImageTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+
+async def _read_upload(upload: UploadFile, max_bytes: int) -> bytes:
+    """
+    Reads one part of a multipart upload, answering 413 when it exceeds `max_bytes`.
+
+    By now Starlette has already spooled the part, so this only stops an
+    oversized file from being read into memory and decoded; the body as a
+    whole is bounded earlier by BodySizeLimitMiddleware (MAX_REQUEST_BYTES).
+    """
+    # Starlette's multipart parser records every file part's size
+    if upload.size is not None and upload.size > max_bytes:
+        raise HTTPException(status_code=413, detail=f"'{upload.filename}' exceeds {max_bytes:,} bytes.")
+    return await upload.read()
+
+
+def _decode_image(runtime, image_content: bytes) -> Image.Image:
+    """Decodes at no more than the resolution the model input needs (see image_service)."""
+    with span("decode"):
+        return decode_image(image_content, runtime.transform.size, settings.MAX_IMAGE_PIXELS)
+
+
+def _transform_image(runtime, image: Image.Image):
+    with span("transform"):
+        return runtime.transform(image)
+
+
+def _load_image_tensor(runtime, image_content: bytes):
+    """Decodes the uploaded bytes and preprocesses them into a (C, H, W) tensor."""
+    return _transform_image(runtime, _decode_image(runtime, image_content))
+
+
+def _decode_and_hash(runtime, image_content: bytes):
+    """Decodes the image and, when near-duplicate lookups are on, computes its perceptual hash."""
+    image = _decode_image(runtime, image_content)
+    phash = None
+    if result_cache is not None and result_cache.perceptual:
+        with span("perceptual_hash"):
+            phash = perceptual_hash(image)
+    return image, phash
+
+
+async def _fetch_image_url(character_name: str):
+    """Looks up an image URL, giving up after IMAGE_LOOKUP_TIMEOUT_SECONDS or at the request deadline."""
+    try:
+        return await asyncio.wait_for(
+            image_providers.get_character_image_url(character_name),
+            timeout=time_left(settings.IMAGE_LOOKUP_TIMEOUT_SECONDS),
+        )
+    except asyncio.TimeoutError:
+        upstream_timeouts.inc(upstream="image_lookup")
+        return None
+
+
+def _fallback_details(character_name: str):
+    """What the character database knows about a character, for when Gemini can't answer."""
+    record = similarity_service.get_index().character(character_name) or {}
+    return {
+        "name": character_name,
+        "about": None,
+        "tags": record.get("tags", []),
+        "anime_name": record.get("anime"),
+        "streaming_platforms": [],
+        "degraded": True,
+    }
+
+
+async def _character_details(predicted_character_name: str):
+    """
+    Details from Gemini. When Gemini reports an error (including timeouts and
+    an open circuit breaker) these are the fallback details with DEGRADED_RESPONSES,
+    otherwise the request is answered with a 502.
+    """
+    with span("gemini"):
+        character_details = await gemini_service.get_character_details(predicted_character_name)
+    if "error" in character_details:
+        if not settings.DEGRADED_RESPONSES:
+            raise HTTPException(status_code=502, detail=f"Gemini API Error: {character_details['error']}")
+        logger.warning("Serving fallback details for '%s': %s", predicted_character_name, character_details["error"])
+        degraded_responses.inc()
+        return _fallback_details(predicted_character_name)
+    return character_details
+
+
+def _is_degraded(character_details) -> bool:
+    return bool(character_details.get("degraded"))
+
+
+def _use_embeddings(embedding) -> bool:
+    return embedding is not None and embedding_index is not None
+
+
+async def _similar_characters(character_details, class_idx=None, embedding=None):
+    """Visually similar classes from the embedding index when available, otherwise by Gemini's tags."""
+    if _use_embeddings(embedding):
+        with span("similarity"):
+            return await cpu_pool.run(
+                embedding_index.similar_characters, embedding.numpy(), model_runtime.class_names,
+                similarity_service.get_index().anime_by_name, class_idx,
+            )
+    predicted_tags = character_details.get("tags", [])
+    with span("similarity"):
+        return await asyncio.to_thread(
+            similarity_service.find_similar_characters,
+            predicted_character_name=character_details.get("name"),
+            predicted_character_tags=predicted_tags
+        )
+
+
+async def _enrich_character(predicted_character_name: str, class_idx=None, embedding=None, character_details=None):
+    """Fetches details, similar characters and image URLs for one character."""
+    # --- 2. Get Details from Gemini (unless they are already known) ---
+    if character_details is None:
+        character_details = await _character_details(predicted_character_name)
+        
+    # --- 3. Find Similar Characters ---
+    similar_characters = await _similar_characters(character_details, class_idx, embedding)
+    
+    # --- 4. Enrich with Image URLs (all lookups run concurrently) ---
+    main_char_name_for_search = character_details.get("name", predicted_character_name)
+    with span("image_urls"):
+        image_urls = await asyncio.gather(
+            _fetch_image_url(main_char_name_for_search),
+            *(_fetch_image_url(char["name"]) for char in similar_characters),
+        )
+    character_details["image_url"] = image_urls[0]
+    for char, image_url in zip(similar_characters, image_urls[1:]):
+        char["image_url"] = image_url
+
+    return character_details, similar_characters
 
-# 2. Load Class Names
-try:
-    with open("class_names.json", "r") as f:
-        class_names = json.load(f)
-    NUM_CLASSES = len(class_names)
-except FileNotFoundError:
-    raise RuntimeError("Could not find class_names.json.")
 
-# 3. Load the Fine-Tuned Model
-model = timm.create_model('efficientnet_b0', pretrained=False, num_classes=NUM_CLASSES)
+# Predictions below this confidence are reported as unidentified
+CONFIDENCE_THRESHOLD = 0.20
 
-# --- THIS IS THE KEY CHANGE ---
-# Load the weights you just trained
-try:
-    model.load_state_dict(torch.load('anime_character_model.pth', map_location=torch.device('cpu')))
-    print("--- Successfully loaded fine-tuned model weights! ---")
-except FileNotFoundError:
-    print("--- WARNING: anime_character_model.pth not found. Running in simulation mode. ---")
-# ----------------------------
 
-model.eval()
+def _confidence_threshold() -> float:
+    """The classifier's threshold, or in gallery mode the cosine similarity matching GALLERY_MAX_DISTANCE."""
+    if settings.RECOGNITION_MODE == "gallery":
+        return 1.0 - settings.GALLERY_MAX_DISTANCE
+    return CONFIDENCE_THRESHOLD
 
 
-# 4. Define Image Transformations
-model_config = model.default_cfg
-transform = transforms.Compose([
-    transforms.Resize(model_config['input_size'][1:]),
-    transforms.CenterCrop(model_config['input_size'][1:]),
-    transforms.ToTensor(),
-    transforms.Normalize(mean=model_config['mean'], std=model_config['std']),
-])
+def _unidentified(confidence: float) -> HTTPException:
+    return HTTPException(
+        status_code=404,
+        detail=f"Unidentified character. (Confidence: {confidence:.2%}) is below the {_confidence_threshold():.0%} threshold."
+    )
+
+
+async def _identify(runtime, prediction):
+    """
+    (class_idx, character_name, confidence) for a prediction. In gallery mode
+    the name is the nearest gallery character, the confidence is its cosine
+    similarity, and class_idx is the classifier's index for that name (None
+    for characters the classifier doesn't know). Call inside _cpu_stage().
+    """
+    if settings.RECOGNITION_MODE != "gallery":
+        character_name = runtime.class_names.get(str(prediction.class_idx), "Unknown Character")
+        return prediction.class_idx, character_name, prediction.confidence
+    match = await cpu_pool.run(
+        gallery.classify, prediction.embedding.numpy(), settings.GALLERY_MATCH, settings.GALLERY_KNN_K
+    )
+    if match is None:
+        return None, None, 0.0
+    return runtime.class_indices.get(match.name), match.name, max(0.0, 1.0 - match.distance)
+
+
+def _prediction_result(character_name: str, confidence: float):
+    return {"predicted_character": character_name, "confidence": f"{confidence:.2%}"}
+
+
+def _precomputed_record(class_idx, character_name: str):
+    if class_idx is None:
+        return None
+    precomputed = precomputed_store.get(class_idx)
+    if precomputed is not None and precomputed.get("name") == character_name:
+        return precomputed
+    return None
+
+
+async def _character_enrichment(class_idx: int, character_name: str, embedding=None):
+    """
+    Details and similar characters for a class, from the precomputed store when
+    it has them. Visual neighbours depend on the image itself, so with an
+    embedding only the precomputed details are reused.
+    """
+    precomputed = _precomputed_record(class_idx, character_name)
+    if precomputed is not None and not _use_embeddings(embedding):
+        return precomputed["character_details"], precomputed["similar_characters"]
+    return await _enrich_character(
+        character_name, class_idx, embedding,
+        character_details=precomputed["character_details"] if precomputed is not None else None,
+    )
+
+
+async def _image_url_event(target: str, index, character_name: str):
+    event = {"target": target, "name": character_name, "image_url": await _fetch_image_url(character_name)}
+    if index is not None:
+        event["index"] = index
+    return event
+
+
+async def _complete_enrichment_events(character_details, similar_characters):
+    """Splits an enrichment that is already complete into the events _enrichment_events() yields."""
+    yield "character_details", {k: v for k, v in character_details.items() if k != "image_url"}
+    yield "similar_characters", [{k: v for k, v in char.items() if k != "image_url"} for char in similar_characters]
+    yield "image_url", {"target": "character", "name": character_details.get("name"),
+                        "image_url": character_details.get("image_url")}
+    for index, char in enumerate(similar_characters):
+        yield "image_url", {"target": "similar", "name": char["name"], "image_url": char.get("image_url"),
+                            "index": index}
+
+
+async def _enrichment_events(class_idx: int, character_name: str, embedding=None):
+    """
+    The pieces of _character_enrichment() as (event, data) pairs, each yielded
+    as soon as it resolves: character_details, similar_characters, then one
+    image_url event per lookup in completion order.
+    """
+    precomputed = _precomputed_record(class_idx, character_name)
+    if precomputed is not None and not _use_embeddings(embedding):
+        async for event in _complete_enrichment_events(
+            precomputed["character_details"], precomputed["similar_characters"]
+        ):
+            yield event
+        return
+
+    if precomputed is not None:
+        character_details = {k: v for k, v in precomputed["character_details"].items() if k != "image_url"}
+    else:
+        character_details = await _character_details(character_name)
+    # The main character's image lookup doesn't need to wait for the similarity search
+    lookups = [asyncio.create_task(
+        _image_url_event("character", None, character_details.get("name", character_name))
+    )]
+    try:
+        yield "character_details", character_details
+        similar_characters = await _similar_characters(character_details, class_idx, embedding)
+        yield "similar_characters", similar_characters
+        lookups += [
+            asyncio.create_task(_image_url_event("similar", index, char["name"]))
+            for index, char in enumerate(similar_characters)
+        ]
+        for next_done in asyncio.as_completed(lookups):
+            yield "image_url", await next_done
+    finally:
+        for task in lookups:
+            task.cancel()
+
+
+ZIP_CONTENT_TYPES = ("application/zip", "application/x-zip-compressed")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".gif", ".bmp")
+
+
+def _extract_zip_images(content: bytes, limit: int):
+    """
+    (filename, bytes or error) for each image in a zip archive, stopping past
+    `limit` entries or once MAX_ZIP_INFLATED_BYTES have been inflated.
+    """
+    images, inflated = [], 0
+    with zipfile.ZipFile(io.BytesIO(content)) as archive:
+        for info in archive.infolist():
+            if info.is_dir() or not info.filename.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            if len(images) >= limit:
+                raise HTTPException(status_code=413, detail=f"At most {settings.BATCH_MAX_IMAGES} images per batch.")
+            # Both checked against the declared size, so oversized entries are never inflated
+            if info.file_size > settings.MAX_UPLOAD_BYTES:
+                images.append((info.filename, ImageTooLargeError(f"Exceeds {settings.MAX_UPLOAD_BYTES:,} bytes.")))
+                continue
+            if inflated + info.file_size > settings.MAX_ZIP_INFLATED_BYTES:
+                raise HTTPException(status_code=413, detail=f"Zip archives may inflate to at most "
+                                                            f"{settings.MAX_ZIP_INFLATED_BYTES:,} bytes.")
+            # zipfile stops at the declared size (an understated one fails the CRC check)
+            data = archive.read(info)
+            inflated += len(data)
+            images.append((info.filename, data))
+    return images
+
+
+async def _read_batch_uploads(files: List[UploadFile]):
+    """
+    Flattens the uploaded images and zip archives into a list of (filename,
+    content), where content is the image bytes or the error to report for it.
+    """
+    items = []
+    for upload in files:
+        filename = upload.filename or f"image_{len(items)}"
+        if upload.content_type in ZIP_CONTENT_TYPES or filename.lower().endswith(".zip"):
+            content = await _read_upload(upload, settings.MAX_REQUEST_BYTES)
+            try:
+                items.extend(await asyncio.to_thread(
+                    _extract_zip_images, content, settings.BATCH_MAX_IMAGES - len(items)
+                ))
+            except zipfile.BadZipFile:
+                raise HTTPException(status_code=400, detail=f"'{filename}' is not a valid zip archive.")
+        elif upload.content_type and upload.content_type.startswith("image/"):
+            try:
+                items.append((filename, await _read_upload(upload, settings.MAX_UPLOAD_BYTES)))
+            except HTTPException as e:
+                items.append((filename, ImageTooLargeError(e.detail)))
+        else:
+            items.append((filename, ValueError("File is not an image.")))
+        if len(items) > settings.BATCH_MAX_IMAGES:
+            raise HTTPException(status_code=413, detail=f"At most {settings.BATCH_MAX_IMAGES} images per batch.")
+    return items
+
+
+def _load_image_tensor_or_error(runtime, image_content: bytes):
+    try:
+        return _load_image_tensor(runtime, image_content)
+    except Exception as e:
+        return e
 
 
 # --------------------------------------------------------------------------
-# 5. Define the Endpoints
+# 2. Define the Endpoints
 # --------------------------------------------------------------------------
 @app.get("/")
 def read_root():
     return {"status": "ok", "message": "API is fully operational"}
 
 
+@app.get("/healthz")
+def healthz():
+    """Liveness: the worker is up and its event loop is responsive."""
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+def readyz():
+    """Readiness: the model is loaded and has completed a warm-up forward pass."""
+    timings = {phase: round(seconds, 3) for phase, seconds in startup_timings.items()}
+    if startup_error is not None:
+        return JSONResponse(status_code=503, content={"status": "failed", "error": startup_error})
+    if inference_engine is None:
+        return JSONResponse(status_code=503, content={"status": "loading", "startup_seconds": timings})
+    memory = {moment: {kind: round(value / 2**20, 1) for kind, value in usage.items()}
+              for moment, usage in startup_memory.items()}
+    return {"status": "ready", "backend": model_runtime.backend.name, "model_version": model_runtime.version,
+            "startup_seconds": timings, "memory_mb": memory}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Stage timings, cache and pool statistics in the Prometheus text format."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+async def _recognize_uncached(runtime, engine, image_content: bytes, digest: str):
+    """
+    Runs the full pipeline for one upload. Returns a cacheable entry holding the
+    prediction and the response body (None when the character is unidentified).
+    """
+    started = time.perf_counter()
+
+    # --- 1. Model Prediction ---
+    with _cpu_stage():
+        image, phash = await cpu_pool.run(_decode_and_hash, runtime, image_content)
+        # A re-encoded or resized copy of an image we have already answered for
+        similar_entry = await result_cache.find_similar(phash) if phash is not None else None
+        if similar_entry is not None:
+            result_cache_saved.inc(similar_entry["compute_seconds"])
+            return similar_entry
+        image_tensor = await cpu_pool.run(_transform_image, runtime, image)
+        with span("inference"):
+            prediction = await engine.predict(image_tensor)
+        predicted_class_idx, predicted_character_name, confidence = await _identify(runtime, prediction)
+    entry = {"confidence": confidence, "response": None}
+
+    # --- CONFIDENCE THRESHOLD CHECK ---
+    # Unidentified uploads are cached too; the caller turns them into a 404
+    if confidence >= _confidence_threshold():
+        if predicted_character_name == "Unknown Character":
+            # This is a fallback for a different kind of error (e.g., bad class index)
+            raise HTTPException(status_code=500, detail="Character index out of bounds.")
+
+        # --- 2-4. Details, similar characters and image URLs ---
+        character_details, similar_characters = await _character_enrichment(
+            predicted_class_idx, predicted_character_name, prediction.embedding
+        )
+
+        # --- 5. Combine into the Full Response ---
+        entry["response"] = {
+            "prediction_result": _prediction_result(predicted_character_name, confidence),
+            "character_details": character_details,
+            "similar_characters": similar_characters
+        }
+        # Fallback details are served but never cached, so the next upload gets the real ones
+        entry["degraded"] = _is_degraded(character_details)
+
+    entry["compute_seconds"] = time.perf_counter() - started
+    if phash is not None and not entry.get("degraded"):
+        result_cache.remember_similar(phash, digest)
+    return entry
+
+
+async def _cached_recognition(digest: str, compute):
+    """Runs `compute` under the request deadline, through the result cache when it is enabled."""
+    with deadline_scope(settings.REQUEST_DEADLINE_SECONDS):
+        if result_cache is None:
+            return await compute()
+        entry, hit = await result_cache.get_or_compute(
+            digest, compute, should_cache=lambda entry: not entry.get("degraded")
+        )
+        if hit:
+            result_cache_saved.inc(entry["compute_seconds"])
+        return entry
+
+
 @app.post("/recognize")
 async def recognize_character(file: UploadFile = File(...)):
     """
     The main endpoint that orchestrates the entire recognition pipeline.
+    Results are cached by the content of the upload, so repeated uploads of
+    the same image skip decoding, inference and enrichment.
     """
     if not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="File is not an image.")
 
     try:
-        # --- 1. Model Prediction ---
-        image_content = await file.read()
-        image = Image.open(io.BytesIO(image_content)).convert("RGB")
-        image_tensor = transform(image).unsqueeze(0)
-
-        with torch.no_grad():
-            output = model(image_tensor)
-        
-        probabilities = torch.nn.functional.softmax(output[0], dim=0)
-        predicted_class_idx = output.argmax(-1).item()
-        predicted_character_name = class_names.get(str(predicted_class_idx), "Unknown Character")
-        confidence = probabilities[predicted_class_idx].item()
-        
-        # --- NEW: CONFIDENCE THRESHOLD CHECK ---
-        CONFIDENCE_THRESHOLD = 0.20  # This is 60%
+        runtime, engine = _require_model()
+        image_content = await _read_upload(file, settings.MAX_UPLOAD_BYTES)
+        digest = content_digest(image_content)
+        entry = await _cached_recognition(
+            digest, lambda: _recognize_uncached(runtime, engine, image_content, digest)
+        )
 
-        if confidence < CONFIDENCE_THRESHOLD:
+        if entry["response"] is None:
             # If the model's confidence is too low, stop everything and return an error.
             # Our frontend will display this 'detail' message.
-            raise HTTPException(
-                status_code=404,
-                detail=f"Unidentified character. (Confidence: {confidence:.2%}) is below the {CONFIDENCE_THRESHOLD:.0%} threshold."
-            )
-        # ----------------------------------------
+            raise _unidentified(entry["confidence"])
+        return entry["response"]
 
-        if predicted_character_name == "Unknown Character":
-            # This is a fallback for a different kind of error (e.g., bad class index)
+    except Exception as e:
+        # This will catch our HTTPException and any other errors
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail=f"An error occurred during the process: {str(e)}")
+
+@app.post("/recognize/batch")
+async def recognize_batch(files: List[UploadFile] = File(...)):
+    """
+    Recognizes many images in one request. Accepts several image files and/or
+    zip archives of images. All images go through a single batched forward
+    pass, each distinct character is enriched once, and results stream back
+    as NDJSON lines ({"index", "filename", "status", ...}) as they complete.
+    """
+    import torch
+    from .services.batch_inference import run_batch
+
+    runtime, _ = _require_model()
+    items = await _read_batch_uploads(files)
+    if not items:
+        raise HTTPException(status_code=400, detail="No images found in the upload.")
+
+    # --- 1. Parallel decode and one forward pass for the whole batch ---
+    with _cpu_stage():
+        with span("decode_batch"):
+            decoded = await asyncio.gather(*(
+                cpu_pool.run(_load_image_tensor_or_error, runtime, content)
+                for _, content in items if not isinstance(content, Exception)
+            ))
+        decoded_iter = iter(decoded)
+        # Each item is now a tensor, or the exception that stopped it
+        tensors = [content if isinstance(content, Exception) else next(decoded_iter) for _, content in items]
+        valid = [i for i, tensor in enumerate(tensors) if not isinstance(tensor, Exception)]
+        predictions, identities = [], []
+        if valid:
+            with span("inference"):
+                predictions = await cpu_pool.run(
+                    run_batch, _inference_model(runtime, _needs_embeddings()), [tensors[i] for i in valid]
+                )
+            identities = await asyncio.gather(*(_identify(runtime, prediction) for prediction in predictions))
+
+    # --- 2. Per-item status, grouping confident predictions by class ---
+    ready_lines = []
+    by_class = {}
+    for i, ((filename, content), tensor) in enumerate(zip(items, tensors)):
+        if isinstance(tensor, Exception):
+            known = isinstance(content, Exception) or isinstance(tensor, ImageTooLargeError)
+            detail = str(tensor) if known else "Could not decode image."
+            ready_lines.append({"index": i, "filename": filename, "status": "error", "detail": detail})
+    for i, prediction, (class_idx, character_name, confidence) in zip(valid, predictions, identities):
+        line = {"index": i, "filename": items[i][0]}
+        line["prediction_result"] = _prediction_result(character_name, confidence)
+        if confidence < _confidence_threshold():
+            ready_lines.append({**line, "status": "unidentified"})
+        elif character_name == "Unknown Character":
+            ready_lines.append({**line, "status": "error", "detail": "Character index out of bounds."})
+        else:
+            by_class.setdefault((class_idx, character_name), []).append((line, prediction.embedding))
+
+    # --- 3. Enrich each distinct character once and stream as each finishes ---
+    async def enrich_group(class_idx, character_name, members):
+        lines = [line for line, _ in members]
+        # Visual neighbours for the group come from the mean of its images' embeddings
+        embeddings = [embedding for _, embedding in members if embedding is not None]
+        embedding = torch.stack(embeddings).mean(dim=0) if embeddings else None
+        try:
+            with deadline_scope(settings.REQUEST_DEADLINE_SECONDS):
+                character_details, similar_characters = await _character_enrichment(
+                    class_idx, character_name, embedding
+                )
+        except HTTPException as e:
+            return [{**line, "status": "error", "detail": e.detail} for line in lines]
+        except Exception as e:
+            return [{**line, "status": "error", "detail": f"An error occurred during the process: {e}"}
+                    for line in lines]
+        return [
+            {**line, "status": "ok", "character_details": character_details, "similar_characters": similar_characters}
+            for line in lines
+        ]
+
+    async def stream_results():
+        for line in ready_lines:
+            yield json.dumps(line) + "\n"
+        tasks = [asyncio.create_task(enrich_group(idx, name, members)) for (idx, name), members in by_class.items()]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                for line in await next_done:
+                    yield json.dumps(line) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
+STREAM_FORMATS = {"sse": "text/event-stream", "ndjson": "application/x-ndjson"}
+
+
+def _format_event(stream_format: str, event: str, data) -> str:
+    if stream_format == "sse":
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    return json.dumps({"event": event, "data": data}) + "\n"
+
+
+@app.post("/recognize/stream")
+async def recognize_stream(file: UploadFile = File(...), format: str = "sse"):
+    """
+    A streaming variant of /recognize. The prediction_result event is sent as
+    soon as inference finishes; character_details, similar_characters and one
+    image_url event per lookup follow as each resolves, then `done` (or `error`
+    if enrichment fails part-way). `format` selects Server-Sent Events ("sse")
+    or NDJSON ("ndjson"). Prediction errors keep /recognize's status codes.
+    """
+    if not file.content_type.startswith("image/"):
+        raise HTTPException(status_code=400, detail="File is not an image.")
+    if format not in STREAM_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(STREAM_FORMATS)}.")
+
+    runtime, engine = _require_model()
+    image_content = await _read_upload(file, settings.MAX_UPLOAD_BYTES)
+    digest = content_digest(image_content)
+    started = time.perf_counter()
+
+    cached = await result_cache.get(digest) if result_cache is not None else None
+    if cached is not None:
+        result_cache_saved.inc(cached["compute_seconds"])
+        if cached["response"] is None:
+            raise _unidentified(cached["confidence"])
+        prediction_result = cached["response"]["prediction_result"]
+        events = _complete_enrichment_events(
+            cached["response"]["character_details"], cached["response"]["similar_characters"]
+        )
+    else:
+        with _cpu_stage():
+            image_tensor = await cpu_pool.run(_load_image_tensor, runtime, image_content)
+            with span("inference"):
+                prediction = await engine.predict(image_tensor)
+            class_idx, character_name, confidence = await _identify(runtime, prediction)
+        if confidence < _confidence_threshold():
+            if result_cache is not None:
+                await result_cache.set(digest, {
+                    "confidence": confidence, "response": None,
+                    "compute_seconds": time.perf_counter() - started,
+                })
+            raise _unidentified(confidence)
+        if character_name == "Unknown Character":
             raise HTTPException(status_code=500, detail="Character index out of bounds.")
+        prediction_result = _prediction_result(character_name, confidence)
+        events = _enrichment_events(class_idx, character_name, prediction.embedding)
 
-        # --- 2. Get Details from Gemini ---
-        character_details = gemini_service.get_character_details_from_gemini(predicted_character_name)
-        if "error" in character_details:
-            raise HTTPException(status_code=502, detail=f"Gemini API Error: {character_details['error']}")
-            
-        # --- 3. Find Similar Characters ---
-        predicted_tags = character_details.get("tags", [])
-        similar_characters = similarity_service.find_similar_characters(
-            predicted_character_name=character_details.get("name"),
-            predicted_character_tags=predicted_tags
+    async def stream():
+        yield _format_event(format, "prediction_result", prediction_result)
+        # Reassembled as the events go out, so a completed stream fills the result cache
+        character_details, similar_characters = {}, []
+        with deadline_scope(settings.REQUEST_DEADLINE_SECONDS):
+            try:
+                async for event, data in events:
+                    yield _format_event(format, event, data)
+                    if event == "character_details":
+                        character_details = dict(data)
+                    elif event == "similar_characters":
+                        similar_characters = [dict(char) for char in data]
+                    elif data["target"] == "character":
+                        character_details["image_url"] = data["image_url"]
+                    else:
+                        similar_characters[data["index"]]["image_url"] = data["image_url"]
+            except HTTPException as e:
+                yield _format_event(format, "error", {"status_code": e.status_code, "detail": e.detail})
+                return
+            except Exception as e:
+                logger.exception("Streaming enrichment failed.")
+                yield _format_event(format, "error", {
+                    "status_code": 500, "detail": f"An error occurred during the process: {str(e)}"
+                })
+                return
+        yield _format_event(format, "done", {})
+
+        if cached is None and result_cache is not None and not _is_degraded(character_details):
+            await result_cache.set(digest, {
+                "confidence": confidence,
+                "response": {
+                    "prediction_result": prediction_result,
+                    "character_details": character_details,
+                    "similar_characters": similar_characters,
+                },
+                "compute_seconds": time.perf_counter() - started,
+            })
+
+    return StreamingResponse(
+        stream(), media_type=STREAM_FORMATS[format], headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _sample_frames(runtime, image_content: bytes):
+    """Opens an upload for frame-by-frame reading (see animation.FrameSampler)."""
+    from .services.animation import FrameSampler
+
+    with span("decode"):
+        return FrameSampler(
+            image_content, runtime.transform.size, settings.MAX_IMAGE_PIXELS,
+            diff_threshold=settings.ANIMATION_FRAME_DIFF,
+            max_frames=settings.ANIMATION_MAX_FRAMES,
+            max_sampled=settings.ANIMATION_MAX_SAMPLED_FRAMES,
         )
-        
-        # --- 4. Enrich with Image URLs from Jikan ---
-        main_char_name_for_search = character_details.get("name", predicted_character_name)
-        character_details["image_url"] = jikan_service.get_character_image_url(main_char_name_for_search)
-        
-        for char in similar_characters:
-            char["image_url"] = jikan_service.get_character_image_url(char["name"])
-
-        # --- 5. Combine and Return Full Response ---
-        return {
-            "prediction_result": {
-                "predicted_character": predicted_character_name,
-                "confidence": f"{confidence:.2%}",
-            },
+
+
+def _next_frames(runtime, frames, count: int):
+    """Reads up to `count` more sampled frames and preprocesses them; returns (frames, tensors)."""
+    with span("decode_frames"):
+        batch = list(itertools.islice(frames, count))
+    tensors = []
+    for frame in batch:
+        tensors.append(_transform_image(runtime, frame.image))
+        # Only the tensor is needed from here on
+        frame.image = None
+    return batch, tensors
+
+
+async def _recognize_animation_uncached(runtime, image_content: bytes):
+    """
+    Recognizes an animated GIF/WebP (or a still image, as one frame). Sampled
+    frames go through the model a batch at a time, the prediction is the
+    display-time-weighted mean of their softmax scores, and each distinct
+    character confidently seen in some frame is enriched once.
+    """
+    from .services.animation import aggregate
+    from .services.batch_inference import run_batch
+
+    started = time.perf_counter()
+    frames, predictions = [], []
+    with _cpu_stage():
+        sampler = await cpu_pool.run(_sample_frames, runtime, image_content)
+        frame_iter = iter(sampler)
+        model = _inference_model(runtime, _needs_embeddings())
+        while True:
+            batch, tensors = await cpu_pool.run(_next_frames, runtime, frame_iter, settings.ANIMATION_BATCH_SIZE)
+            if batch:
+                with span("inference"):
+                    predictions += await cpu_pool.run(run_batch, model, tensors)
+                frames += batch
+            if len(batch) < settings.ANIMATION_BATCH_SIZE:
+                break
+        if not frames:
+            raise HTTPException(status_code=400, detail="The image has no frames.")
+        overall = aggregate(frames, predictions)
+        identities = await asyncio.gather(*(_identify(runtime, prediction) for prediction in predictions))
+        class_idx, character_name, confidence = await _identify(runtime, overall)
+
+    total_ms = sum(frame.duration_ms for frame in frames)
+    frame_results = [
+        {"index": frame.index, "time_ms": frame.time_ms, "duration_ms": frame.duration_ms,
+         **_prediction_result(name, frame_confidence)}
+        for frame, (_, name, frame_confidence) in zip(frames, identities)
+    ]
+    entry = {"confidence": confidence, "response": None}
+    if confidence >= _confidence_threshold():
+        if character_name == "Unknown Character":
+            raise HTTPException(status_code=500, detail="Character index out of bounds.")
+
+        # Every character some frame is confident about, the overall one first
+        members = {(class_idx, character_name): []}
+        for frame, prediction, (idx, name, frame_confidence) in zip(frames, predictions, identities):
+            if frame_confidence >= _confidence_threshold() and name != "Unknown Character":
+                members.setdefault((idx, name), []).append((frame, prediction))
+
+        async def enrich(key, seen):
+            if key == (class_idx, character_name) or not seen:
+                embedding = overall.embedding
+            else:
+                embedding = aggregate([frame for frame, _ in seen], [prediction for _, prediction in seen]).embedding
+            return await _character_enrichment(key[0], key[1], embedding)
+
+        enriched = await asyncio.gather(*(enrich(key, seen) for key, seen in members.items()))
+        (character_details, similar_characters), others = enriched[0], []
+        for ((_, name), seen), (details, similar) in zip(list(members.items())[1:], enriched[1:]):
+            others.append((sum(frame.duration_ms for frame, _ in seen) / total_ms, {
+                "predicted_character": name,
+                "character_details": details,
+                "similar_characters": similar,
+            }))
+        others.sort(key=lambda other: other[0], reverse=True)
+        others = [{**other, "screen_time": f"{screen_time:.2%}"} for screen_time, other in others]
+
+        entry["response"] = {
+            "prediction_result": _prediction_result(character_name, confidence),
             "character_details": character_details,
-            "similar_characters": similar_characters
+            "similar_characters": similar_characters,
+            "other_characters": others,
+            "frames": frame_results,
+            "animation": {
+                "frame_count": sampler.frame_count,
+                "frames_read": sampler.frames_read,
+                "frames_sampled": sampler.frames_sampled,
+                "duration_ms": sampler.duration_ms,
+                "truncated": sampler.truncated,
+            },
         }
+        entry["degraded"] = any(_is_degraded(details) for details, _ in enriched)
+
+    entry["compute_seconds"] = time.perf_counter() - started
+    return entry
+
+
+@app.post("/recognize/animation")
+async def recognize_animation(file: UploadFile = File(...)):
+    """
+    /recognize for animated GIF/WebP uploads (still images work too, as a
+    single frame). Near-identical consecutive frames are skipped, and the
+    remaining frames are batched through the model. Their scores are averaged
+    by display time into one prediction. Besides /recognize's fields, the response has
+    `frames` (per-frame predictions), `other_characters` (further characters
+    seen in some frames, each enriched once) and `animation` (frame counts).
+    """
+    if not file.content_type.startswith("image/"):
+        raise HTTPException(status_code=400, detail="File is not an image.")
+
+    try:
+        runtime, _ = _require_model()
+        image_content = await _read_upload(file, settings.MAX_UPLOAD_BYTES)
+        # Kept apart from /recognize's entry for the same bytes, whose response differs
+        digest = "animation:" + content_digest(image_content)
+        entry = await _cached_recognition(digest, lambda: _recognize_animation_uncached(runtime, image_content))
+        if entry["response"] is None:
+            raise _unidentified(entry["confidence"])
+        return entry["response"]
 
     except Exception as e:
-        # This will catch our HTTPException and any other errors
         if isinstance(e, HTTPException):
             raise e
-        raise HTTPException(status_code=500, detail=f"An error occurred during the process: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"An error occurred during the process: {str(e)}")
@@ -0,0 +1,121 @@
+import io
+import math
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+import torch
+from PIL import Image, ImageSequence
+
+from .batch_inference import InferenceResult
+from .image_service import ImageTooLargeError, reduce_image
+
+# What browsers show frames without a usable duration for
+DEFAULT_FRAME_DURATION_MS = 100
+# Frames are compared as grayscale thumbnails of this size
+THUMBNAIL_SIZE = (16, 16)
+
+
+@dataclass
+class Frame:
+    """A frame picked for recognition and the stretch of playback it stands for."""
+    index: int
+    time_ms: int
+    duration_ms: int
+    image: Optional[Image.Image] = None  # Dropped once the frame has been preprocessed
+
+
+def _frame_duration(frame: Image.Image) -> int:
+    duration = frame.info.get("duration") or 0
+    # Browsers play near-zero durations at the default speed too
+    return int(duration) if duration > 10 else DEFAULT_FRAME_DURATION_MS
+
+
+def _thumbnail(image: Image.Image) -> np.ndarray:
+    return np.asarray(image.convert("L").resize(THUMBNAIL_SIZE, Image.BILINEAR), dtype=np.int16)
+
+
+class FrameSampler:
+    """
+    Iterates the frames of an animated GIF or WebP lazily, yielding those worth
+    running through the model. A still image yields its only frame.
+
+    A frame is skipped when its grayscale thumbnail differs from the last
+    yielded frame's by less than `diff_threshold` (mean absolute difference,
+    0-255); its display time is credited to that frame, so each yielded
+    frame's `duration_ms` is only final once iteration has finished. At most
+    `max_frames` frames are read; when that is more than `max_sampled`, only
+    every n-th frame is examined so the samples cover the whole animation.
+    Only the current frame is held at full size; yielded frames are reduced
+    towards `target_size`.
+    """
+
+    def __init__(self, content: bytes, target_size: Tuple[int, int], max_pixels: int = 0,
+                 diff_threshold: float = 6.0, max_frames: int = 600, max_sampled: int = 48):
+        try:
+            self.image = Image.open(io.BytesIO(content))
+        except Image.DecompressionBombError as e:
+            raise ImageTooLargeError(str(e))
+        width, height = self.image.size
+        if max_pixels and width * height > max_pixels:
+            raise ImageTooLargeError(f"Image is {width}x{height}; at most {max_pixels:,} pixels are accepted.")
+        self.target_size = target_size
+        self.diff_threshold = diff_threshold
+        self.max_sampled = max_sampled
+        self.frame_count = getattr(self.image, "n_frames", 1)
+        self.frames_to_read = min(self.frame_count, max_frames)
+        self.stride = max(1, math.ceil(self.frames_to_read / max_sampled))
+        self.frames_read = 0
+        self.frames_sampled = 0
+        self.duration_ms = 0
+        # Frames left unread because of max_frames or max_sampled
+        self.truncated = False
+
+    def __iter__(self) -> Iterator[Frame]:
+        last: Optional[Frame] = None
+        last_thumbnail = None
+        for index, frame in enumerate(ImageSequence.Iterator(self.image)):
+            if index >= self.frames_to_read:
+                self.truncated = True
+                break
+            self.frames_read += 1
+            # WebP frames only report their duration once loaded
+            frame.load()
+            duration = _frame_duration(frame)
+            time_ms = self.duration_ms
+            self.duration_ms += duration
+            if last is not None and index % self.stride:
+                last.duration_ms += duration
+                continue
+
+            reduced = reduce_image(frame, self.target_size)
+            if reduced is frame:
+                # The sequence reuses one image object for every frame
+                reduced = frame.copy()
+            thumbnail = _thumbnail(reduced)
+            if last is not None and np.abs(thumbnail - last_thumbnail).mean() < self.diff_threshold:
+                last.duration_ms += duration
+                continue
+            if self.frames_sampled >= self.max_sampled:
+                self.truncated = True
+                break
+            last, last_thumbnail = Frame(index, time_ms, duration, reduced), thumbnail
+            self.frames_sampled += 1
+            yield last
+
+
+def aggregate(frames: List[Frame], predictions: List[InferenceResult]) -> InferenceResult:
+    """
+    One prediction for the whole animation: the softmax scores (and
+    embeddings, when present) of the sampled frames averaged by display time.
+    """
+    weights = torch.tensor([frame.duration_ms for frame in frames], dtype=torch.float32)
+    weights /= weights.sum()
+    probabilities = (weights[:, None] * torch.stack([p.probabilities.float() for p in predictions])).sum(dim=0)
+    embedding = None
+    if all(p.embedding is not None for p in predictions):
+        embedding = (weights[:, None] * torch.stack([p.embedding.float() for p in predictions])).sum(dim=0)
+    confidence, class_idx = probabilities.max(dim=0)
+    return InferenceResult(
+        class_idx=int(class_idx), confidence=float(confidence), probabilities=probabilities, embedding=embedding
+    )
@@ -0,0 +1,190 @@
+import asyncio
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import torch
+
+from ..core.executors import EngineStoppedError
+from ..core.telemetry import registry, span
+
+batch_size_histogram = registry.histogram(
+    "recognizer_inference_batch_size", "Number of images per forward pass.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+
+
+@dataclass
+class InferenceResult:
+    """The model's answer for a single image."""
+    class_idx: int
+    confidence: float
+    probabilities: torch.Tensor
+    embedding: Optional[torch.Tensor] = None
+
+
+def run_batch(model, tensors: List[torch.Tensor]) -> List[InferenceResult]:
+    """
+    Runs a list of (C, H, W) tensors through the model as one batch. `model`
+    returns logits, or (logits, embeddings) to attach each image's embedding.
+    """
+    batch_size_histogram.observe(len(tensors))
+    batch = torch.stack(tensors)
+    with span("inference_forward"), torch.no_grad():
+        output = model(batch)
+
+    embeddings = [None] * len(tensors)
+    if isinstance(output, tuple):
+        output, embeddings = output
+    probabilities = torch.nn.functional.softmax(output, dim=1)
+    confidences, indices = probabilities.max(dim=1)
+    return [
+        InferenceResult(class_idx=int(idx), confidence=float(conf), probabilities=probs, embedding=embedding)
+        for idx, conf, probs, embedding in zip(indices.tolist(), confidences.tolist(), probabilities, embeddings)
+    ]
+
+
+class BatchInferenceEngine:
+    """
+    Collects image tensors from concurrent requests for a few milliseconds and
+    runs them through the model as one batch.
+
+    Each caller awaits `predict()` with its own (C, H, W) tensor and gets back
+    only its own softmax/argmax result. Forward passes run on `executor`, with
+    up to `max_concurrent_batches` batches in flight at once.
+    """
+
+    def __init__(
+        self,
+        model: torch.nn.Module,
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0,
+        executor: Optional[Executor] = None,
+        max_concurrent_batches: int = 1,
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1.")
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max(max_wait_ms, 0.0) / 1000.0
+        self.executor = executor
+        self.max_concurrent_batches = max(max_concurrent_batches, 1)
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._batch_slots: Optional[asyncio.Semaphore] = None
+        self._dispatch_tasks = set()
+        # Requests taken off the queue for the batch being collected, not yet dispatched
+        self._collecting: List[Tuple[torch.Tensor, asyncio.Future]] = []
+        self._pending = 0
+        self._stopped = False
+
+    def start(self) -> None:
+        """Starts the background batching worker on the running event loop."""
+        if self._stopped:
+            raise EngineStoppedError("Inference engine was stopped.")
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._batch_slots = asyncio.Semaphore(self.max_concurrent_batches)
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Stops the worker for good and fails any requests that are still
+        waiting; later predict() calls raise EngineStoppedError.
+        """
+        self._stopped = True
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+        waiting, self._collecting = self._collecting, []
+        while self._queue is not None and not self._queue.empty():
+            waiting.append(self._queue.get_nowait())
+        for _, future in waiting:
+            if not future.done():
+                future.set_exception(EngineStoppedError("Inference engine was stopped."))
+
+    @property
+    def pending(self) -> int:
+        """Requests waiting for a prediction (queued or in a running batch)."""
+        return self._pending
+
+    async def predict(self, image_tensor: torch.Tensor) -> InferenceResult:
+        """
+        Queues one preprocessed image tensor and waits for its prediction.
+        Starts the worker on first use; raises EngineStoppedError once stopped.
+        """
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._pending += 1
+        try:
+            await self._queue.put((image_tensor, future))
+            return await future
+        finally:
+            self._pending -= 1
+
+    async def _collect_batch(self) -> List[Tuple[torch.Tensor, asyncio.Future]]:
+        # Block until there is at least one request, then keep collecting until
+        # the batch is full or the wait window has passed.
+        # The batch lives on the engine until dispatched, so stop() can fail it
+        loop = asyncio.get_running_loop()
+        batch = self._collecting = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait_s
+
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        self._collecting = []
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            # Wait for a free slot first so requests keep accumulating into the
+            # next batch while all slots are busy.
+            await self._batch_slots.acquire()
+            try:
+                batch = await self._collect_batch()
+            except BaseException:
+                self._batch_slots.release()
+                raise
+            task = asyncio.create_task(self._dispatch(batch))
+            self._dispatch_tasks.add(task)
+            task.add_done_callback(self._dispatch_tasks.discard)
+
+    async def _dispatch(self, batch: List[Tuple[torch.Tensor, asyncio.Future]]) -> None:
+        try:
+            # Skip callers that have already gone away (e.g. client disconnected)
+            batch = [(tensor, future) for tensor, future in batch if not future.done()]
+            if not batch:
+                return
+
+            loop = asyncio.get_running_loop()
+            try:
+                results = await loop.run_in_executor(self.executor, self._forward, [tensor for tensor, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._batch_slots.release()
+
+    def _forward(self, tensors: List[torch.Tensor]) -> List[InferenceResult]:
+        return run_batch(self.model, tensors)
@@ -0,0 +1,136 @@
+import hashlib
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalizes rows, so a dot product is the cosine similarity."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def build_ivf(vectors: np.ndarray, n_lists: int, iterations: int = 20, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Spherical k-means over normalized vectors for an inverted-file index.
+    Returns (centroids, assignments): (n_lists, D) unit vectors and the list
+    each vector belongs to.
+    """
+    rng = np.random.default_rng(seed)
+    n_lists = min(n_lists, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        empty = ~sums.any(axis=1)
+        # Re-seed empty lists with random vectors rather than dropping them
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        centroids = normalize(sums)
+    return centroids, np.argmax(vectors @ centroids.T, axis=1)
+
+
+class EmbeddingIndex:
+    """
+    Cosine nearest-neighbour search over per-class or per-image embeddings
+    taken from the model's penultimate layer (see build_embedding_index.py).
+
+    Search is exact (one matrix-vector product) unless the index was built
+    with an inverted file, in which case only the `nprobe` lists whose
+    centroids are closest to the query are scanned.
+    """
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        labels: np.ndarray,
+        ivf_centroids: Optional[np.ndarray] = None,
+        ivf_assignments: Optional[np.ndarray] = None,
+        nprobe: int = 8,
+        fingerprint: str = "",
+        backbone: str = "",
+    ):
+        self.vectors = normalize(vectors)
+        self.labels = np.asarray(labels, dtype=np.int64)
+        self.num_labels = int(self.labels.max()) + 1 if len(self.labels) else 0
+        self.nprobe = nprobe
+        self.fingerprint = fingerprint
+        # weights_id of the model whose embeddings these are ("" for indexes built before it was recorded)
+        self.backbone = backbone
+
+        self.ivf_centroids = None
+        if ivf_centroids is not None and ivf_assignments is not None:
+            # Vectors stored grouped by list, so probing a list scans one contiguous slice
+            self.ivf_centroids = normalize(ivf_centroids)
+            order = np.argsort(ivf_assignments, kind="stable")
+            self.vectors, self.labels = self.vectors[order], self.labels[order]
+            self._ivf_offsets = np.searchsorted(
+                np.asarray(ivf_assignments)[order], np.arange(len(ivf_centroids) + 1)
+            )
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    @classmethod
+    def load(cls, path: str, nprobe: int = 8) -> Optional["EmbeddingIndex"]:
+        """Loads an index written by build_embedding_index.py, or None if there is none."""
+        if not path or not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            fingerprint = hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+        with np.load(path) as data:
+            return cls(
+                data["vectors"], data["labels"],
+                ivf_centroids=data["ivf_centroids"] if "ivf_centroids" in data else None,
+                ivf_assignments=data["ivf_assignments"] if "ivf_assignments" in data else None,
+                nprobe=nprobe,
+                fingerprint=fingerprint,
+                backbone=str(data["backbone"]) if "backbone" in data else "",
+            )
+
+    def _score(self, query: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Cosine similarities and labels of the vectors worth scoring: all of them, or the probed lists."""
+        if self.ivf_centroids is None or self.nprobe >= len(self.ivf_centroids):
+            return self.vectors @ query, self.labels
+        closest_lists = np.argpartition(-(self.ivf_centroids @ query), self.nprobe - 1)[:self.nprobe]
+        slices = [slice(self._ivf_offsets[i], self._ivf_offsets[i + 1]) for i in closest_lists]
+        return (
+            np.concatenate([self.vectors[s] @ query for s in slices]),
+            np.concatenate([self.labels[s] for s in slices]),
+        )
+
+    def search(self, embedding: np.ndarray, top_n: int = 3, exclude_label: Optional[int] = None) -> List[Tuple[int, float]]:
+        """The `top_n` labels closest to `embedding` as (label, cosine similarity), best first."""
+        if not len(self) or top_n <= 0:
+            return []
+        similarities, labels = self._score(normalize(embedding).ravel())
+
+        # A label's score is its best-matching vector (per-image indexes hold several per label)
+        best = np.full(self.num_labels, -np.inf, dtype=np.float32)
+        np.maximum.at(best, labels, similarities)
+        if exclude_label is not None and 0 <= exclude_label < self.num_labels:
+            best[exclude_label] = -np.inf
+        k = min(top_n, int(np.isfinite(best).sum()))
+        if k == 0:
+            return []
+        top = np.argpartition(-best, k - 1)[:k]
+        top = top[np.argsort(-best[top], kind="stable")]
+        return [(int(label), float(best[label])) for label in top]
+
+    def similar_characters(self, embedding: np.ndarray, class_names: Dict[str, str], anime_by_name: Dict[str, str],
+                           exclude_label: Optional[int] = None, top_n: int = 3) -> List[Dict]:
+        """search() results in the shape find_similar_characters returns, with cosine distance."""
+        results = []
+        for label, similarity in self.search(embedding, top_n, exclude_label):
+            name = class_names.get(str(label), "Unknown Character")
+            results.append({
+                "name": name,
+                "anime": anime_by_name.get(name.lower()),
+                "distance": round(1.0 - similarity, 6),
+            })
+        return results
@@ -0,0 +1,111 @@
+import hashlib
+import os
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from .embedding_index import normalize
+
+MATCH_METHODS = ("centroid", "knn")
+
+
+def file_fingerprint(path: str) -> str:
+    """Identifies a gallery file by its contents."""
+    with open(path, "rb") as f:
+        return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+
+
+class GalleryMatch(NamedTuple):
+    name: str
+    distance: float  # Cosine distance, 0 (identical direction) to 2
+
+
+class Gallery:
+    """
+    Reference embeddings per character, for recognizing characters the
+    classifier was never trained on (RECOGNITION_MODE=gallery).
+
+    Stored as an .npz of float16 unit vectors plus the character name of each,
+    and the fingerprint of the backbone that produced them. Galleries are
+    immutable: add() and remove() return a new one, which manage_gallery.py
+    saves atomically so a running API can pick it up.
+    """
+
+    def __init__(self, vectors: np.ndarray, names, backbone: str = "", fingerprint: str = ""):
+        self.vectors = normalize(vectors) if len(vectors) else np.zeros((0, 0), dtype=np.float32)
+        self.names = np.asarray(names, dtype=str)
+        self.backbone = backbone
+        self.fingerprint = fingerprint
+
+        self.characters, self._labels = np.unique(self.names, return_inverse=True)
+        sums = np.zeros((len(self.characters), self.vectors.shape[1]), dtype=np.float32)
+        np.add.at(sums, self._labels, self.vectors)
+        self.centroids = normalize(sums)
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    @classmethod
+    def empty(cls) -> "Gallery":
+        return cls(np.zeros((0, 0), dtype=np.float32), [])
+
+    @classmethod
+    def load(cls, path: str) -> Optional["Gallery"]:
+        """Loads a gallery written by save(), or None if there is none."""
+        if not path or not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            return cls(
+                data["vectors"].astype(np.float32), data["names"],
+                backbone=str(data["backbone"]), fingerprint=file_fingerprint(path),
+            )
+
+    def save(self, path: str) -> None:
+        # Written beside the target and renamed over it, so readers never see a partial file
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, vectors=self.vectors.astype(np.float16), names=self.names, backbone=self.backbone)
+        os.replace(tmp_path, path)
+
+    def counts(self) -> Dict[str, int]:
+        """Reference images per character."""
+        return dict(zip(self.characters.tolist(), np.bincount(self._labels, minlength=len(self.characters)).tolist()))
+
+    def add(self, name: str, vectors: np.ndarray, backbone: str) -> "Gallery":
+        if len(self) and backbone != self.backbone:
+            raise ValueError("These embeddings come from a different backbone than the rest of the gallery; "
+                             "rebuild the gallery instead.")
+        vectors = normalize(vectors)
+        if len(self):
+            vectors = np.concatenate([self.vectors, vectors])
+        return Gallery(vectors, self.names.tolist() + [name] * (len(vectors) - len(self)), backbone)
+
+    def remove(self, names: List[str]) -> "Gallery":
+        keep = ~np.isin(self.names, names)
+        return Gallery(self.vectors[keep], self.names[keep], self.backbone)
+
+    def classify(self, embedding: np.ndarray, method: str = "centroid", k: int = 5) -> Optional[GalleryMatch]:
+        """
+        The gallery character closest to `embedding`, or None for an empty gallery.
+        "centroid" compares against each character's mean embedding; "knn"
+        lets the `k` nearest reference images vote, weighted by similarity, and
+        reports the winner's distance to its closest image.
+        """
+        if not len(self):
+            return None
+        query = normalize(embedding).ravel()
+        if method == "centroid":
+            similarities = self.centroids @ query
+            best = int(np.argmax(similarities))
+            return GalleryMatch(str(self.characters[best]), float(1.0 - similarities[best]))
+        if method != "knn":
+            raise ValueError(f"Unknown gallery match method '{method}'. Choose one of: {', '.join(MATCH_METHODS)}.")
+
+        similarities = self.vectors @ query
+        k = min(k, len(self))
+        nearest = np.argpartition(-similarities, k - 1)[:k]
+        votes = np.zeros(len(self.characters), dtype=np.float32)
+        # Shifted into [0, 2] so that even dissimilar neighbours cast a (small) vote
+        np.add.at(votes, self._labels[nearest], similarities[nearest] + 1.0)
+        best = int(np.argmax(votes))
+        closest = similarities[nearest][self._labels[nearest] == best].max()
+        return GalleryMatch(str(self.characters[best]), float(1.0 - closest))
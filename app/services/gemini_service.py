@@ -1,14 +1,55 @@
-import google.generativeai as genai
+import asyncio
 import json
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from ..core.cache import TieredCache
 from ..core.config import settings # Import our settings
+from ..core.resilience import CircuitBreaker, time_left, upstream_timeouts
+
+# The client is configured on first use rather than at import time, which
+# keeps worker startup fast (importing the SDK alone takes about a second).
+_model = None
+
+def get_model():
+    """Configures the generative AI client and returns the model, once per process."""
+    global _model
+    if _model is None:
+        import google.generativeai as genai
+
+        # Configure the generative AI client with the API key
+        if settings.GEMINI_API_ENDPOINT:
+            genai.configure(api_key=settings.GOOGLE_API_KEY, transport="rest",
+                            client_options={"api_endpoint": settings.GEMINI_API_ENDPOINT})
+        else:
+            genai.configure(api_key=settings.GOOGLE_API_KEY)
 
-# Configure the generative AI client with the API key
-genai.configure(api_key=settings.GOOGLE_API_KEY)
+        # Initialize the generative model
+        _model = genai.GenerativeModel('gemini-2.5-flash')
+    return _model
 
-# Initialize the generative model
-model = genai.GenerativeModel('gemini-2.5-flash')
+# Bump this whenever the prompt below changes, so cached answers from the old
+# prompt are no longer served.
+PROMPT_VERSION = "v1"
 
-def get_character_details_from_gemini(character_name: str) -> dict:
+# The model can only ever predict names from class_names.json, so the same few
+# answers are requested over and over. Cache them in memory and on disk.
+details_cache = TieredCache(
+    max_entries=settings.GEMINI_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.GEMINI_CACHE_TTL_SECONDS,
+    disk_path=settings.GEMINI_CACHE_PATH or None,
+    max_disk_entries=settings.GEMINI_CACHE_MAX_DISK_ENTRIES,
+)
+
+# Fails fast while Gemini keeps erroring or timing out
+breaker = CircuitBreaker(
+    "gemini", settings.BREAKER_FAILURE_THRESHOLD, settings.BREAKER_RESET_SECONDS
+)
+
+# The SDK is blocking; its calls get their own bounded pool instead of asyncio's default executor
+executor = ThreadPoolExecutor(max_workers=settings.GEMINI_MAX_WORKERS, thread_name_prefix="gemini")
+
+def get_character_details_from_gemini(character_name: str, timeout: float = None) -> dict:
     """
     Sends a character name to the Gemini API and gets structured details.
     """
@@ -45,7 +86,11 @@ def get_character_details_from_gemini(character_name: str) -> dict:
     """
     
     try:
-        response = model.generate_content(prompt)
+        # No SDK retries: its default Retry keeps a failing call going for up to 10 minutes,
+        # long after the caller has given up, so `timeout` bounds the whole call
+        response = get_model().generate_content(
+            prompt, request_options={"timeout": timeout or settings.GEMINI_TIMEOUT_SECONDS, "retry": None}
+        )
         cleaned_response = response.text.strip().replace("```json", "").replace("```", "").strip()
         character_details = json.loads(cleaned_response)
         return character_details
@@ -53,4 +98,49 @@ def get_character_details_from_gemini(character_name: str) -> dict:
     except json.JSONDecodeError:
         return {"error": "Failed to parse JSON response from Gemini."}
     except Exception as e:
-        return {"error": f"An unexpected error occurred with the Gemini API: {str(e)}"}
\ No newline at end of file
+        return {"error": f"An unexpected error occurred with the Gemini API: {str(e)}"}
+
+async def _fetch_character_details(character_name: str) -> dict:
+    """
+    One Gemini call behind the circuit breaker, bounded by GEMINI_TIMEOUT_SECONDS
+    and the request deadline. Failures come back as {"error": ...} like the
+    errors of get_character_details_from_gemini.
+    """
+    timeout = time_left(settings.GEMINI_TIMEOUT_SECONDS)
+    if timeout <= 0:
+        upstream_timeouts.inc(upstream="gemini")
+        return {"error": "No time left to call Gemini."}
+    if not breaker.allow():
+        return {"error": "Gemini is unavailable (circuit breaker open)."}
+
+    try:
+        loop = asyncio.get_running_loop()
+        character_details = await asyncio.wait_for(
+            loop.run_in_executor(executor, partial(get_character_details_from_gemini, character_name, timeout)),
+            timeout,
+        )
+    except asyncio.TimeoutError:
+        upstream_timeouts.inc(upstream="gemini")
+        breaker.record(success=False)
+        return {"error": f"Gemini did not answer within {timeout:.1f}s."}
+    except asyncio.CancelledError:
+        breaker.release()
+        raise
+    error = character_details.get("error", "").lower()
+    if "timed out" in error or "deadline" in error:
+        upstream_timeouts.inc(upstream="gemini")
+    breaker.record(success=not error)
+    return character_details
+
+async def get_character_details(character_name: str) -> dict:
+    """
+    Cached, non-blocking version of get_character_details_from_gemini.
+
+    Concurrent misses for the same name share a single Gemini call, and error
+    responses are never cached.
+    """
+    return await details_cache.get_or_compute(
+        f"{PROMPT_VERSION}:{character_name}",
+        lambda: _fetch_character_details(character_name),
+        should_cache=lambda details: "error" not in details,
+    )
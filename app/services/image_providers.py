@@ -0,0 +1,271 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from ..core.cache import TieredCache
+from ..core.rate_limit import TokenBucket
+from ..core.resilience import CircuitBreaker, time_left, upstream_timeouts
+from ..core.telemetry import registry
+
+logger = logging.getLogger(__name__)
+
+PROVIDERS = ("jikan", "mal")
+
+lookups_total = registry.counter(
+    "recognizer_image_lookups_total",
+    "Character image lookups sent to each provider, by outcome (found, missing, error).",
+    labelnames=["provider", "outcome"],
+)
+hedges_total = registry.counter(
+    "recognizer_image_hedges_total",
+    "Lookups where a fallback provider was started because the previous one was still waiting.",
+)
+
+
+class ProviderError(Exception):
+    """A provider could not answer (network error, bad status, unparseable body), as opposed to a miss."""
+
+
+class ImageProvider:
+    """
+    A character-image API behind a common interface: `lookup(name)` returns an
+    image URL, None when the API has no match, or raises ProviderError.
+
+    Each provider has its own pooled keep-alive client, timeout (shortened to
+    fit the request deadline), optional rate limiter and optional circuit
+    breaker. Subclasses supply the request parameters and response parsing.
+    """
+
+    name = "base"
+
+    def __init__(
+        self,
+        base_url: str,
+        timeout: float,
+        rate_limiter: Optional[TokenBucket] = None,
+        headers: Optional[Dict[str, str]] = None,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.headers = headers or {}
+        self.breaker = breaker
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                headers=self.headers,
+                limits=httpx.Limits(max_connections=10, max_keepalive_connections=10),
+            )
+        return self._client
+
+    def _params(self, character_name: str) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def _parse(self, data: Dict[str, Any]) -> Optional[str]:
+        raise NotImplementedError
+
+    async def lookup(self, character_name: str) -> Optional[str]:
+        if time_left(self.timeout) <= 0:
+            upstream_timeouts.inc(upstream=self.name)
+            raise ProviderError(f"No time left to call {self.name}.")
+        if self.breaker is not None and not self.breaker.allow():
+            lookups_total.inc(provider=self.name, outcome="error")
+            raise ProviderError(f"{self.name} is unavailable (circuit breaker open).")
+        try:
+            image_url = await self._request(character_name)
+        except ProviderError:
+            if self.breaker is not None:
+                self.breaker.record(success=False)
+            raise
+        except asyncio.CancelledError:
+            # Lost a hedge or ran out of time; says nothing about the provider's health
+            if self.breaker is not None:
+                self.breaker.release()
+            raise
+        if self.breaker is not None:
+            self.breaker.record(success=True)
+        return image_url
+
+    async def _request(self, character_name: str) -> Optional[str]:
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire()
+        timeout = time_left(self.timeout)
+        if timeout <= 0:
+            upstream_timeouts.inc(upstream=self.name)
+            raise ProviderError(f"The deadline passed while waiting for the {self.name} rate limiter.")
+        try:
+            # httpx encodes the query, so names with spaces or '&' are sent intact
+            response = await self._get_client().get(
+                "/characters", params=self._params(character_name), timeout=timeout
+            )
+            response.raise_for_status()
+            image_url = self._parse(response.json())
+        except httpx.HTTPError as e:
+            lookups_total.inc(provider=self.name, outcome="error")
+            if isinstance(e, httpx.TimeoutException):
+                upstream_timeouts.inc(upstream=self.name)
+            logger.warning("Error calling the %s API for '%s': %s", self.name, character_name, e)
+            raise ProviderError(str(e))
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            lookups_total.inc(provider=self.name, outcome="error")
+            logger.warning("Error parsing the %s API response for '%s': %s", self.name, character_name, e)
+            raise ProviderError(str(e))
+        lookups_total.inc(provider=self.name, outcome="found" if image_url else "missing")
+        return image_url
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class ImageUrlResolver:
+    """
+    Resolves a character name to an image URL through an ordered list of
+    providers, with a shared name -> URL cache in front of them.
+
+    The first provider is asked first. The next one starts as soon as the
+    previous one misses or fails, or after `hedge_after_ms` if it is still
+    waiting; the first URL found wins. Misses that every provider agreed on
+    are cached for `negative_ttl_seconds`; failures are not cached at all.
+    """
+
+    def __init__(
+        self,
+        providers: List[ImageProvider],
+        cache: TieredCache,
+        hedge_after_ms: float = 0,
+        negative_ttl_seconds: float = 3600,
+    ):
+        if not providers:
+            raise ValueError("At least one image provider is required.")
+        self.providers = providers
+        self.cache = cache
+        self.hedge_after = hedge_after_ms / 1000 if hedge_after_ms > 0 else None
+        self.negative_ttl_seconds = negative_ttl_seconds
+
+    async def _resolve(self, character_name: str) -> Dict[str, Any]:
+        pending = set()
+        launched = failed = 0
+
+        def launch_next():
+            nonlocal launched
+            pending.add(asyncio.create_task(self.providers[launched].lookup(character_name)))
+            launched += 1
+
+        launch_next()
+        try:
+            while pending:
+                can_hedge = launched < len(self.providers)
+                done, _ = await asyncio.wait(
+                    pending, timeout=self.hedge_after if can_hedge else None, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    hedges_total.inc()
+                    launch_next()
+                    continue
+                for task in done:
+                    pending.discard(task)
+                    try:
+                        image_url = task.result()
+                    except ProviderError:
+                        failed += 1
+                        continue
+                    if image_url:
+                        return {"url": image_url, "resolved_at": time.time()}
+                if not pending and launched < len(self.providers):
+                    launch_next()  # Fall back straight away rather than waiting out the hedge delay
+        finally:
+            for task in pending:
+                task.cancel()
+
+        if failed:
+            # Not every provider could answer, so this miss is not trustworthy enough to cache
+            raise ProviderError(f"{failed} of {launched} image providers failed for '{character_name}'.")
+        return {"url": None, "resolved_at": time.time()}
+
+    async def get_image_url(self, character_name: str) -> Optional[str]:
+        """The image URL for a character, or None if no provider has one (or none could answer)."""
+        if not character_name:
+            return None
+        key = character_name.strip().lower()
+        compute = lambda: self._resolve(character_name)
+        try:
+            entry = await self.cache.get_or_compute(key, compute)
+            if entry["url"] is None and time.time() - entry["resolved_at"] >= self.negative_ttl_seconds:
+                await self.cache.invalidate(key)
+                entry = await self.cache.get_or_compute(key, compute)
+        except ProviderError:
+            return None
+        return entry["url"]
+
+    async def close(self) -> None:
+        for provider in self.providers:
+            await provider.close()
+        self.cache.close()
+
+
+def build_resolver(settings) -> ImageUrlResolver:
+    """The resolver described by the IMAGE_* settings."""
+    from .jikan_service import JikanProvider
+    from .mal_service import MalProvider
+
+    factories = {
+        "jikan": lambda: JikanProvider(settings),
+        "mal": lambda: MalProvider(settings),
+    }
+    providers = []
+    for name in (name.strip() for name in settings.IMAGE_PROVIDERS.split(",")):
+        if name not in factories:
+            raise ValueError(f"Unknown image provider '{name}'. Choose from: {', '.join(PROVIDERS)}.")
+        providers.append(factories[name]())
+
+    cache = TieredCache(
+        max_entries=settings.IMAGE_URL_CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.IMAGE_URL_CACHE_TTL_SECONDS,
+        disk_path=settings.IMAGE_URL_CACHE_PATH or None,
+        max_disk_entries=settings.IMAGE_URL_CACHE_MAX_DISK_ENTRIES,
+    )
+    return ImageUrlResolver(
+        providers, cache,
+        hedge_after_ms=settings.IMAGE_HEDGE_AFTER_MS,
+        negative_ttl_seconds=settings.IMAGE_URL_NEGATIVE_TTL_SECONDS,
+    )
+
+
+# Built on first use, like the Gemini client, so importing this module stays cheap
+_resolver: Optional[ImageUrlResolver] = None
+
+
+def get_resolver() -> ImageUrlResolver:
+    global _resolver
+    if _resolver is None:
+        from ..core.config import settings
+        _resolver = build_resolver(settings)
+    return _resolver
+
+
+async def get_character_image_url(character_name: str) -> Optional[str]:
+    """Fetches the primary image URL for a character from the configured providers."""
+    return await get_resolver().get_image_url(character_name)
+
+
+def cache_stats() -> Dict[str, int]:
+    """Statistics of the shared URL cache, or {} before the first lookup."""
+    return _resolver.cache.stats() if _resolver is not None else {}
+
+
+async def close() -> None:
+    """Closes the providers' pooled clients and the URL cache. Called on application shutdown."""
+    global _resolver
+    if _resolver is not None:
+        await _resolver.close()
+        _resolver = None
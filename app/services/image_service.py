@@ -0,0 +1,42 @@
+import io
+from typing import Tuple
+
+from PIL import Image
+
+# Modes Image.reduce() handles directly; anything else is converted to RGB first
+_REDUCIBLE_MODES = ("RGB", "RGBA", "L", "LA")
+
+
+class ImageTooLargeError(ValueError):
+    """Raised when an image has more pixels than the server accepts."""
+
+
+def decode_image(content: bytes, target_size: Tuple[int, int], max_pixels: int = 0) -> Image.Image:
+    """
+    Decodes uploaded bytes to an RGB image no smaller than `target_size`
+    (width, height), doing as little full-resolution work as possible:
+
+    - the pixel limit is checked from the header, before anything is decoded;
+    - JPEGs are decoded at reduced size with draft mode (DCT scaling);
+    - other formats are box-reduced by an integer factor right after decoding.
+    """
+    try:
+        image = Image.open(io.BytesIO(content))
+    except Image.DecompressionBombError as e:
+        raise ImageTooLargeError(str(e))
+    width, height = image.size
+    if max_pixels and width * height > max_pixels:
+        raise ImageTooLargeError(f"Image is {width}x{height}; at most {max_pixels:,} pixels are accepted.")
+
+    image.draft("RGB", target_size)
+    return reduce_image(image, target_size)
+
+
+def reduce_image(image: Image.Image, target_size: Tuple[int, int]) -> Image.Image:
+    """Box-reduces a decoded image by the largest integer factor that keeps it no smaller than `target_size`, as RGB."""
+    if image.mode not in _REDUCIBLE_MODES:
+        image = image.convert("RGB")
+    factor = min(image.width // target_size[0], image.height // target_size[1])
+    if factor >= 2:
+        image = image.reduce(factor)
+    return image if image.mode == "RGB" else image.convert("RGB")
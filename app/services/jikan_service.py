@@ -1,50 +1,36 @@
-import requests
-import time
-from typing import Optional
+from typing import Any, Dict, Optional
+from ..core.rate_limit import TokenBucket
+from ..core.resilience import CircuitBreaker
+from .image_providers import ImageProvider
 
-# The base URL for the Jikan API v4
-JIKAN_API_BASE_URL = "https://api.jikan.moe/v4"
 
-def get_character_image_url(character_name: str) -> Optional[str]:
-    print(character_name)
+class JikanProvider(ImageProvider):
+    """
+    Character images from the Jikan API (an unofficial MyAnimeList mirror).
+    Needs no credentials, but the public instance allows only about 3 requests
+    per second, so every lookup goes through a shared token bucket.
     """
-    Fetches the primary image URL for a given character from the Jikan API.
 
-    Args:
-        character_name: The name of the anime character to search for.
+    name = "jikan"
 
-    Returns:
-        The image URL as a string, or None if not found or an error occurs.
-    """
-    if not character_name:
-        return None
+    def __init__(self, settings):
+        super().__init__(
+            base_url=settings.JIKAN_API_BASE_URL,
+            timeout=settings.JIKAN_TIMEOUT_SECONDS,
+            rate_limiter=TokenBucket(
+                rate=settings.JIKAN_RATE_LIMIT_PER_SECOND,
+                capacity=settings.JIKAN_RATE_LIMIT_BURST,
+            ),
+            breaker=CircuitBreaker("jikan", settings.BREAKER_FAILURE_THRESHOLD, settings.BREAKER_RESET_SECONDS),
+        )
 
-    # Construct the API request URL
-    # We use q={character_name} to search and limit=1 to get the most relevant result.
-    request_url = f"{JIKAN_API_BASE_URL}/characters?q={character_name}&limit=1"
-    
-    try:
-        # Make the API call
-        response = requests.get(request_url)
-        response.raise_for_status()  # Raises an exception for bad status codes (4xx or 5xx)
-        
-        data = response.json()
-        
+    def _params(self, character_name: str) -> Dict[str, Any]:
+        # We use q={character_name} to search and limit=1 to get the most relevant result.
+        return {"q": character_name, "limit": 1}
+
+    def _parse(self, data: Dict[str, Any]) -> Optional[str]:
         # Check if the 'data' array is not empty and has results
         if data.get("data"):
             # Extract the JPG image URL from the nested structure
-            image_url = data["data"][0].get("images", {}).get("jpg", {}).get("image_url")
-            return image_url
-        else:
-            return None
-
-    except requests.exceptions.RequestException as e:
-        print(f"Error calling Jikan API for '{character_name}': {e}")
-        return None
-    except (KeyError, IndexError) as e:
-        print(f"Error parsing Jikan API response for '{character_name}': {e}")
+            return data["data"][0].get("images", {}).get("jpg", {}).get("image_url")
         return None
-    finally:
-        # IMPORTANT: Add a small delay to respect the API's rate limits
-        # Jikan's public API recommends 1 request per second.
-        time.sleep(1)
\ No newline at end of file
@@ -1,56 +1,44 @@
-import requests
-from typing import Optional
-from ..core.config import settings # Import our settings to get the Client ID
+import logging
+from typing import Any, Dict, Optional
+from ..core.resilience import CircuitBreaker
+from .image_providers import ImageProvider
 
-# The base URL for the official MAL API v2
-API_BASE_URL = "https://api.myanimelist.net/v2"
+logger = logging.getLogger(__name__)
 
-def get_character_image_url(character_name: str) -> Optional[str]:
-    """
-    Fetches the primary image URL for a given character from the official MAL API
-    using a direct HTTP request with the Client ID.
 
-    Args:
-        character_name: The name of the anime character to search for.
+class MalProvider(ImageProvider):
+    """Character images from the official MyAnimeList API v2, authenticated with the Client ID."""
 
-    Returns:
-        The image URL as a string, or None if not found or an error occurs.
-    """
-    if not character_name or not settings.MAL_CLIENT_ID:
-        return None
+    name = "mal"
+
+    def __init__(self, settings):
+        self.client_id = settings.MAL_CLIENT_ID
+        if not self.client_id:
+            logger.warning("MAL_CLIENT_ID is empty; the mal image provider will not find anything.")
+        super().__init__(
+            base_url=settings.MAL_API_BASE_URL,
+            timeout=settings.MAL_TIMEOUT_SECONDS,
+            # For public data access, the Client ID is sent as a header
+            headers={"X-MAL-CLIENT-ID": settings.MAL_CLIENT_ID},
+            breaker=CircuitBreaker("mal", settings.BREAKER_FAILURE_THRESHOLD, settings.BREAKER_RESET_SECONDS),
+        )
+
+    async def lookup(self, character_name: str) -> Optional[str]:
+        # Without a Client ID every request is refused, so miss without asking (or tripping the breaker)
+        if not self.client_id:
+            return None
+        return await super().lookup(character_name)
+
+    def _params(self, character_name: str) -> Dict[str, Any]:
+        # We search for the name and limit the result to 1 to get the most relevant match.
+        return {"q": character_name, "limit": 1}
 
-    # For public data access, the Client ID is sent as a header
-    headers = {
-        "X-MAL-CLIENT-ID": settings.MAL_CLIENT_ID
-    }
-    
-    # Construct the API request URL for character search
-    # We search for the name and limit the result to 1 to get the most relevant match.
-    request_url = f"{API_BASE_URL}/characters?q={character_name}&limit=1"
-    
-    try:
-        # Make the API call
-        response = requests.get(request_url, headers=headers)
-        response.raise_for_status()  # Raises an HTTPError for bad responses (4xx or 5xx)
-        
-        data = response.json()
-        
+    def _parse(self, data: Dict[str, Any]) -> Optional[str]:
         # The response structure is {'data': [{'node': {...}}]}
         if data.get("data"):
             # The character information is inside the 'node' key
-            character_node = data["data"][0].get("node")
-            if character_node:
-                # The image URL is in the 'main_picture' dictionary
-                main_picture = character_node.get("main_picture")
-                if main_picture:
-                    # 'large' is usually better quality than 'medium'
-                    return main_picture.get("large") or main_picture.get("medium")
-        
-        return None # Return None if no character data was found
-
-    except requests.exceptions.RequestException as e:
-        print(f"Error calling MAL API for '{character_name}': {e}")
+            main_picture = (data["data"][0].get("node") or {}).get("main_picture")
+            if main_picture:
+                # 'large' is usually better quality than 'medium'
+                return main_picture.get("large") or main_picture.get("medium")
         return None
-    except (KeyError, IndexError, TypeError) as e:
-        print(f"Error parsing MAL API response for '{character_name}': {e}")
-        return None
\ No newline at end of file
@@ -0,0 +1,243 @@
+import contextlib
+import hashlib
+import logging
+import os
+from typing import Callable, Dict, Optional, Tuple
+
+import timm
+import torch
+
+from ..core.telemetry import registry
+
+logger = logging.getLogger(__name__)
+
+cascade_images = registry.counter(
+    "recognizer_cascade_images_total",
+    "Images answered by each model of the cascade: the student alone, or escalated to the full model.",
+    labelnames=["model"],
+)
+
+MODEL_NAME = 'efficientnet_b0'
+BACKENDS = ("eager", "torchscript", "onnxruntime", "quantized")
+
+
+def update_with_tensors(digest, state_dict: Dict[str, torch.Tensor]) -> None:
+    """Feeds every tensor's name, dtype, shape and values (in logical order, so memory layout doesn't matter) to `digest`."""
+    for name in sorted(state_dict):
+        tensor = state_dict[name].detach()
+        digest.update(f"{name}:{tensor.dtype}:{tuple(tensor.shape)}".encode())
+        digest.update(tensor.reshape(-1).view(torch.uint8).numpy())
+
+
+def weights_digest(state_dict: Dict[str, torch.Tensor]) -> str:
+    """
+    Identifies a set of weights by their values, so the same weights match
+    whether they came from the .pth, the SHARED_WEIGHTS file or a model bundle.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    update_with_tensors(digest, state_dict)
+    return digest.hexdigest()
+
+
+def preprocess_config(model_name: str = MODEL_NAME) -> Dict:
+    """The input size and normalization the model was trained with."""
+    cfg = timm.get_pretrained_cfg(model_name)
+    return {"input_size": cfg.input_size, "mean": cfg.mean, "std": cfg.std}
+
+
+class ModelBackend:
+    """
+    A loaded model behind a common interface: call it with a float (N, C, H, W)
+    batch and it returns (N, num_classes) logits as a torch tensor.
+    """
+
+    name = "base"
+    supports_embeddings = False
+    # weights_digest() of the weights behind forward_with_embeddings, for backends that support it
+    weights_id: Optional[str] = None
+
+    def __init__(self, predict: Callable[[torch.Tensor], torch.Tensor], channels_last: bool = False):
+        self._predict = predict
+        self.channels_last = channels_last
+        self.default_cfg = preprocess_config()
+
+    def _prepare(self, batch: torch.Tensor) -> torch.Tensor:
+        if self.channels_last:
+            batch = batch.contiguous(memory_format=torch.channels_last)
+        return batch
+
+    def __call__(self, batch: torch.Tensor) -> torch.Tensor:
+        with torch.inference_mode():
+            return self._predict(self._prepare(batch))
+
+    def warm_up(self, batch: torch.Tensor) -> None:
+        self(batch)
+
+    def forward_with_embeddings(self, batch: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Logits and the pooled penultimate-layer features from one forward pass,
+        as ((N, num_classes), (N, num_features)). Only some backends expose them.
+        """
+        raise NotImplementedError(f"The {self.name} backend does not expose embeddings.")
+
+
+class EagerBackend(ModelBackend):
+    name = "eager"
+    supports_embeddings = True
+
+    def __init__(self, num_classes: int, weights_path: str, channels_last: bool = True, model_name: str = MODEL_NAME,
+                 mmap: bool = False, state_dict: Optional[Dict[str, torch.Tensor]] = None):
+        # A memory-mapped or already loaded (bundle) model takes every tensor as it is,
+        # so skip allocating and initialising its own
+        preloaded = mmap or state_dict is not None
+        with torch.device('meta') if preloaded else contextlib.nullcontext():
+            model = timm.create_model(model_name, pretrained=False, num_classes=num_classes)
+        try:
+            # With mmap the parameters become views of the file's pages (assign=True), which every
+            # process mapping the file shares until one writes to them; inference never does
+            if state_dict is None:
+                state_dict = torch.load(weights_path, map_location=torch.device('cpu'), mmap=mmap)
+            model.load_state_dict(state_dict, assign=preloaded)
+            logger.info("Successfully loaded fine-tuned model weights%s.", " (memory-mapped)" if mmap else "")
+        except FileNotFoundError:
+            logger.warning("%s not found. Running in simulation mode.", weights_path)
+        model.eval()
+        if channels_last:
+            model = model.to(memory_format=torch.channels_last)
+        self.model = model
+        self.weights_id = weights_digest(model.state_dict())
+        super().__init__(model, channels_last=channels_last)
+
+    def forward_with_embeddings(self, batch: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        with torch.inference_mode():
+            features = self.model.forward_features(self._prepare(batch))
+            embeddings = self.model.forward_head(features, pre_logits=True)
+            return self.model.get_classifier()(embeddings), embeddings
+
+
+class CascadeBackend(ModelBackend):
+    """
+    A small distilled student in front of the full model. Every image goes
+    through the student; only those whose student top-1 probability is below
+    `escalate_below` are run through the full model too, whose logits then
+    replace the student's. Both models share the full model's preprocessing.
+    """
+    name = "cascade"
+
+    def __init__(self, student: ModelBackend, full: ModelBackend, escalate_below: float):
+        self.student = student
+        self.full = full
+        self.escalate_below = escalate_below
+        # Embeddings have to come from the backbone the embedding index and gallery were built with
+        self.supports_embeddings = full.supports_embeddings
+        self.weights_id = full.weights_id
+        super().__init__(self._cascade, channels_last=False)
+        self.default_cfg = full.default_cfg
+
+    def _cascade(self, batch: torch.Tensor) -> torch.Tensor:
+        logits = self.student(batch)
+        escalate = torch.softmax(logits.float(), dim=1).max(dim=1).values < self.escalate_below
+        escalated = int(escalate.sum())
+        cascade_images.inc(len(batch) - escalated, model="student")
+        if escalated:
+            cascade_images.inc(escalated, model="full")
+            logits = logits.clone()
+            logits[escalate] = self.full(batch[escalate]).to(logits.dtype)
+        return logits
+
+    def warm_up(self, batch: torch.Tensor) -> None:
+        self.student.warm_up(batch)
+        self.full.warm_up(batch)
+
+    def forward_with_embeddings(self, batch: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        # Every image needs the full model's embedding, so the student has nothing to save here
+        return self.full.forward_with_embeddings(batch)
+
+
+class TorchScriptBackend(ModelBackend):
+    """Runs a TorchScript artifact; also used for the int8 quantized export."""
+    name = "torchscript"
+
+    def __init__(self, path: str, channels_last: bool = True):
+        # export_model.py saves these already frozen, so loading is all that is needed
+        model = torch.jit.load(path, map_location="cpu")
+        model.eval()
+        self.model = model
+        super().__init__(model, channels_last=channels_last)
+
+
+class QuantizedBackend(TorchScriptBackend):
+    name = "quantized"
+
+    def __init__(self, path: str):
+        # Quantized kernels expect the contiguous layout they were traced with
+        super().__init__(path, channels_last=False)
+
+
+class OnnxRuntimeBackend(ModelBackend):
+    name = "onnxruntime"
+
+    def __init__(self, path: str, num_threads: int = 0):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise RuntimeError("MODEL_BACKEND=onnxruntime requires the onnxruntime package "
+                               "(pip install -r requirements-onnx.txt).")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+        session = ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+        input_name = session.get_inputs()[0].name
+
+        def predict(batch: torch.Tensor) -> torch.Tensor:
+            logits = session.run(None, {input_name: batch.numpy()})[0]
+            return torch.from_numpy(logits)
+
+        self.session = session
+        super().__init__(predict, channels_last=False)
+
+
+def backend_artifact_path(name: str, settings) -> str:
+    """The file a backend loads its weights from."""
+    path = {
+        "eager": settings.SHARED_WEIGHTS_PATH if settings.SHARED_WEIGHTS else settings.MODEL_WEIGHTS_PATH,
+        "torchscript": settings.TORCHSCRIPT_MODEL_PATH,
+        "onnxruntime": settings.ONNX_MODEL_PATH,
+        "quantized": settings.QUANTIZED_MODEL_PATH,
+    }.get(name)
+    if path is None:
+        raise ValueError(f"Unknown MODEL_BACKEND '{name}'. Choose one of: {', '.join(BACKENDS)}.")
+    return path
+
+
+def load_cascade(full: ModelBackend, num_classes: int, settings) -> CascadeBackend:
+    """Puts the student trained by train.py --distill in front of `full` (CASCADE_ENABLED)."""
+    if not os.path.exists(settings.STUDENT_WEIGHTS_PATH):
+        raise RuntimeError(f"CASCADE_ENABLED needs '{settings.STUDENT_WEIGHTS_PATH}'. Train it with train.py --distill.")
+    student = EagerBackend(
+        num_classes, settings.STUDENT_WEIGHTS_PATH, channels_last=settings.CHANNELS_LAST,
+        model_name=settings.STUDENT_MODEL_NAME,
+    )
+    logger.info("Cascade: %s first, escalating below %.0f%% confidence.",
+                settings.STUDENT_MODEL_NAME, settings.CASCADE_ESCALATE_BELOW * 100)
+    return CascadeBackend(student, full, settings.CASCADE_ESCALATE_BELOW)
+
+
+def load_backend(name: str, num_classes: int, settings) -> ModelBackend:
+    """Builds the inference backend selected by MODEL_BACKEND."""
+    path = backend_artifact_path(name, settings)
+    if name == "eager" and not settings.SHARED_WEIGHTS:
+        return EagerBackend(num_classes, path, channels_last=settings.CHANNELS_LAST)
+    if not os.path.exists(path):
+        raise RuntimeError(f"MODEL_BACKEND={name} needs '{path}'. Create it with export_model.py.")
+
+    logger.info("Loading %s backend from %s", name, path)
+    if name == "eager":
+        return EagerBackend(num_classes, path, channels_last=settings.CHANNELS_LAST, mmap=True)
+    if name == "torchscript":
+        return TorchScriptBackend(path, channels_last=settings.CHANNELS_LAST)
+    if name == "quantized":
+        return QuantizedBackend(path)
+    return OnnxRuntimeBackend(path, num_threads=settings.TORCH_NUM_THREADS)
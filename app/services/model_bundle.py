@@ -0,0 +1,75 @@
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from typing import Dict
+
+import torch
+
+from .model_backends import update_with_tensors
+
+# Bumped whenever the layout below changes incompatibly
+BUNDLE_FORMAT = 1
+
+
+class ModelBundleError(Exception):
+    """Raised for a bundle that is unreadable, of an unknown format, or fails its checksum."""
+
+
+@dataclass
+class ModelBundle:
+    """
+    Everything that has to change together when a new model is deployed: the
+    weights, the {"index": "character name"} mapping they were trained with,
+    and the preprocessing they expect, stamped with a version and a checksum.
+
+    Stored as one torch.save() file (weights_only-loadable), so it can also be
+    memory-mapped like SHARED_WEIGHTS_PATH.
+    """
+    version: str
+    model_name: str
+    class_names: Dict[str, str]
+    preprocess: Dict
+    state_dict: Dict[str, torch.Tensor]
+    checksum: str = ""
+
+    def metadata(self) -> Dict:
+        return {"format": BUNDLE_FORMAT, "version": self.version, "model_name": self.model_name,
+                "class_names": self.class_names, "preprocess": self.preprocess}
+
+    def compute_checksum(self) -> str:
+        """sha256 over the metadata and every tensor's values (in logical order, so independent of memory layout)."""
+        digest = hashlib.sha256(json.dumps(self.metadata(), sort_keys=True).encode())
+        update_with_tensors(digest, self.state_dict)
+        return "sha256:" + digest.hexdigest()
+
+    def save(self, path: str) -> None:
+        """Writes the bundle atomically, so a server watching `path` never reads a partial file."""
+        self.checksum = self.compute_checksum()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = path + ".tmp"
+        torch.save({**self.metadata(), "checksum": self.checksum, "state_dict": self.state_dict}, tmp_path)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = False, verify: bool = True) -> "ModelBundle":
+        """
+        Reads a bundle written by save(). With `mmap` the tensors are views of
+        the file's pages; `verify=False` skips the checksum (for reading only
+        the metadata).
+        """
+        try:
+            data = torch.load(path, map_location="cpu", mmap=mmap)
+        except FileNotFoundError:
+            raise
+        except Exception as e:
+            raise ModelBundleError(f"Could not read model bundle '{path}': {e}")
+        if not isinstance(data, dict) or data.get("format") != BUNDLE_FORMAT:
+            raise ModelBundleError(f"'{path}' is not a format {BUNDLE_FORMAT} model bundle.")
+        bundle = cls(
+            version=data["version"], model_name=data["model_name"], class_names=data["class_names"],
+            preprocess=data["preprocess"], state_dict=data["state_dict"], checksum=data["checksum"],
+        )
+        if verify and bundle.compute_checksum() != bundle.checksum:
+            raise ModelBundleError(f"Model bundle '{path}' is corrupt: its checksum does not match.")
+        return bundle
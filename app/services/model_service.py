@@ -0,0 +1,129 @@
+import hashlib
+import json
+import logging
+import os
+from typing import Callable, Dict, Optional
+
+import numpy as np
+import torch
+from PIL import Image
+
+from .model_backends import EagerBackend, ModelBackend, backend_artifact_path, load_backend, load_cascade
+from .model_bundle import ModelBundle
+
+logger = logging.getLogger(__name__)
+
+
+def load_class_names(path: str = "class_names.json") -> Dict[str, str]:
+    """Loads the {"index": "character name"} mapping written by generate_class_names.py."""
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise RuntimeError(f"Could not find {path}.")
+
+
+class Preprocess:
+    """
+    The preprocessing the model expects (resize to the input size, then
+    normalize), going from a PIL image straight to a float tensor. Produces the
+    same values as torchvision's Resize, CenterCrop, ToTensor and Normalize
+    without their intermediate copies.
+    """
+
+    def __init__(self, model_config: Dict):
+        _, height, width = model_config['input_size']
+        self.size = (width, height)
+        # ToTensor's /255 folded into the normalization constants
+        self._mean = torch.tensor(model_config['mean']).view(3, 1, 1) * 255
+        self._scale = 1 / (torch.tensor(model_config['std']).view(3, 1, 1) * 255)
+
+    def __call__(self, image: Image.Image) -> torch.Tensor:
+        if image.size != self.size:
+            image = image.resize(self.size, Image.BILINEAR)
+        pixels = torch.from_numpy(np.array(image, dtype=np.uint8))
+        return pixels.permute(2, 0, 1).float().sub_(self._mean).mul_(self._scale)
+
+
+def build_transform(model_config: Dict) -> Callable:
+    """The preprocessing the model expects: resize to the input size, normalize (no crop)."""
+    return Preprocess(model_config)
+
+
+def model_fingerprint(backend_name: str, *paths: str) -> str:
+    """Identifies a model by its backend and the contents of its files; changes whenever any of them does."""
+    digest = hashlib.blake2b(backend_name.encode(), digest_size=16)
+    for path in paths:
+        if not os.path.exists(path):
+            digest.update(b"missing:" + path.encode())
+            continue
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelRuntime:
+    """Everything a worker needs to turn an uploaded image into a prediction."""
+
+    def __init__(self, backend: ModelBackend, class_names: Dict[str, str], transform: Callable,
+                 fingerprint: str = "", version: Optional[str] = None, checksum: Optional[str] = None):
+        self.backend = backend
+        self.class_names = class_names
+        self.class_indices = {name: int(idx) for idx, name in class_names.items()}
+        self.transform = transform
+        self.fingerprint = fingerprint
+        # The model bundle's version and checksum, when loaded from one
+        self.version = version
+        self.checksum = checksum
+
+    @classmethod
+    def load(cls, settings) -> "ModelRuntime":
+        """
+        The model in MODEL_BUNDLE_PATH when that is set (eager backend only),
+        otherwise MODEL_BACKEND's artifact with CLASS_NAMES_PATH.
+        """
+        if settings.MODEL_BUNDLE_PATH:
+            return cls._load_bundle(settings)
+        class_names = load_class_names(settings.CLASS_NAMES_PATH)
+        backend = load_backend(settings.MODEL_BACKEND, len(class_names), settings)
+        logger.info("Using the %s inference backend.", backend.name)
+        identity = backend.name
+        artifacts = [backend_artifact_path(settings.MODEL_BACKEND, settings), settings.CLASS_NAMES_PATH]
+        return cls._finish(backend, class_names, identity, artifacts, settings)
+
+    @classmethod
+    def _load_bundle(cls, settings) -> "ModelRuntime":
+        if settings.MODEL_BACKEND != "eager":
+            raise ValueError("MODEL_BUNDLE_PATH needs MODEL_BACKEND=eager.")
+        try:
+            bundle = ModelBundle.load(settings.MODEL_BUNDLE_PATH, mmap=settings.SHARED_WEIGHTS)
+        except FileNotFoundError:
+            raise RuntimeError(f"Could not find {settings.MODEL_BUNDLE_PATH}.")
+        backend = EagerBackend(
+            len(bundle.class_names), settings.MODEL_BUNDLE_PATH, channels_last=settings.CHANNELS_LAST,
+            model_name=bundle.model_name, state_dict=bundle.state_dict,
+        )
+        backend.default_cfg = bundle.preprocess
+        logger.info("Using model bundle %s (%s, %s).", bundle.version, bundle.model_name, bundle.checksum)
+        # The checksum already covers the weights, class names and preprocessing
+        runtime = cls._finish(backend, bundle.class_names, f"bundle:{bundle.checksum}", [], settings)
+        runtime.version, runtime.checksum = bundle.version, bundle.checksum
+        return runtime
+
+    @classmethod
+    def _finish(cls, backend: ModelBackend, class_names: Dict[str, str], identity: str, artifacts,
+                settings) -> "ModelRuntime":
+        """Adds the cascade when enabled and fingerprints the result."""
+        if settings.CASCADE_ENABLED:
+            backend = load_cascade(backend, len(class_names), settings)
+            # The escalation threshold changes answers just like the weights do
+            identity = f"{backend.name}:{identity}:{settings.STUDENT_MODEL_NAME}:{settings.CASCADE_ESCALATE_BELOW}"
+            artifacts.append(settings.STUDENT_WEIGHTS_PATH)
+        fingerprint = model_fingerprint(identity, *artifacts)
+        return cls(backend, class_names, build_transform(backend.default_cfg), fingerprint)
+
+    def warm_up(self, batch_size: int = 1) -> None:
+        """Runs a dummy batch so the first real request doesn't pay for lazy initialisation."""
+        dummy = torch.zeros(batch_size, *self.backend.default_cfg['input_size'])
+        self.backend.warm_up(dummy)
@@ -0,0 +1,96 @@
+import json
+import mmap
+import os
+import struct
+from typing import Dict, Optional, Tuple
+
+# Artifact layout (little-endian):
+#   magic (8 bytes) | entry count (uint32)
+#   index: one (class_idx uint32, offset uint64, length uint32, fetched_at float64) per entry
+#   payload: one UTF-8 JSON object per entry, at the offsets given in the index
+MAGIC = b"ANIPRE1\0"
+_HEADER = struct.Struct("<8sI")
+_INDEX_ENTRY = struct.Struct("<IQId")
+
+
+def write_artifact(path: str, entries: Dict[int, Tuple[dict, float]]) -> None:
+    """
+    Writes {class_idx: (record, fetched_at)} to `path`.
+
+    The file is written next to the target and renamed over it, so a running
+    server that has the old artifact mapped keeps reading a consistent file.
+    """
+    blobs = []
+    index = []
+    offset = _HEADER.size + _INDEX_ENTRY.size * len(entries)
+    for class_idx in sorted(entries):
+        record, fetched_at = entries[class_idx]
+        blob = json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        index.append(_INDEX_ENTRY.pack(class_idx, offset, len(blob), fetched_at))
+        blobs.append(blob)
+        offset += len(blob)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, len(entries)))
+        f.writelines(index)
+        f.writelines(blobs)
+    os.replace(tmp_path, path)
+
+
+class PrecomputedStore:
+    """
+    Read-only view of the artifact produced by precompute_enrichment.py.
+
+    The file is memory-mapped, so only the index is parsed at startup; each
+    record is decoded on lookup and the caller gets a fresh dict.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._mmap: Optional[mmap.mmap] = None
+        self._index: Dict[int, Tuple[int, int, float]] = {}
+        if path and os.path.exists(path):
+            self._open(path)
+
+    def _open(self, path: str) -> None:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < _HEADER.size:
+                raise ValueError(f"'{path}' is not a precomputed enrichment artifact.")
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, count = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"'{path}' is not a precomputed enrichment artifact.")
+        for i in range(count):
+            class_idx, offset, length, fetched_at = _INDEX_ENTRY.unpack_from(
+                self._mmap, _HEADER.size + i * _INDEX_ENTRY.size
+            )
+            self._index[class_idx] = (offset, length, fetched_at)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, class_idx: int) -> bool:
+        return class_idx in self._index
+
+    def get(self, class_idx: int) -> Optional[dict]:
+        entry = self._index.get(class_idx)
+        if entry is None:
+            return None
+        offset, length, _ = entry
+        return json.loads(self._mmap[offset:offset + length])
+
+    def fetched_at(self, class_idx: int) -> Optional[float]:
+        entry = self._index.get(class_idx)
+        return entry[2] if entry else None
+
+    def items(self):
+        """Yields (class_idx, record, fetched_at) for every entry."""
+        for class_idx, (_, _, fetched_at) in self._index.items():
+            yield class_idx, self.get(class_idx), fetched_at
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
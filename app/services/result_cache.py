@@ -0,0 +1,129 @@
+import hashlib
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from PIL import Image
+
+from ..core.cache import TieredCache
+
+
+def content_digest(content: bytes) -> str:
+    """A fast hash of the uploaded bytes; identical files share a cache entry."""
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+def perceptual_hash(image: Image.Image) -> int:
+    """
+    64-bit difference hash (dHash) of a decoded image. Re-encoded or slightly
+    resized copies of the same picture land within a few bits of each other.
+    """
+    pixels = list(image.convert("L").resize((9, 8), Image.BILINEAR).getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left, right = pixels[row * 9 + col], pixels[row * 9 + col + 1]
+            bits = (bits << 1) | (left > right)
+    return bits
+
+
+class RecognitionCache:
+    """
+    Caches whole /recognize results by a hash of the uploaded bytes, with an
+    optional in-memory perceptual-hash index so near-duplicates also hit.
+
+    Keys include the model fingerprint (weights, backend and class names), so
+    results produced by a different model are never served.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 2048,
+        ttl_seconds: float = 24 * 3600,
+        disk_path: Optional[str] = None,
+        max_disk_entries: int = 50000,
+        perceptual: bool = True,
+        max_hamming_distance: int = 4,
+    ):
+        self._results = TieredCache(max_entries, ttl_seconds, disk_path, max_disk_entries)
+        self.max_entries = max_entries
+        self.perceptual = perceptual
+        self.max_hamming_distance = max_hamming_distance
+        self.fingerprint = ""
+        # perceptual hash -> content digest of the entry it was computed for
+        self._perceptual_index: "OrderedDict[int, str]" = OrderedDict()
+        self._perceptual_hits = 0
+
+    def set_model(self, fingerprint: str) -> None:
+        """
+        Switches to a new model. Keys include the fingerprint, so the old
+        model's results can no longer be hit: only memory is freed here (this
+        runs on the event loop mid-swap), and the disk rows age out.
+        """
+        if self.fingerprint and fingerprint != self.fingerprint:
+            self._results.clear_memory()
+            self._perceptual_index.clear()
+        self.fingerprint = fingerprint
+
+    def _key(self, digest: str) -> str:
+        return f"{self.fingerprint}:{digest}"
+
+    async def get_or_compute(
+        self,
+        digest: str,
+        compute: Callable[[], Awaitable[Any]],
+        should_cache: Callable[[Any], bool] = lambda entry: True,
+    ) -> Tuple[Any, bool]:
+        """Returns (entry, hit). Concurrent uploads of the same bytes share one computation."""
+        computed = False
+
+        async def run():
+            nonlocal computed
+            computed = True
+            return await compute()
+
+        entry = await self._results.get_or_compute(self._key(digest), run, should_cache)
+        return entry, not computed
+
+    async def get(self, digest: str) -> Optional[Any]:
+        return await self._results.get_async(self._key(digest))
+
+    async def set(self, digest: str, entry: Any) -> None:
+        await self._results.set_async(self._key(digest), entry)
+
+    async def find_similar(self, phash: int) -> Optional[Any]:
+        """The cached entry for the closest perceptual hash within the distance limit."""
+        if not self.perceptual or phash == 0:  # Flat images all hash to 0
+            return None
+        best, best_distance = None, self.max_hamming_distance + 1
+        for candidate in self._perceptual_index:
+            distance = (candidate ^ phash).bit_count()
+            if distance < best_distance:
+                best, best_distance = candidate, distance
+        if best is None:
+            return None
+        entry = await self._results.get_async(self._key(self._perceptual_index[best]))
+        # Other requests may have changed the index while the disk was read
+        if entry is None:  # Expired or evicted from the result cache
+            self._perceptual_index.pop(best, None)
+            return None
+        if best in self._perceptual_index:
+            self._perceptual_index.move_to_end(best)
+        self._perceptual_hits += 1
+        return entry
+
+    def remember_similar(self, phash: int, digest: str) -> None:
+        if not self.perceptual or phash == 0:
+            return
+        self._perceptual_index[phash] = digest
+        self._perceptual_index.move_to_end(phash)
+        while len(self._perceptual_index) > self.max_entries:
+            self._perceptual_index.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        stats = self._results.stats()
+        stats["perceptual_hits"] = self._perceptual_hits
+        stats["perceptual_entries"] = len(self._perceptual_index)
+        return stats
+
+    def close(self) -> None:
+        self._results.close()
@@ -1,26 +1,142 @@
 import json
-from typing import List, Dict, Set
+import logging
+import os
+import threading
+from typing import Dict, List, Optional
 
-def _load_character_database() -> List[Dict]:
+import numpy as np
+from scipy import sparse
+
+CHARACTER_DB_PATH = "mock_character_db.json"
+
+logger = logging.getLogger(__name__)
+
+def _load_character_database(path: str = CHARACTER_DB_PATH) -> List[Dict]:
     """Loads the character data from the mock JSON database."""
     try:
-        with open("mock_character_db.json", "r", encoding="utf-8") as f:
+        with open(path, "r", encoding="utf-8") as f:
             return json.load(f)
     except FileNotFoundError:
-        print("Warning: mock_character_db.json not found.")
+        logger.warning("%s not found.", path)
         return []
     except json.JSONDecodeError:
-        print("Warning: Could not decode mock_character_db.json.")
+        logger.warning("Could not decode %s.", path)
         return []
 
-def _calculate_jaccard_distance(set_a: Set[str], set_b: Set[str]) -> float:
-    """Calculates the Jaccard distance between two sets of tags."""
-    intersection = len(set_a.intersection(set_b))
-    union = len(set_a.union(set_b))
-    if union == 0:
-        return 0.0
-    distance = 1.0 - (intersection / union)
-    return distance
+
+class SimilarityIndex:
+    """
+    An in-memory tag index over the character database.
+
+    Each character is a row of a sparse binary (characters x tag vocabulary)
+    matrix, so the Jaccard distance to every row is computed in one vectorized
+    pass and the top-k are selected with argpartition instead of a full sort.
+    """
+
+    def __init__(self, characters: List[Dict]):
+        self.characters = characters
+        self.anime_by_name = {character["name"].lower(): character["anime"] for character in characters}
+        self.vocabulary: Dict[str, int] = {}
+        self._rows_by_name: Dict[str, List[int]] = {}
+
+        rows, cols = [], []
+        for row, character in enumerate(characters):
+            self._rows_by_name.setdefault(character["name"].lower(), []).append(row)
+            for tag in set(character.get("tags", [])):
+                rows.append(row)
+                cols.append(self.vocabulary.setdefault(tag, len(self.vocabulary)))
+
+        matrix = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+            shape=(len(characters), len(self.vocabulary)),
+        )
+        # Column slices are cheap on CSC, and a query only touches its own tags' columns
+        self._matrix = matrix.tocsc()
+        self._tag_counts = np.diff(matrix.indptr).astype(np.float64)
+
+    def __len__(self) -> int:
+        return len(self.characters)
+
+    def character(self, name: str) -> Optional[Dict]:
+        """The database record for `name` (case-insensitive), or None."""
+        rows = self._rows_by_name.get((name or "").lower())
+        return self.characters[rows[0]] if rows else None
+
+    def jaccard_distances(self, tags: List[str]) -> np.ndarray:
+        """Jaccard distance between `tags` and every character, in database order."""
+        tag_set = set(tags)
+        columns = [self.vocabulary[tag] for tag in tag_set if tag in self.vocabulary]
+        if columns:
+            intersection = np.asarray(self._matrix[:, columns].sum(axis=1), dtype=np.float64).ravel()
+        else:
+            intersection = np.zeros(len(self.characters))
+        union = self._tag_counts + len(tag_set) - intersection
+
+        # Two empty tag sets are treated as identical (distance 0.0)
+        distances = np.zeros(len(self.characters))
+        np.divide(intersection, union, out=distances, where=union > 0)
+        np.subtract(1.0, distances, out=distances, where=union > 0)
+        return distances
+
+    def query(self, name: str, tags: List[str], top_n: int = 3) -> List[Dict]:
+        """Returns the `top_n` closest characters, excluding `name` itself."""
+        if not self.characters or top_n <= 0:
+            return []
+
+        distances = self.jaccard_distances(tags)
+        candidates = np.ones(len(self.characters), dtype=bool)
+        # Don't compare a character with itself
+        candidates[self._rows_by_name.get((name or "").lower(), [])] = False
+        candidate_rows = np.flatnonzero(candidates)
+        if candidate_rows.size == 0:
+            return []
+
+        candidate_distances = distances[candidate_rows]
+        k = min(top_n, candidate_rows.size)
+        if k < candidate_rows.size:
+            top = np.argpartition(candidate_distances, k - 1)[:k]
+            # argpartition is not stable, so ties at the boundary are resolved by
+            # database position to match a stable sort of the full list
+            boundary = candidate_distances[top].max()
+            below = np.flatnonzero(candidate_distances < boundary)
+            ties = np.flatnonzero(candidate_distances == boundary)[:k - below.size]
+            top = np.concatenate((below, ties))
+        else:
+            top = np.arange(candidate_rows.size)
+        top = top[np.lexsort((candidate_rows[top], candidate_distances[top]))][:k]
+
+        return [
+            {
+                "name": self.characters[row]["name"],
+                "anime": self.characters[row]["anime"],
+                "distance": float(candidate_distances[i]),
+            }
+            for i, row in zip(top, candidate_rows[top])
+        ]
+
+
+_index: Optional[SimilarityIndex] = None
+_index_mtime: Optional[float] = None
+_index_lock = threading.Lock()
+
+def get_index(path: str = CHARACTER_DB_PATH) -> SimilarityIndex:
+    """
+    Returns the index for the character database, building it on first use
+    and rebuilding it whenever the file on disk changes.
+    """
+    global _index, _index_mtime
+    try:
+        mtime = os.stat(path).st_mtime
+    except FileNotFoundError:
+        mtime = None
+
+    if _index is None or mtime != _index_mtime:
+        with _index_lock:
+            if _index is None or mtime != _index_mtime:
+                _index = SimilarityIndex(_load_character_database(path))
+                _index_mtime = mtime
+                logger.info("Built similarity index: %d characters, %d tags.", len(_index), len(_index.vocabulary))
+    return _index
 
 def find_similar_characters(
     predicted_character_name: str,
@@ -30,60 +146,15 @@ def find_similar_characters(
     """
     Finds the most similar characters based on Jaccard distance of their tags.
     """
-    # --- START OF DEBUGGING ---
-    print("\n" + "="*50)
-    print("--- Running Similarity Service ---")
-    print(f"Searching for characters similar to: '{predicted_character_name}'")
-    print(f"With tags: {predicted_character_tags}")
-    print("="*50 + "\n")
-    # --- END OF DEBUGGING ---
-
-    character_db = _load_character_database()
-    if not character_db:
-        print("!!! DEBUG: Character database is empty or could not be loaded.")
+    index = get_index()
+    if not len(index):
+        logger.warning("Character database is empty or could not be loaded.")
         return []
 
-    print(f"--- DEBUG: Loaded {len(character_db)} characters from the database.")
-    
-    predicted_tags_set = set(predicted_character_tags)
-    
-    distances = []
-    print("\n--- DEBUG: Calculating distances for each character ---")
-    for db_character in character_db:
-        # Don't compare a character with itself
-        if db_character["name"].lower() == predicted_character_name.lower():
-            print(f"Skipping '{db_character['name']}' (self-comparison).")
-            continue
-        
-        db_tags_set = set(db_character.get("tags", []))
-        distance = _calculate_jaccard_distance(predicted_tags_set, db_tags_set)
-        
-        # --- DEBUG PRINT INSIDE LOOP ---
-        print(f"  - Compared with: '{db_character['name']}'")
-        print(f"    DB Tags: {list(db_tags_set)}")
-        print(f"    Common Tags: {list(predicted_tags_set.intersection(db_tags_set))}")
-        print(f"    Calculated Distance: {distance:.4f}")
-        # --- END DEBUG PRINT ---
-
-        distances.append({
-            "name": db_character["name"], 
-            "anime": db_character["anime"], 
-            "distance": distance
-        })
-    
-    print("\n--- DEBUG: List of all calculated distances (unsorted) ---")
-    print(distances)
-
-    # Sort the characters by their distance (smallest distance is most similar)
-    sorted_characters = sorted(distances, key=lambda x: x["distance"])
-    
-    print("\n--- DEBUG: List of distances (SORTED) ---")
-    print(sorted_characters)
-
-    final_results = sorted_characters[:top_n]
-
-    print("\n--- DEBUG: Final Top 3 Results ---")
-    print(final_results)
-    print("="*50 + "\n")
-
-    return final_results
\ No newline at end of file
+    final_results = index.query(predicted_character_name or "", predicted_character_tags, top_n)
+
+    # Arguments are only formatted when debug logging is actually enabled
+    logger.debug(
+        "Similar to %r with tags %s: %s", predicted_character_name, predicted_character_tags, final_results
+    )
+    return final_results
@@ -0,0 +1,107 @@
+"""
+Accuracy-vs-latency report for the inference backends (MODEL_BACKEND).
+
+Every backend whose artifact exists is timed at a few batch sizes. If train.py's
+validation split is available, top-1 accuracy is measured on it; in every case
+the top-1 agreement with the eager fp32 model is reported, so accuracy lost to
+quantization shows up even without a labelled dataset.
+
+Export the artifacts first with export_model.py, then run from the project root:
+    python -m benchmarks.benchmark_backends --report backend_report.json
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+from types import SimpleNamespace
+
+import torch
+
+from app.services.model_backends import BACKENDS, load_backend
+from export_model import VALIDATION_DATASET_PATH, validation_loader
+
+
+def _latency_ms(backend, batch_size: int, repeats: int) -> float:
+    batch = torch.randn(batch_size, *backend.default_cfg['input_size'])
+    backend(batch)  # warm-up
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        backend(batch)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def _evaluation_batches(val_dir: str, limit: int):
+    """Labelled validation batches if available, otherwise random unlabelled inputs."""
+    if os.path.isdir(val_dir):
+        return [(inputs, labels) for inputs, labels in validation_loader(val_dir, limit=limit)], True
+    torch.manual_seed(0)
+    return [(torch.randn(32, 3, 224, 224), None) for _ in range(max(limit // 32, 1))], False
+
+
+def run_benchmark(args):
+    with open(args.class_names, "r") as f:
+        num_classes = len(json.load(f))
+    settings = SimpleNamespace(
+        MODEL_WEIGHTS_PATH=args.weights,
+        TORCHSCRIPT_MODEL_PATH=args.torchscript,
+        ONNX_MODEL_PATH=args.onnx,
+        QUANTIZED_MODEL_PATH=args.quantized,
+        CHANNELS_LAST=True,
+        SHARED_WEIGHTS=False,
+        TORCH_NUM_THREADS=0,
+    )
+    batches, labelled = _evaluation_batches(args.val_dir, args.eval_images)
+
+    reference = None
+    results = []
+    for name in BACKENDS:
+        try:
+            backend = load_backend(name, num_classes, settings)
+        except Exception as e:
+            print(f"Skipping {name}: {e}")
+            continue
+
+        predictions = torch.cat([backend(inputs).argmax(dim=1) for inputs, _ in batches])
+        if reference is None:
+            reference = predictions  # eager is first in BACKENDS
+        row = {
+            "backend": name,
+            "agreement_with_eager": float((predictions == reference).float().mean()),
+            "latency_ms": {str(bs): _latency_ms(backend, bs, args.repeats) for bs in args.batch_sizes},
+        }
+        if labelled:
+            labels = torch.cat([labels for _, labels in batches])
+            row["top1_accuracy"] = float((predictions == labels).float().mean())
+        results.append(row)
+
+    header = f"{'backend':<13}{'top-1':>8}{'agree':>8}" + "".join(f"{f'bs={bs} ms':>12}" for bs in args.batch_sizes)
+    print(header)
+    for row in results:
+        accuracy = f"{row['top1_accuracy']:.3f}" if "top1_accuracy" in row else "n/a"
+        latencies = "".join(f"{row['latency_ms'][str(bs)]:>12.1f}" for bs in args.batch_sizes)
+        print(f"{row['backend']:<13}{accuracy:>8}{row['agreement_with_eager']:>8.3f}{latencies}")
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({"labelled": labelled, "threads": torch.get_num_threads(), "results": results}, f, indent=2)
+        print(f"Report written to '{args.report}'")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weights", default="anime_character_model.pth")
+    parser.add_argument("--class-names", default="class_names.json")
+    parser.add_argument("--torchscript", default="anime_character_model.torchscript.pt")
+    parser.add_argument("--onnx", default="anime_character_model.onnx")
+    parser.add_argument("--quantized", default="anime_character_model.int8.pt")
+    parser.add_argument("--val-dir", default=VALIDATION_DATASET_PATH)
+    parser.add_argument("--eval-images", type=int, default=512)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--report", help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    run_benchmark(args)
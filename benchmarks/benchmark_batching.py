@@ -0,0 +1,85 @@
+"""
+Compares the single-image inference path against the micro-batching engine.
+
+Run from the project root:
+    python -m benchmarks.benchmark_batching
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import timm
+import torch
+
+from app.services.batch_inference import BatchInferenceEngine
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def _drive(predict, concurrency: int, total_requests: int, image: torch.Tensor):
+    """Fires `total_requests` calls with at most `concurrency` in flight."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one_request():
+        async with semaphore:
+            start = time.perf_counter()
+            await predict(image)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_request() for _ in range(total_requests)))
+    elapsed = time.perf_counter() - start
+    return {
+        "throughput_rps": total_requests / elapsed,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000,
+    }
+
+
+async def run_benchmark(concurrency_levels, total_requests, max_batch_size, max_wait_ms):
+    with open("class_names.json", "r") as f:
+        num_classes = len(json.load(f))
+    model = timm.create_model('efficientnet_b0', pretrained=False, num_classes=num_classes).eval()
+    image = torch.randn(3, 224, 224)
+
+    async def single_image_predict(image_tensor):
+        # The original path: one blocking forward pass per request, on the event loop
+        with torch.no_grad():
+            output = model(image_tensor.unsqueeze(0))
+        probabilities = torch.nn.functional.softmax(output[0], dim=0)
+        return output.argmax(-1).item(), probabilities.max().item()
+
+    engine = BatchInferenceEngine(model, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    engine.start()
+
+    # Warm up both paths so the first measurement is not penalised
+    await single_image_predict(image)
+    await engine.predict(image)
+
+    print(f"{'mode':<10}{'conc':>6}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for concurrency in concurrency_levels:
+        for mode, predict in (("single", single_image_predict), ("batched", engine.predict)):
+            stats = await _drive(predict, concurrency, total_requests, image)
+            print(f"{mode:<10}{concurrency:>6}{stats['throughput_rps']:>10.1f}"
+                  f"{stats['p50_ms']:>10.1f}{stats['p99_ms']:>10.1f}")
+
+    await engine.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 32])
+    parser.add_argument("--requests", type=int, default=128)
+    parser.add_argument("--max-batch-size", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    asyncio.run(run_benchmark(args.concurrency, args.requests, args.max_batch_size, args.max_wait_ms))
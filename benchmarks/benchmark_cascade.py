@@ -0,0 +1,101 @@
+"""
+Escalation rate, latency and accuracy of the student/full-model cascade
+(CASCADE_ENABLED) against the full model alone.
+
+The student's and the full model's predictions are computed once for the
+evaluation images; for each escalation threshold the cascade's answers follow
+from them exactly. Latency is measured by running the cascade itself one image
+at a time, as a lone /recognize request would. If train.py's validation split
+is available, top-1 accuracy is measured on it; in every case the top-1
+agreement with the full model is reported.
+
+Train the student first with train.py --distill, then run from the project root:
+    python -m benchmarks.benchmark_cascade --report cascade_report.json
+"""
+import argparse
+import json
+import statistics
+import time
+
+import torch
+
+from app.services.model_backends import CascadeBackend, EagerBackend
+from benchmarks.benchmark_backends import _evaluation_batches
+from export_model import VALIDATION_DATASET_PATH
+from train import STUDENT_MODEL_NAME
+
+
+def _mean_latency_ms(backend, images: torch.Tensor) -> float:
+    backend(images[:1])  # warm-up
+    timings = []
+    for image in images:
+        start = time.perf_counter()
+        backend(image[None])
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.mean(timings)
+
+
+def run_benchmark(args):
+    with open(args.class_names, "r") as f:
+        num_classes = len(json.load(f))
+    full = EagerBackend(num_classes, args.weights)
+    student = EagerBackend(num_classes, args.student_weights, model_name=args.student_model)
+    batches, labelled = _evaluation_batches(args.val_dir, args.eval_images)
+
+    student_probabilities = torch.cat([torch.softmax(student(inputs).float(), dim=1) for inputs, _ in batches])
+    student_confidence, student_predictions = student_probabilities.max(dim=1)
+    full_predictions = torch.cat([full(inputs).argmax(dim=1) for inputs, _ in batches])
+    labels = torch.cat([labels for _, labels in batches]) if labelled else None
+    latency_images = torch.cat([inputs for inputs, _ in batches])[:args.latency_images]
+
+    def row(name, predictions, escalation_rate, latency_ms):
+        result = {
+            "model": name,
+            "escalation_rate": escalation_rate,
+            "mean_latency_ms": latency_ms,
+            "agreement_with_full": float((predictions == full_predictions).float().mean()),
+        }
+        if labelled:
+            result["top1_accuracy"] = float((predictions == labels).float().mean())
+        return result
+
+    results = [
+        row("full", full_predictions, 1.0, _mean_latency_ms(full, latency_images)),
+        row("student", student_predictions, 0.0, _mean_latency_ms(student, latency_images)),
+    ]
+    for threshold in args.thresholds:
+        escalate = student_confidence < threshold
+        predictions = torch.where(escalate, full_predictions, student_predictions)
+        cascade = CascadeBackend(student, full, threshold)
+        results.append(row(f"cascade@{threshold:g}", predictions, float(escalate.float().mean()),
+                           _mean_latency_ms(cascade, latency_images)))
+
+    print(f"{'model':<15}{'top-1':>8}{'agree':>8}{'escalated':>11}{'ms/image':>10}")
+    for result in results:
+        accuracy = f"{result['top1_accuracy']:.3f}" if "top1_accuracy" in result else "n/a"
+        print(f"{result['model']:<15}{accuracy:>8}{result['agreement_with_full']:>8.3f}"
+              f"{result['escalation_rate']:>11.1%}{result['mean_latency_ms']:>10.1f}")
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({"labelled": labelled, "images": len(student_confidence), "threads": torch.get_num_threads(),
+                       "results": results}, f, indent=2)
+        print(f"Report written to '{args.report}'")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weights", default="anime_character_model.pth")
+    parser.add_argument("--student-weights", default="anime_character_student.pth")
+    parser.add_argument("--student-model", default=STUDENT_MODEL_NAME)
+    parser.add_argument("--class-names", default="class_names.json")
+    parser.add_argument("--val-dir", default=VALIDATION_DATASET_PATH)
+    parser.add_argument("--eval-images", type=int, default=512)
+    parser.add_argument("--latency-images", type=int, default=64,
+                        help="Images timed one at a time for the latency column.")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.5, 0.7, 0.8, 0.9, 0.95],
+                        help="CASCADE_ESCALATE_BELOW values to compare.")
+    parser.add_argument("--report", help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    run_benchmark(args)
@@ -0,0 +1,76 @@
+"""
+Measures worker cold start: the time from spawning uvicorn until /healthz
+answers (the worker accepts connections) and until /readyz reports the model
+warmed up. Runs with background model loading on and off for comparison.
+
+Run from the project root:
+    python -m benchmarks.benchmark_cold_start --runs 3
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for(client: httpx.Client, url: str, started: float, timeout: float) -> float:
+    while time.perf_counter() - started < timeout:
+        try:
+            if client.get(url).status_code == 200:
+                return time.perf_counter() - started
+        except httpx.TransportError:
+            pass
+        time.sleep(0.02)
+    raise TimeoutError(f"{url} did not become healthy within {timeout}s")
+
+
+def measure_once(background_loading: bool, timeout: float):
+    port = _free_port()
+    env = dict(os.environ, BACKGROUND_MODEL_LOADING=str(background_loading).lower())
+    env.setdefault("GOOGLE_API_KEY", "benchmark")
+    env.setdefault("MAL_CLIENT_ID", "benchmark")
+
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=1.0) as client:
+            live = _wait_for(client, "/healthz", started, timeout)
+            ready = _wait_for(client, "/readyz", started, timeout)
+            phases = client.get("/readyz").json().get("startup_seconds", {})
+    finally:
+        process.terminate()
+        process.wait()
+    return live, ready, phases
+
+
+def run_benchmark(runs: int, timeout: float):
+    print(f"{'background loading':<20}{'live s':>9}{'ready s':>9}{'model load s':>14}{'warm-up s':>11}")
+    for background_loading in (True, False):
+        results = [measure_once(background_loading, timeout) for _ in range(runs)]
+        live = statistics.median(r[0] for r in results)
+        ready = statistics.median(r[1] for r in results)
+        model_load = statistics.median(r[2].get("model_load", 0.0) for r in results)
+        warm_up = statistics.median(r[2].get("warm_up", 0.0) for r in results)
+        print(f"{str(background_loading):<20}{live:>9.2f}{ready:>9.2f}{model_load:>14.2f}{warm_up:>11.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    run_benchmark(args.runs, args.timeout)
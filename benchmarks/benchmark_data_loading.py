@@ -0,0 +1,90 @@
+"""
+Training-input throughput (images/sec) of train.py's two data pipelines:
+
+- folders: split_dataset() copies, then ImageFolder decoding full-size JPEGs
+  and applying PIL transforms every epoch;
+- shards:  prepare_shards.py's pre-decoded uint8 shards, memory-mapped by
+  ShardedImageDataset, tensor augmentation, persistent workers, prefetching
+  and per-batch normalization.
+
+Only data loading is measured (batches are drawn and normalized, no model).
+The first epoch includes worker start-up, later ones show steady state. A
+synthetic dataset of photo-sized JPEGs is generated unless --source is given.
+
+Run from the project root:
+    python -m benchmarks.benchmark_data_loading --epochs 3
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.benchmark_decode import _synthetic_image
+
+
+def make_dataset(path: str, classes: int, images_per_class: int, width: int, height: int) -> None:
+    content = _synthetic_image(width, height, "JPEG")
+    for c in range(classes):
+        class_path = os.path.join(path, f"class_{c:03d}")
+        os.makedirs(class_path)
+        for i in range(images_per_class):
+            with open(os.path.join(class_path, f"{i:05d}.jpg"), "wb") as f:
+                f.write(content)
+
+
+def _images_per_second(loader, epochs: int, normalize_batch):
+    rates = []
+    for _ in range(epochs):
+        start = time.perf_counter()
+        count = 0
+        for inputs, _ in loader:
+            normalize_batch(inputs)
+            count += len(inputs)
+        rates.append(count / (time.perf_counter() - start))
+    return rates
+
+
+def run_benchmark(args):
+    import train
+    from prepare_shards import write_shards
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = args.source
+        if source is None:
+            source = os.path.join(tmp, "dataset")
+            make_dataset(source, args.classes, args.images_per_class, args.width, args.height)
+
+        folders = os.path.join(tmp, "processed")
+        start = time.perf_counter()
+        train.split_dataset(source, folders, train.VALIDATION_SPLIT)
+        split_seconds = time.perf_counter() - start
+
+        shards = os.path.join(tmp, "shards")
+        start = time.perf_counter()
+        write_shards(source, shards, 256, 2048, train.VALIDATION_SPLIT, 0, args.num_workers or 1)
+        shard_seconds = time.perf_counter() - start
+
+        print(f"\nPreparation: split_dataset {split_seconds:.1f}s, prepare_shards {shard_seconds:.1f}s")
+        print(f"{'pipeline':<10}" + "".join(f"{f'epoch {e + 1}':>12}" for e in range(args.epochs)) + "  (images/sec)")
+        for name, shards_path in (("folders", None), ("shards", shards)):
+            dataset = train.build_datasets(shards_path, folders)['train']
+            loader = train.build_dataloader(dataset, shuffle=True, num_workers=args.num_workers)
+            rates = _images_per_second(loader, args.epochs, train.normalize_batch)
+            print(f"{name:<10}" + "".join(f"{rate:>12.0f}" for rate in rates))
+            del loader
+        shutil.rmtree(folders)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", default=None, help="A class-per-folder dataset to use instead of synthetic images.")
+    parser.add_argument("--classes", type=int, default=8)
+    parser.add_argument("--images-per-class", type=int, default=80)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=960)
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--num-workers", type=int, default=4)
+    args = parser.parse_args()
+
+    run_benchmark(args)
@@ -0,0 +1,94 @@
+"""
+Training throughput of train.py's DDP mode on one machine, from 1 to N
+processes. Each configuration spawns its processes with the same
+environment torchrun provides, joins them through train.setup_distributed()
+(gloo, cores split evenly between processes) and trains on in-memory
+synthetic uint8 images with train.run_epoch(), so disk and decoding stay
+out of the measurement.
+
+Run from the project root:
+    python -m benchmarks.benchmark_ddp_scaling --max-processes 4
+"""
+import argparse
+import os
+import socket
+
+import torch.multiprocessing as mp
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _worker(rank: int, world_size: int, port: int, args, results):
+    os.environ.update({
+        "RANK": str(rank), "LOCAL_RANK": str(rank), "WORLD_SIZE": str(world_size),
+        "LOCAL_WORLD_SIZE": str(world_size), "MASTER_ADDR": "127.0.0.1", "MASTER_PORT": str(port),
+    })
+    import timm
+    import torch
+    import torch.distributed as dist
+    import torch.nn as nn
+    from torch.nn.parallel import DistributedDataParallel
+    from torch.utils.data import DataLoader, DistributedSampler, TensorDataset
+
+    import train
+
+    if world_size > 1:
+        train.setup_distributed(args.threads_per_process)
+    else:
+        torch.set_num_threads(args.threads_per_process or os.cpu_count())
+    torch.manual_seed(0)
+    images = torch.randint(0, 256, (args.images, 3, args.image_size, args.image_size), dtype=torch.uint8)
+    labels = torch.randint(0, args.classes, (args.images,))
+    dataset = TensorDataset(images, labels)
+    sampler = DistributedSampler(dataset) if world_size > 1 else None
+    loader = DataLoader(dataset, batch_size=args.batch_size, sampler=sampler, shuffle=sampler is None)
+
+    model = timm.create_model(train.MODEL_NAME, pretrained=False, num_classes=args.classes)
+    step_model = DistributedDataParallel(model) if world_size > 1 else model
+    optimizer = torch.optim.Adam(model.parameters(), lr=train.LEARNING_RATE)
+    criterion = nn.CrossEntropyLoss()
+    device = torch.device("cpu")
+
+    rates = []
+    for epoch in range(args.epochs + 1):  # The first epoch is a warm-up
+        if sampler is not None:
+            sampler.set_epoch(epoch)
+        _, _, images_per_second = train.run_epoch(step_model, loader, criterion, optimizer, 'train', device,
+                                                     progress=False)
+        rates.append(images_per_second)
+    if rank == 0:
+        results.put((torch.get_num_threads(), max(rates[1:])))
+    if world_size > 1:
+        dist.destroy_process_group()
+
+
+def run_benchmark(args):
+    context = mp.get_context("spawn")
+    print(f"{args.images} images of {args.image_size}px, batch {args.batch_size} per process, {os.cpu_count()} cores")
+    print(f"{'processes':>10}{'threads':>9}{'images/sec':>12}{'speedup':>9}{'efficiency':>12}")
+    baseline = None
+    for world_size in range(1, args.max_processes + 1):
+        results = context.Queue()
+        mp.start_processes(_worker, args=(world_size, _free_port(), args, results), nprocs=world_size,
+                           start_method="spawn")
+        threads, rate = results.get()
+        baseline = baseline or rate
+        print(f"{world_size:>10}{threads:>9}{rate:>12.1f}{rate / baseline:>8.2f}x{rate / baseline / world_size:>11.0%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-processes", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--threads-per-process", type=int, default=0, help="Default: cores / processes.")
+    parser.add_argument("--images", type=int, default=256)
+    parser.add_argument("--image-size", type=int, default=224)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--classes", type=int, default=46)
+    parser.add_argument("--epochs", type=int, default=2)
+    args = parser.parse_args()
+
+    run_benchmark(args)
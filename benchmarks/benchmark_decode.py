@@ -0,0 +1,138 @@
+"""
+Latency and peak memory of turning upload bytes into a model input tensor:
+the original path (full-resolution PIL decode, then torchvision's Resize,
+CenterCrop, ToTensor and Normalize) against the API's current one (draft /
+reduced decode from image_service, then model_service.Preprocess).
+
+Peak memory is how far decoding one image raises the process's peak RSS
+above its RSS just before, measured in a fresh subprocess per case. On Linux
+the peak is reset first (/proc/self/clear_refs) so import-time allocations
+don't hide it; elsewhere small images may report 0.
+
+Run from the project root:
+    python -m benchmarks.benchmark_decode
+"""
+import argparse
+import io
+import multiprocessing
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+PIPELINES = ("original", "fast")
+
+
+def _pipeline(name: str):
+    from torchvision import transforms
+
+    from app.services.image_service import decode_image
+    from app.services.model_backends import preprocess_config
+    from app.services.model_service import build_transform
+
+    cfg = preprocess_config()
+    if name == "original":
+        transform = transforms.Compose([
+            transforms.Resize(cfg['input_size'][1:]),
+            transforms.CenterCrop(cfg['input_size'][1:]),
+            transforms.ToTensor(),
+            transforms.Normalize(mean=cfg['mean'], std=cfg['std']),
+        ])
+        return lambda content: transform(Image.open(io.BytesIO(content)).convert("RGB"))
+
+    preprocess = build_transform(cfg)
+    return lambda content: preprocess(decode_image(content, preprocess.size))
+
+
+def _proc_status_mb(field: str) -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024  # reported in kB
+    raise KeyError(field)
+
+
+def _reset_peak_rss() -> float:
+    """Resets the peak RSS to the current RSS where supported; returns the current RSS in MB."""
+    if os.path.exists("/proc/self/clear_refs"):
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return _proc_status_mb("VmRSS")
+    return _peak_rss_mb()
+
+
+def _peak_rss_mb() -> float:
+    if os.path.exists("/proc/self/status"):
+        return _proc_status_mb("VmHWM")
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def _measure_memory(pipeline_name: str, path: str) -> float:
+    """Runs in a fresh process: how far one decode raises the RSS high-water mark."""
+    run = _pipeline(pipeline_name)
+    with open(path, "rb") as f:
+        content = f.read()
+    before = _reset_peak_rss()
+    run(content)
+    return _peak_rss_mb() - before
+
+
+def _measure_latency_ms(pipeline_name: str, content: bytes, repeats: int) -> float:
+    run = _pipeline(pipeline_name)
+    run(content)  # warm-up
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run(content)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def _synthetic_image(width: int, height: int, image_format: str) -> bytes:
+    """A photo-like image (smooth fractal plus noise) so the encoders do real work."""
+    fractal = Image.effect_mandelbrot((width, height), (-2.0, -1.5, 1.0, 1.5), 64)
+    noise = Image.effect_noise((width, height), 24)
+    image = Image.merge("RGB", (fractal, noise, Image.blend(fractal, noise, 0.5)))
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, **({"quality": 90} if image_format == "JPEG" else {}))
+    return buffer.getvalue()
+
+
+def run_benchmark(sizes, formats, repeats: int):
+    context = multiprocessing.get_context("spawn")
+    print(f"{'image':<18}{'format':>7}{'KB':>8}" + "".join(
+        f"{f'{name} ms':>13}{f'{name} MB':>13}" for name in PIPELINES
+    ))
+    with tempfile.TemporaryDirectory() as tmp:
+        for width, height in sizes:
+            for image_format in formats:
+                content = _synthetic_image(width, height, image_format)
+                path = os.path.join(tmp, f"{width}x{height}.{image_format.lower()}")
+                with open(path, "wb") as f:
+                    f.write(content)
+
+                row = f"{f'{width}x{height}':<18}{image_format:>7}{len(content) // 1024:>8}"
+                for name in PIPELINES:
+                    latency = _measure_latency_ms(name, content, repeats)
+                    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                        memory = pool.submit(_measure_memory, name, path).result()
+                    row += f"{latency:>13.1f}{memory:>13.1f}"
+                print(row)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", default=["640x480", "1920x1080", "4032x3024", "8000x6000"],
+                        help="Image sizes as WIDTHxHEIGHT.")
+    parser.add_argument("--formats", nargs="+", default=["JPEG", "PNG"])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    run_benchmark([tuple(int(v) for v in size.split("x")) for size in args.sizes], args.formats, args.repeats)
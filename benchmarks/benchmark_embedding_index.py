@@ -0,0 +1,69 @@
+"""
+Query latency and recall of EmbeddingIndex on synthetic galleries: exact
+search (one matrix-vector product over every vector) against the inverted
+file built by build_embedding_index.py --ivf-lists, at a few nprobe values.
+
+Recall@1 is how often the approximate search ranks the exact search's best
+label first; top-k is the overlap of the two top-k label sets. Vectors are
+clustered around per-label centres, like per-image embeddings of the same
+character.
+
+Run from the project root:
+    python -m benchmarks.benchmark_embedding_index
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.services.embedding_index import EmbeddingIndex, build_ivf, normalize
+
+
+def make_gallery(size: int, labels: int, dims: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((labels, dims)).astype(np.float32)
+    assigned = rng.integers(0, labels, size)
+    vectors = centres[assigned] + 0.5 * rng.standard_normal((size, dims)).astype(np.float32)
+    queries = centres[rng.integers(0, labels, 100)] + 0.5 * rng.standard_normal((100, dims)).astype(np.float32)
+    return normalize(vectors), assigned, queries
+
+
+def _time_queries(index, queries, top_k):
+    start = time.perf_counter()
+    results = [index.search(query, top_k) for query in queries]
+    return (time.perf_counter() - start) / len(queries) * 1000, results
+
+
+def run_benchmark(sizes, labels, dims, ivf_lists, nprobes, top_k):
+    print(f"{'vectors':>9}{'search':>14}{'query ms':>10}{'recall@1':>10}{'top-k':>8}")
+    for size in sizes:
+        vectors, assigned, queries = make_gallery(size, labels, dims)
+        exact = EmbeddingIndex(vectors, assigned)
+        exact_ms, expected = _time_queries(exact, queries, top_k)
+        print(f"{size:>9}{'exact':>14}{exact_ms:>10.2f}{1:>10.2f}{1:>8.2f}")
+
+        start = time.perf_counter()
+        centroids, assignments = build_ivf(vectors, ivf_lists)
+        print(f"{'':>9}{'(ivf build)':>14}{(time.perf_counter() - start) * 1000:>10.0f}")
+        for nprobe in nprobes:
+            index = EmbeddingIndex(vectors, assigned, centroids, assignments, nprobe=nprobe)
+            ivf_ms, results = _time_queries(index, queries, top_k)
+            recall_at_1 = np.mean([got[0][0] == want[0][0] for got, want in zip(results, expected)])
+            overlap = np.mean([
+                len({label for label, _ in got} & {label for label, _ in want}) / len(want)
+                for got, want in zip(results, expected)
+            ])
+            print(f"{'':>9}{f'ivf nprobe={nprobe}':>14}{ivf_ms:>10.2f}{recall_at_1:>10.2f}{overlap:>8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--labels", type=int, default=1000)
+    parser.add_argument("--dims", type=int, default=1280, help="EfficientNet-B0's penultimate layer is 1280 wide.")
+    parser.add_argument("--ivf-lists", type=int, default=256)
+    parser.add_argument("--nprobes", type=int, nargs="+", default=[4, 8, 32])
+    parser.add_argument("--top-k", type=int, default=3)
+    args = parser.parse_args()
+
+    run_benchmark(args.sizes, args.labels, args.dims, args.ivf_lists, args.nprobes, args.top_k)
@@ -0,0 +1,109 @@
+"""
+Tail latency of character image lookups through ImageUrlResolver, against
+local MAL and Jikan stubs. MAL is given a heavy tail (most answers are fast,
+a few take seconds) to show what fallback and hedging buy:
+
+- mal:             MAL only
+- mal>jikan:       Jikan only after MAL misses or fails
+- mal>jikan hedge: Jikan also starts if MAL hasn't answered within --hedge-ms
+
+Every lookup uses a distinct name so the URL cache doesn't hide the providers;
+a final row repeats the names to show cached lookups.
+
+Run from the project root:
+    python -m benchmarks.benchmark_image_providers --lookups 200
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+
+from benchmarks.stub_servers import StubServer, jikan_characters_handler, mal_characters_handler
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _heavy_tail(fast: float, slow: float, slow_fraction: float, rng: random.Random):
+    return lambda: slow if rng.random() < slow_fraction else fast
+
+
+async def _measure(resolver, names, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(name):
+        async with semaphore:
+            start = time.perf_counter()
+            await resolver.get_image_url(name)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(one(name) for name in names))
+    return latencies
+
+
+async def run_benchmark(args):
+    from app.core.cache import TieredCache
+    from app.services.image_providers import ImageUrlResolver, hedges_total
+    from app.services.jikan_service import JikanProvider
+    from app.services.mal_service import MalProvider
+
+    rng = random.Random(0)
+    mal_latency = _heavy_tail(args.mal_ms / 1000, args.mal_slow_ms / 1000, args.mal_slow_fraction, rng)
+    jikan_latency = args.jikan_ms / 1000
+
+    with StubServer({"/characters": mal_characters_handler}, latency=mal_latency) as mal_stub, \
+            StubServer({"/characters": jikan_characters_handler}, latency=jikan_latency) as jikan_stub:
+        from app.core.config import Settings
+        settings = Settings(
+            MAL_API_BASE_URL=mal_stub.base_url, JIKAN_API_BASE_URL=jikan_stub.base_url,
+            # The stub has no rate limit; keep Jikan's token bucket out of the measurement
+            JIKAN_RATE_LIMIT_PER_SECOND=10_000, JIKAN_RATE_LIMIT_BURST=10_000,
+        )
+
+        setups = [
+            ("mal", [MalProvider], 0),
+            ("mal>jikan", [MalProvider, JikanProvider], 0),
+            ("mal>jikan hedge", [MalProvider, JikanProvider], args.hedge_ms),
+        ]
+        print(f"MAL {args.mal_ms:.0f} ms ({args.mal_slow_fraction:.0%} at {args.mal_slow_ms:.0f} ms), "
+              f"Jikan {args.jikan_ms:.0f} ms, {args.lookups} lookups, concurrency {args.concurrency}")
+        print(f"{'providers':<18}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}{'hedges':>8}")
+        for run, (label, provider_types, hedge_ms) in enumerate(setups):
+            resolver = ImageUrlResolver(
+                [provider(settings) for provider in provider_types],
+                TieredCache(max_entries=args.lookups * 2),
+                hedge_after_ms=hedge_ms,
+            )
+            names = [f"Character {run}-{i}" for i in range(args.lookups)]
+            hedges_before = hedges_total.value()
+            latencies = await _measure(resolver, names, args.concurrency)
+            hedges = hedges_total.value() - hedges_before
+            print(f"{label:<18}{_percentile(latencies, 50):>9.1f}{_percentile(latencies, 95):>9.1f}"
+                  f"{_percentile(latencies, 99):>9.1f}{max(latencies):>9.1f}{hedges:>8.0f}")
+
+            if run == len(setups) - 1:
+                cached = await _measure(resolver, names, args.concurrency)
+                print(f"{'  (cached)':<18}{_percentile(cached, 50):>9.2f}{_percentile(cached, 95):>9.2f}"
+                      f"{_percentile(cached, 99):>9.2f}{max(cached):>9.2f}{0:>8}")
+            await resolver.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--mal-ms", type=float, default=60.0)
+    parser.add_argument("--mal-slow-ms", type=float, default=2000.0)
+    parser.add_argument("--mal-slow-fraction", type=float, default=0.05)
+    parser.add_argument("--jikan-ms", type=float, default=120.0)
+    parser.add_argument("--hedge-ms", type=float, default=200.0)
+    args = parser.parse_args()
+
+    os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+    os.environ.setdefault("MAL_CLIENT_ID", "benchmark")
+    asyncio.run(run_benchmark(args))
@@ -0,0 +1,72 @@
+"""
+Measures the image-URL enrichment step of /recognize against a local Jikan stub:
+the old serialized `requests.get` + `time.sleep(1)` path versus the async
+client running every lookup concurrently under the shared rate limiter.
+
+Run from the project root:
+    python -m benchmarks.benchmark_jikan
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import requests
+
+from benchmarks.stub_servers import StubServer, jikan_characters_handler
+
+NAMES = ["Gojo Satoru", "Megumi Fushiguro", "Yuji Itadori", "Nobara Kugisaki"]
+
+
+def legacy_lookup(base_url: str, character_name: str):
+    """The original jikan_service implementation, kept here as the baseline."""
+    try:
+        response = requests.get(f"{base_url}/characters?q={character_name}&limit=1")
+        response.raise_for_status()
+        data = response.json()
+        return data["data"][0]["images"]["jpg"]["image_url"] if data.get("data") else None
+    finally:
+        time.sleep(1)
+
+
+async def run_benchmark(rounds: int, latency_ms: float):
+    with StubServer({"/characters": jikan_characters_handler}, latency=latency_ms / 1000) as stub:
+        os.environ["JIKAN_API_BASE_URL"] = stub.base_url
+        os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+        os.environ.setdefault("MAL_CLIENT_ID", "benchmark")
+        from app.core.config import Settings
+        from app.services.jikan_service import JikanProvider
+
+        # The provider alone, without the resolver's URL cache, so every round hits the stub
+        provider = JikanProvider(Settings())
+
+        legacy_times, async_times = [], []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            for name in NAMES:
+                legacy_lookup(stub.base_url, name)
+            legacy_times.append(time.perf_counter() - start)
+
+            # Let the token bucket refill so every round starts from the same state
+            await asyncio.sleep(len(NAMES) / provider.rate_limiter.rate)
+            start = time.perf_counter()
+            await asyncio.gather(*(provider.lookup(name) for name in NAMES))
+            async_times.append(time.perf_counter() - start)
+
+        await provider.close()
+
+    legacy_avg = sum(legacy_times) / rounds
+    async_avg = sum(async_times) / rounds
+    print(f"{len(NAMES)} lookups per request, stub latency {latency_ms:.0f} ms, {rounds} rounds")
+    print(f"  serialized + sleep(1): {legacy_avg * 1000:8.1f} ms")
+    print(f"  async + token bucket:  {async_avg * 1000:8.1f} ms")
+    print(f"  speedup:               {legacy_avg / async_avg:8.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    args = parser.parse_args()
+
+    asyncio.run(run_benchmark(args.rounds, args.latency_ms))
@@ -0,0 +1,84 @@
+"""
+Compares the original per-request JSON scan in find_similar_characters with
+the vectorized SimilarityIndex on synthetic character databases.
+
+Run from the project root:
+    python -m benchmarks.benchmark_similarity --report similarity_report.json
+"""
+import argparse
+import json
+import random
+import time
+
+from app.services.similarity_service import SimilarityIndex
+
+TAG_POOL = [f"{colour} {feature}" for colour in
+            ("black", "white", "red", "blue", "green", "pink", "silver", "blonde", "purple", "orange")
+            for feature in ("hair", "eyes", "cloak", "uniform", "scarf", "gloves", "boots", "armor")]
+TAG_POOL += ["glasses", "scar", "sword", "ponytail", "hat", "child", "tall", "muscular", "student", "pirate"]
+
+
+def make_database(size: int, seed: int = 0):
+    rng = random.Random(seed)
+    return [
+        {"name": f"Character {i}", "anime": f"Anime {i % 500}", "tags": rng.sample(TAG_POOL, rng.randint(4, 8))}
+        for i in range(size)
+    ]
+
+
+def legacy_find_similar(character_db, name, tags, top_n=3):
+    """The original implementation, minus the debug printing."""
+    predicted = set(tags)
+    distances = []
+    for db_character in character_db:
+        if db_character["name"].lower() == name.lower():
+            continue
+        db_tags = set(db_character.get("tags", []))
+        union = len(predicted | db_tags)
+        distance = 0.0 if union == 0 else 1.0 - len(predicted & db_tags) / union
+        distances.append({"name": db_character["name"], "anime": db_character["anime"], "distance": distance})
+    return sorted(distances, key=lambda x: x["distance"])[:top_n]
+
+
+def _time_per_call(fn, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def run_benchmark(sizes, repeats, report=None):
+    query_tags = ["black hair", "red eyes", "sword", "scar", "black cloak"]
+    print(f"{'characters':>11}{'build ms':>11}{'scan ms':>11}{'index ms':>11}{'speedup':>9}")
+    results = []
+    for size in sizes:
+        character_db = make_database(size)
+
+        start = time.perf_counter()
+        index = SimilarityIndex(character_db)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        # Sanity check: both implementations must return the same characters
+        expected = legacy_find_similar(character_db, "Character 0", query_tags)
+        actual = index.query("Character 0", query_tags)
+        assert [c["name"] for c in expected] == [c["name"] for c in actual]
+
+        scan_ms = _time_per_call(lambda: legacy_find_similar(character_db, "Character 0", query_tags), repeats)
+        index_ms = _time_per_call(lambda: index.query("Character 0", query_tags), repeats)
+        print(f"{size:>11}{build_ms:>11.1f}{scan_ms:>11.2f}{index_ms:>11.2f}{scan_ms / index_ms:>8.0f}x")
+        results.append({"characters": size, "build_ms": build_ms, "scan_ms": scan_ms, "index_ms": index_ms})
+
+    if report:
+        with open(report, "w") as f:
+            json.dump({"repeats": repeats, "results": results}, f, indent=2)
+        print(f"Report written to '{report}'")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--report", help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    run_benchmark(args.sizes, args.repeats, args.report)
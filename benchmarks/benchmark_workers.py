@@ -0,0 +1,116 @@
+"""
+Per-worker memory of the API under `uvicorn --workers N`, with every worker
+copying the model weights (the default) and with SHARED_WEIGHTS, where the
+workers memory-map one copy from the file export_model.py writes.
+
+RSS counts shared pages in full in every process, so summing it overstates
+what the workers cost together; PSS divides each shared page among the
+processes mapping it, so the PSS total is what the node actually spends.
+Linux only (reads /proc).
+
+Export the shared weights first with export_model.py, then run from the project root:
+    python -m benchmarks.benchmark_workers --workers 4 --report workers_report.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from app.core.telemetry import process_memory
+from benchmarks.benchmark_cold_start import _free_port, _wait_for
+
+MODES = {
+    "copied": {"SHARED_WEIGHTS": "false"},
+    "shared": {"SHARED_WEIGHTS": "true"},
+}
+
+
+def _children(pid: int):
+    """Worker processes of the uvicorn supervisor `pid` (multiprocessing's resource tracker excluded)."""
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces; the parent pid is the second field after it
+                parent = int(f.read().rsplit(")", 1)[1].split()[1])
+            with open(f"/proc/{entry}/cmdline", "rb") as f:
+                cmdline = f.read()
+        except (OSError, IndexError, ValueError):
+            continue
+        if parent == pid and b"resource_tracker" not in cmdline:
+            children.append(int(entry))
+    return sorted(children)
+
+
+def _settled_memory(pids, settle_seconds: float, timeout: float):
+    """process_memory() of every pid once none of their RSS has moved for `settle_seconds`."""
+    started = time.perf_counter()
+    last, stable_since = None, time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        usage = {pid: process_memory(pid) for pid in pids}
+        rss = {pid: memory.get("rss", 0) for pid, memory in usage.items()}
+        if rss != last:
+            last, stable_since = rss, time.perf_counter()
+        elif time.perf_counter() - stable_since >= settle_seconds:
+            return usage
+        time.sleep(0.25)
+    raise TimeoutError(f"Worker memory did not settle within {timeout}s")
+
+
+def measure(mode: str, workers: int, timeout: float, settle_seconds: float):
+    port = _free_port()
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), **MODES[mode])
+    env.setdefault("GOOGLE_API_KEY", "benchmark")
+    env.setdefault("MAL_CLIENT_ID", "benchmark")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=1.0) as client:
+            _wait_for(client, "/readyz", time.perf_counter(), timeout)
+        # /readyz answers from whichever worker is ready first; wait for the rest to finish loading
+        pids = _children(process.pid)
+        usage = _settled_memory(pids, settle_seconds, timeout)
+    finally:
+        process.terminate()
+        process.wait()
+    return [{"pid": pid, **{kind: value / 2**20 for kind, value in usage[pid].items()}} for pid in pids]
+
+
+def run_benchmark(args):
+    results = {}
+    for mode in args.modes:
+        results[mode] = measure(mode, args.workers, args.timeout, args.settle_seconds)
+
+    print(f"{'mode':<8}{'worker':>8}{'RSS MB':>9}{'PSS MB':>9}{'private MB':>12}{'shared MB':>11}")
+    for mode, rows in results.items():
+        for i, row in enumerate(rows):
+            print(f"{mode:<8}{i:>8}{row['rss']:>9.0f}{row['pss']:>9.0f}{row['private']:>12.0f}{row['shared']:>11.0f}")
+        print(f"{mode:<8}{'total':>8}{sum(r['rss'] for r in rows):>9.0f}{sum(r['pss'] for r in rows):>9.0f}"
+              f"{sum(r['private'] for r in rows):>12.0f}")
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({"workers": args.workers, "results": results}, f, indent=2)
+        print(f"Report written to '{args.report}'")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--settle-seconds", type=float, default=3.0,
+                        help="How long every worker's RSS must hold still before it is recorded.")
+    parser.add_argument("--report", help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    run_benchmark(args)
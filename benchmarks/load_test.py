@@ -0,0 +1,316 @@
+"""
+End-to-end load test of the recognition API.
+
+Starts local stand-ins for Gemini, Jikan and MAL (stub_servers.py), runs the
+real app under uvicorn pointed at them, and drives /recognize with a corpus
+of images at each --concurrency level. Reports throughput, p50/p95/p99
+latency and how long each request spent in each pipeline stage (from the
+recognizer_stage_duration_seconds spans on /metrics).
+
+--output writes the results as JSON. --baseline compares against an earlier
+file and exits with status 1 when throughput or p95 latency is worse than
+--tolerance, so it can gate a commit.
+
+Without the fine-tuned weights the app runs on random weights, whose
+predictions almost never clear the confidence threshold; the test then
+generates weights whose classifier is fitted to the corpus, so requests go
+through the whole enrichment pipeline for a spread of characters. Microbenchmarks of single components live beside
+this file (benchmark_similarity.py, benchmark_backends.py).
+
+Run from the project root:
+    python -m benchmarks.load_test --concurrency 1 4 16 --requests 200 --output load.json
+    python -m benchmarks.load_test --concurrency 1 4 16 --requests 200 --baseline load.json
+"""
+import argparse
+import asyncio
+import datetime
+import io
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+import httpx
+
+from benchmarks.benchmark_cold_start import _free_port, _wait_for
+from benchmarks.stub_servers import (StubServer, gemini_generate_handler, jikan_characters_handler,
+                                     mal_characters_handler)
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+STAGE_METRIC = re.compile(r'^recognizer_stage_duration_seconds_(sum|count)\{stage="([^"]+)"\} (\S+)$')
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def load_corpus(images_dir, count: int, seed: int = 0):
+    """The images in `images_dir`, or `count` synthetic photo-sized JPEGs."""
+    if images_dir:
+        paths = sorted(os.path.join(root, name) for root, _, names in os.walk(images_dir)
+                       for name in names if name.lower().endswith(IMAGE_EXTENSIONS))
+        corpus = []
+        for path in paths:
+            with open(path, "rb") as f:
+                corpus.append((os.path.basename(path), f.read()))
+        return corpus
+
+    from PIL import Image
+
+    rng = random.Random(seed)
+    sizes = [(640, 480), (1024, 768), (1280, 960), (800, 800)]
+    corpus = []
+    for i in range(count):
+        width, height = sizes[i % len(sizes)]
+        image = Image.merge("RGB", [Image.effect_noise((width, height), rng.uniform(10, 80)) for _ in range(3)])
+        image = image.resize((width // 8, height // 8)).resize((width, height), Image.BICUBIC)
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=90)
+        corpus.append((f"synthetic_{i}.jpg", buffer.getvalue()))
+    return corpus
+
+
+def write_calibrated_weights(path: str, corpus) -> None:
+    """
+    Random weights with the classifier fitted to the corpus: random directions
+    over the centered embeddings, scaled so that predictions are confident and
+    spread over the classes. A random backbone maps every image to nearly the
+    same embedding, so the raw head would always pick one class.
+    """
+    import numpy as np
+    import timm
+    import torch
+
+    from app.services.image_service import decode_image
+    from app.services.model_backends import MODEL_NAME, EagerBackend, preprocess_config
+    from app.services.model_service import build_transform
+
+    with open("class_names.json", "r") as f:
+        num_classes = len(json.load(f))
+    torch.manual_seed(0)
+    model = timm.create_model(MODEL_NAME, pretrained=False, num_classes=num_classes)
+    torch.save(model.state_dict(), path)
+
+    transform = build_transform(preprocess_config())
+    backend = EagerBackend(num_classes, path)
+    inputs = torch.stack([transform(decode_image(content, transform.size)) for _, content in corpus])
+    _, embeddings = backend.forward_with_embeddings(inputs)
+    embeddings = embeddings.float()
+    mean = embeddings.mean(dim=0)
+
+    directions = torch.from_numpy(np.random.default_rng(0).standard_normal((num_classes, len(mean)))).float()
+    # Logits with a standard deviation of 10 make the top class clearly win
+    weight = directions * (10.0 / ((embeddings - mean) @ directions.T).std().clamp_min(1e-12))
+    with torch.no_grad():
+        classifier = model.get_classifier()
+        classifier.weight.copy_(weight)
+        classifier.bias.copy_(-weight @ mean)
+    torch.save(model.state_dict(), path)
+
+
+@contextmanager
+def run_app(env_overrides, timeout: float):
+    """The API under uvicorn in a subprocess; yields its base URL once /readyz answers."""
+    port = _free_port()
+    env = dict(os.environ, **env_overrides)
+    env.setdefault("GOOGLE_API_KEY", "benchmark")
+    env.setdefault("MAL_CLIENT_ID", "benchmark")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        with httpx.Client(base_url=base_url, timeout=1.0) as client:
+            _wait_for(client, "/readyz", time.perf_counter(), timeout)
+        yield base_url
+    finally:
+        process.terminate()
+        process.wait()
+
+
+async def scrape_stages(client: httpx.AsyncClient):
+    """{stage: (total seconds, count)} from /metrics."""
+    stages = {}
+    for line in (await client.get("/metrics")).text.splitlines():
+        match = STAGE_METRIC.match(line)
+        if match:
+            kind, stage, value = match.groups()
+            total, count = stages.get(stage, (0.0, 0))
+            stages[stage] = (float(value), count) if kind == "sum" else (total, int(float(value)))
+    return stages
+
+
+async def drive(client: httpx.AsyncClient, corpus, concurrency: int, total_requests: int, offset: int = 0):
+    """Sends `total_requests` uploads with at most `concurrency` in flight; returns (latencies, statuses, seconds)."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, statuses = [], Counter()
+
+    async def one(i):
+        filename, content = corpus[(offset + i) % len(corpus)]
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.post("/recognize", files={"file": (filename, content, "image/jpeg")})
+                statuses[str(response.status_code)] += 1
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total_requests)))
+    return latencies, statuses, time.perf_counter() - started
+
+
+async def measure(base_url: str, corpus, args):
+    runs = []
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.request_timeout, limits=limits) as client:
+        await drive(client, corpus, max(args.concurrency), args.warmup)
+        offset = args.warmup
+        for concurrency in args.concurrency:
+            before = await scrape_stages(client)
+            latencies, statuses, seconds = await drive(client, corpus, concurrency, args.requests, offset)
+            after = await scrape_stages(client)
+            offset += args.requests
+
+            stages_ms = {}
+            for stage, (total, count) in sorted(after.items()):
+                total_before, count_before = before.get(stage, (0.0, 0))
+                if count > count_before:
+                    stages_ms[stage] = {
+                        "per_request": (total - total_before) * 1000 / args.requests,
+                        "per_call": (total - total_before) * 1000 / (count - count_before),
+                        "calls": count - count_before,
+                    }
+            runs.append({
+                "concurrency": concurrency,
+                "requests": args.requests,
+                "throughput_rps": args.requests / seconds,
+                "latency_ms": {
+                    "p50": _percentile(latencies, 50), "p95": _percentile(latencies, 95),
+                    "p99": _percentile(latencies, 99), "mean": sum(latencies) / len(latencies),
+                    "max": max(latencies),
+                },
+                "status_counts": dict(statuses),
+                "stages_ms": stages_ms,
+            })
+    return runs
+
+
+def print_runs(runs):
+    print(f"{'concurrency':>12}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}  statuses")
+    for run in runs:
+        latency = run["latency_ms"]
+        statuses = ", ".join(f"{status}: {count}" for status, count in sorted(run["status_counts"].items()))
+        print(f"{run['concurrency']:>12}{run['throughput_rps']:>9.1f}{latency['p50']:>9.1f}{latency['p95']:>9.1f}"
+              f"{latency['p99']:>9.1f}  {statuses}")
+
+    print("\nTime per request in each stage (ms; stages overlap, and inference includes queueing for a batch):")
+    stages = sorted({stage for run in runs for stage in run["stages_ms"]})
+    print(f"{'stage':<18}" + "".join(f"{'c=' + str(run['concurrency']):>10}" for run in runs))
+    for stage in stages:
+        print(f"{stage:<18}" + "".join(
+            f"{run['stages_ms'].get(stage, {}).get('per_request', 0.0):>10.1f}" for run in runs
+        ))
+
+
+def compare(runs, baseline_path: str, tolerance: float) -> bool:
+    """Prints the change against a baseline file; returns False if anything regressed beyond `tolerance`."""
+    with open(baseline_path, "r") as f:
+        baseline = {run["concurrency"]: run for run in json.load(f)["runs"]}
+    ok = True
+    print(f"\nAgainst {baseline_path} (tolerance {tolerance:.0%}):")
+    print(f"{'concurrency':>12}{'req/s':>12}{'p95 ms':>12}")
+    for run in runs:
+        old = baseline.get(run["concurrency"])
+        if old is None:
+            continue
+        throughput_change = run["throughput_rps"] / old["throughput_rps"] - 1
+        p95_change = run["latency_ms"]["p95"] / old["latency_ms"]["p95"] - 1
+        regressed = throughput_change < -tolerance or p95_change > tolerance
+        ok = ok and not regressed
+        print(f"{run['concurrency']:>12}{throughput_change:>+12.1%}{p95_change:>+12.1%}"
+              + ("  REGRESSION" if regressed else ""))
+    return ok
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_load_test(args) -> bool:
+    corpus = load_corpus(args.images, args.synthetic_images)
+    print(f"{len(corpus)} images, {args.requests} requests per level after {args.warmup} warm-up requests")
+
+    with tempfile.TemporaryDirectory() as tmp, \
+            StubServer({"/": gemini_generate_handler}, latency=args.gemini_ms / 1000) as gemini, \
+            StubServer({"/characters": jikan_characters_handler}, latency=args.image_api_ms / 1000) as jikan, \
+            StubServer({"/characters": mal_characters_handler}, latency=args.image_api_ms / 1000) as mal:
+        weights = args.weights
+        if not os.path.exists(weights):
+            weights = os.path.join(tmp, "load_test_weights.pth")
+            write_calibrated_weights(weights, corpus)
+
+        env = {
+            "MODEL_WEIGHTS_PATH": weights,
+            "GEMINI_API_ENDPOINT": gemini.base_url,
+            "JIKAN_API_BASE_URL": jikan.base_url,
+            "MAL_API_BASE_URL": mal.base_url,
+            "IMAGE_PROVIDERS": args.image_providers,
+            # The stand-ins have no rate limit; Jikan's client-side limiter would dominate otherwise
+            "JIKAN_RATE_LIMIT_PER_SECOND": "10000", "JIKAN_RATE_LIMIT_BURST": "10000",
+            # In-memory caches only, so every run starts from the same state
+            "GEMINI_CACHE_PATH": "", "IMAGE_URL_CACHE_PATH": "", "RESULT_CACHE_PATH": "",
+            "RESULT_CACHE_ENABLED": str(args.result_cache).lower(),
+            "PRECOMPUTED_ENRICHMENT_PATH": "",
+            "TRACING_ENABLED": "true",
+        }
+        with run_app(env, args.startup_timeout) as base_url:
+            runs = asyncio.run(measure(base_url, corpus, args))
+
+    print_runs(runs)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "commit": _git_commit(),
+                "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "config": vars(args),
+                "runs": runs,
+            }, f, indent=2)
+        print(f"\nResults written to '{args.output}'")
+    return compare(runs, args.baseline, args.tolerance) if args.baseline else True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per concurrency level.")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--images", help="Directory of sample images (searched recursively).")
+    parser.add_argument("--synthetic-images", type=int, default=32, help="Corpus size when --images isn't given.")
+    parser.add_argument("--weights", default="anime_character_model.pth")
+    parser.add_argument("--gemini-ms", type=float, default=800.0, help="Stand-in Gemini latency.")
+    parser.add_argument("--image-api-ms", type=float, default=150.0, help="Stand-in Jikan/MAL latency.")
+    parser.add_argument("--image-providers", default="jikan")
+    parser.add_argument("--result-cache", action="store_true",
+                        help="Keep the /recognize result cache on (repeated corpus images then become hits).")
+    parser.add_argument("--request-timeout", type=float, default=60.0)
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument("--baseline", help="Compare against an earlier --output file.")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args()
+
+    sys.exit(0 if run_load_test(args) else 1)
@@ -0,0 +1,131 @@
+"""
+Local stand-ins for the external APIs, used by the benchmarks so they never
+touch the real services or their rate limits.
+"""
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+# A route handler receives (path, query params, request body) and returns (status, JSON payload)
+RouteHandler = Callable[[str, Dict[str, list], bytes], Tuple[int, dict]]
+
+
+def jikan_characters_handler(path, query, body):
+    name = query.get("q", [""])[0]
+    return 200, {"data": [{"name": name, "images": {"jpg": {"image_url": f"https://stub.local/jikan/{name}.jpg"}}}]}
+
+
+def mal_characters_handler(path, query, body):
+    name = query.get("q", [""])[0]
+    return 200, {"data": [{"node": {"name": name, "main_picture": {"large": f"https://stub.local/mal/{name}.jpg"}}}]}
+
+
+def gemini_generate_handler(path, query, body):
+    """generateContent: plausible character details for the name quoted in the prompt."""
+    prompt = json.loads(body)["contents"][0]["parts"][0]["text"]
+    match = re.search(r'character named "([^"]+)"', prompt)
+    name = match.group(1) if match else "Unknown"
+    details = {
+        "name": name,
+        "about": f"{name} is a stand-in character used for load testing.",
+        "tags": ["black hair", "red eyes", "school uniform", "sword", "scarf"],
+        "anime_name": "Stub Anime",
+        "streaming_platforms": [{"name": "Crunchyroll", "url": "https://www.crunchyroll.com/stub"}],
+    }
+    text = json.dumps(details)
+    return 200, {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"},
+                                 "finishReason": "STOP", "index": 0}]}
+
+
+class StubServer:
+    """
+    A threaded HTTP server on 127.0.0.1 that answers GET/POST requests by path
+    prefix after an artificial delay.
+
+    `latency` may be a number of seconds or a callable returning one, which is
+    how the benchmarks inject tail latency.
+    """
+
+    def __init__(self, routes: Dict[str, RouteHandler], latency=0.0):
+        self.routes = routes
+        self.latency = latency
+        self.request_count = 0
+        # (arrived, answered) time.monotonic() pairs, for checking concurrency and request rates
+        self.request_times = []
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _delay(self) -> float:
+        return self.latency() if callable(self.latency) else self.latency
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real APIs
+
+            def _respond(self):
+                stub.request_count += 1
+                arrived = time.monotonic()
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                url = urlparse(self.path)
+
+                delay = stub._delay()
+                if delay > 0:
+                    time.sleep(delay)
+
+                for prefix, handler in stub.routes.items():
+                    if url.path.startswith(prefix):
+                        status, payload = handler(url.path, parse_qs(url.query), body)
+                        break
+                else:
+                    status, payload = 404, {"error": "no stub route"}
+
+                data = json.dumps(payload).encode("utf-8")
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                    stub.request_times.append((arrived, time.monotonic()))
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up (timeouts, cancelled hedged requests)
+                    self.close_connection = True
+
+            do_GET = _respond
+            do_POST = _respond
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "StubServer":
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,89 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import torch
+
+from app.services.embedding_index import build_ivf, normalize
+from app.services.model_backends import EagerBackend
+from app.services.model_bundle import ModelBundle
+from export_model import validation_loader
+
+# The training split created by train.py's split_dataset()
+TRAIN_DATASET_PATH = os.path.join('./processed_dataset', 'train')
+
+
+def extract_embeddings(backend: EagerBackend, dataset_path: str, class_names: dict, batch_size: int):
+    """Penultimate-layer embeddings of every image under `dataset_path`, with their class_names.json labels."""
+    loader = validation_loader(dataset_path, batch_size=batch_size, cfg=backend.default_cfg)
+    # ImageFolder numbers folders alphabetically; map them onto the model's own class indices
+    label_by_name = {name: int(idx) for idx, name in class_names.items()}
+    folder_labels = {}
+    for folder, folder_idx in loader.dataset.class_to_idx.items():
+        if folder not in label_by_name:
+            print(f"Warning: '{folder}' is not in class_names.json; its images are skipped.")
+            continue
+        folder_labels[folder_idx] = label_by_name[folder]
+
+    vectors, labels = [], []
+    for inputs, targets in loader:
+        keep = [i for i, target in enumerate(targets.tolist()) if target in folder_labels]
+        if not keep:
+            continue
+        _, embeddings = backend.forward_with_embeddings(inputs[keep])
+        vectors.append(embeddings.float().numpy())
+        labels.extend(folder_labels[targets[i].item()] for i in keep)
+    if not vectors:
+        raise SystemExit(f"No labelled images found under '{dataset_path}'.")
+    return np.concatenate(vectors), np.asarray(labels, dtype=np.int64)
+
+
+def class_centroids(vectors: np.ndarray, labels: np.ndarray):
+    """One unit-length mean embedding per class."""
+    classes = np.unique(labels)
+    sums = np.zeros((len(classes), vectors.shape[1]), dtype=np.float32)
+    np.add.at(sums, np.searchsorted(classes, labels), normalize(vectors))
+    return normalize(sums), classes
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Builds the embedding index used when SIMILARITY_MODE=embedding."
+    )
+    parser.add_argument("--weights", default="anime_character_model.pth")
+    parser.add_argument("--class-names", default="class_names.json")
+    parser.add_argument("--bundle", help="Embed with a model bundle (MODEL_BUNDLE_PATH) instead of --weights.")
+    parser.add_argument("--data-dir", default=TRAIN_DATASET_PATH, help="ImageFolder of gallery images.")
+    parser.add_argument("--output", default="embedding_index.npz")
+    parser.add_argument("--per-image", action="store_true",
+                        help="Keep one vector per image instead of one centroid per class.")
+    parser.add_argument("--ivf-lists", type=int, default=0,
+                        help="Also build an inverted file with this many lists for approximate search "
+                             "(worth it for galleries of tens of thousands of vectors).")
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    if args.bundle:
+        bundle = ModelBundle.load(args.bundle)
+        class_names = bundle.class_names
+        backend = EagerBackend(len(class_names), args.bundle, model_name=bundle.model_name,
+                               state_dict=bundle.state_dict)
+        backend.default_cfg = bundle.preprocess
+    else:
+        with open(args.class_names, "r") as f:
+            class_names = json.load(f)
+        backend = EagerBackend(len(class_names), args.weights)
+    torch.set_grad_enabled(False)
+    vectors, labels = extract_embeddings(backend, args.data_dir, class_names, args.batch_size)
+    if not args.per_image:
+        vectors, labels = class_centroids(vectors, labels)
+    vectors = normalize(vectors)
+
+    # The API only uses the index with the weights it was embedded with
+    arrays = {"vectors": vectors.astype(np.float32), "labels": labels, "backbone": backend.weights_id}
+    if args.ivf_lists:
+        arrays["ivf_centroids"], arrays["ivf_assignments"] = build_ivf(vectors, args.ivf_lists)
+    np.savez(args.output, **arrays)
+    print(f"Embedding index with {len(vectors)} vectors of {vectors.shape[1]} dims "
+          f"({len(np.unique(labels))} classes) saved to '{args.output}'")
@@ -0,0 +1,59 @@
+import argparse
+import json
+import time
+
+import timm
+import torch
+
+from app.services.model_backends import MODEL_NAME, preprocess_config
+from app.services.model_bundle import ModelBundle
+
+
+def build_bundle(weights_path: str, class_names_path: str, version: str, model_name: str = MODEL_NAME) -> ModelBundle:
+    """
+    Packs train.py's weights with the class_names.json they were trained
+    against and the preprocessing they expect. Fails if the class count does
+    not match the classifier, which deploying the two files separately would
+    only reveal at request time.
+    """
+    with open(class_names_path, "r") as f:
+        class_names = json.load(f)
+    model = timm.create_model(model_name, pretrained=False, num_classes=len(class_names))
+    try:
+        model.load_state_dict(torch.load(weights_path, map_location=torch.device('cpu')))
+    except RuntimeError as e:
+        raise SystemExit(f"'{weights_path}' does not fit {len(class_names)} classes from '{class_names_path}': {e}")
+    # Conv kernels stored channels_last, so SHARED_WEIGHTS can use the bundle's tensors in place
+    model = model.eval().to(memory_format=torch.channels_last)
+    state_dict = {name: tensor.detach().clone(memory_format=torch.preserve_format)
+                  for name, tensor in model.state_dict().items()}
+    cfg = preprocess_config(model_name)
+    preprocess = {"input_size": list(cfg["input_size"]), "mean": list(cfg["mean"]), "std": list(cfg["std"])}
+    return ModelBundle(version=version, model_name=model_name, class_names=class_names,
+                       preprocess=preprocess, state_dict=state_dict)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Packs the model weights, class names and preprocessing into one versioned, checksummed "
+                    "bundle for the MODEL_BUNDLE_PATH setting."
+    )
+    parser.add_argument("--weights", default="anime_character_model.pth")
+    parser.add_argument("--class-names", default="class_names.json")
+    parser.add_argument("--model-name", default=MODEL_NAME, help="timm architecture of the weights.")
+    parser.add_argument("--version", default=time.strftime("%Y%m%d-%H%M%S"),
+                        help="Version recorded in the bundle (default: the current time).")
+    parser.add_argument("--output", help="Default: models/anime_character-<version>.bundle")
+    parser.add_argument("--inspect", metavar="BUNDLE", help="Verify an existing bundle and print its metadata.")
+    args = parser.parse_args()
+
+    if args.inspect:
+        bundle = ModelBundle.load(args.inspect)
+        print(f"'{args.inspect}': version {bundle.version}, {bundle.model_name}, "
+              f"{len(bundle.class_names)} classes, input {bundle.preprocess['input_size']}, {bundle.checksum} (verified)")
+    else:
+        output = args.output or f"models/anime_character-{args.version}.bundle"
+        bundle = build_bundle(args.weights, args.class_names, args.version, args.model_name)
+        bundle.save(output)
+        print(f"Model bundle {bundle.version} ({len(bundle.class_names)} classes, {bundle.checksum}) "
+              f"saved to '{output}'")
@@ -0,0 +1,122 @@
+import argparse
+import json
+import os
+
+import timm
+import torch
+from torch.utils.data import DataLoader, Subset
+from torchvision import datasets, transforms
+
+from app.services.model_backends import MODEL_NAME, preprocess_config
+
+# The validation split created by train.py's split_dataset()
+VALIDATION_DATASET_PATH = os.path.join('./processed_dataset', 'val')
+
+
+def load_trained_model(weights_path: str, num_classes: int) -> torch.nn.Module:
+    model = timm.create_model(MODEL_NAME, pretrained=False, num_classes=num_classes)
+    model.load_state_dict(torch.load(weights_path, map_location=torch.device('cpu')))
+    return model.eval()
+
+
+def validation_loader(dataset_path: str, batch_size: int = 32, limit: int = 0, cfg: dict = None) -> DataLoader:
+    """The same preprocessing the API applies (`cfg`, by default the model's), over train.py's validation split."""
+    cfg = cfg or preprocess_config()
+    transform = transforms.Compose([
+        transforms.Resize(cfg['input_size'][1:]),
+        transforms.CenterCrop(cfg['input_size'][1:]),
+        transforms.ToTensor(),
+        transforms.Normalize(mean=cfg['mean'], std=cfg['std']),
+    ])
+    dataset = datasets.ImageFolder(dataset_path, transform)
+    if limit:
+        dataset = Subset(dataset, range(min(limit, len(dataset))))
+    return DataLoader(dataset, batch_size=batch_size, shuffle=False, num_workers=2)
+
+
+def export_torchscript(model: torch.nn.Module, example: torch.Tensor, output_path: str) -> None:
+    model = model.to(memory_format=torch.channels_last)
+    with torch.no_grad():
+        traced = torch.jit.trace(model, example.contiguous(memory_format=torch.channels_last))
+    torch.jit.save(torch.jit.freeze(traced), output_path)
+    print(f"TorchScript model saved to '{output_path}'")
+
+
+def export_onnx(model: torch.nn.Module, example: torch.Tensor, output_path: str) -> None:
+    # Needs the onnx package (requirements-onnx.txt)
+    torch.onnx.export(
+        model, example, output_path,
+        input_names=["image"], output_names=["logits"],
+        dynamic_axes={"image": {0: "batch"}, "logits": {0: "batch"}},
+        opset_version=17,
+        dynamo=False,
+    )
+    print(f"ONNX model saved to '{output_path}'")
+
+
+def export_shared_weights(model: torch.nn.Module, output_path: str) -> None:
+    """
+    The weights for SHARED_WEIGHTS: a state dict whose conv kernels are
+    already channels_last, so the API can memory-map it and use the tensors
+    in place instead of copying them into a new layout in every worker.
+    """
+    model = model.to(memory_format=torch.channels_last)
+    torch.save({name: tensor.detach().clone(memory_format=torch.preserve_format)
+                for name, tensor in model.state_dict().items()}, output_path)
+    print(f"Shared (memory-mappable) weights saved to '{output_path}'")
+
+
+def export_quantized(model: torch.nn.Module, example: torch.Tensor, output_path: str,
+                     calibration_loader: DataLoader, calibration_batches: int) -> None:
+    """
+    Static int8 post-training quantization (FX graph mode), calibrated on real
+    validation images so the activation ranges match what the API will see.
+    """
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+    torch.backends.quantized.engine = "x86"
+    prepared = prepare_fx(model, get_default_qconfig_mapping("x86"), example_inputs=(example,))
+    with torch.no_grad():
+        for i, (inputs, _) in enumerate(calibration_loader):
+            if i >= calibration_batches:
+                break
+            prepared(inputs)
+    quantized = convert_fx(prepared)
+
+    with torch.no_grad():
+        traced = torch.jit.trace(quantized, example)
+    torch.jit.save(torch.jit.freeze(traced), output_path)
+    print(f"int8 quantized model saved to '{output_path}'")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Exports the fine-tuned model to TorchScript, ONNX and (optionally) int8 TorchScript "
+                    "for the MODEL_BACKEND setting, plus memory-mappable weights for SHARED_WEIGHTS."
+    )
+    parser.add_argument("--weights", default="anime_character_model.pth")
+    parser.add_argument("--class-names", default="class_names.json")
+    parser.add_argument("--torchscript-output", default="anime_character_model.torchscript.pt")
+    parser.add_argument("--onnx-output", default="anime_character_model.onnx")
+    parser.add_argument("--shared-output", default="anime_character_model.shared.pt",
+                        help="Memory-mappable weights for the eager backend's SHARED_WEIGHTS mode.")
+    parser.add_argument("--quantize", action="store_true", help="Also produce an int8 quantized model.")
+    parser.add_argument("--quantized-output", default="anime_character_model.int8.pt")
+    parser.add_argument("--val-dir", default=VALIDATION_DATASET_PATH, help="Images used for int8 calibration.")
+    parser.add_argument("--calibration-batches", type=int, default=10)
+    args = parser.parse_args()
+
+    with open(args.class_names, "r") as f:
+        num_classes = len(json.load(f))
+
+    example = torch.randn(1, *preprocess_config()['input_size'])
+
+    # Each export gets a fresh copy, since tracing, memory-format changes and
+    # quantization all modify the module they are given
+    export_onnx(load_trained_model(args.weights, num_classes), example, args.onnx_output)
+    export_torchscript(load_trained_model(args.weights, num_classes), example, args.torchscript_output)
+    export_shared_weights(load_trained_model(args.weights, num_classes), args.shared_output)
+    if args.quantize:
+        export_quantized(load_trained_model(args.weights, num_classes), example, args.quantized_output,
+                         validation_loader(args.val_dir), args.calibration_batches)
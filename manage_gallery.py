@@ -0,0 +1,120 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import torch
+
+from app.services.gallery import Gallery
+from app.services.image_service import decode_image
+from app.services.model_backends import EagerBackend, preprocess_config
+from app.services.model_bundle import ModelBundle
+from app.services.model_service import build_transform
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp", ".gif")
+
+
+def image_paths(paths):
+    """The given image files, plus every image inside the given directories."""
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    yield os.path.join(path, name)
+        else:
+            yield path
+
+
+class Embedder:
+    """Embeds images exactly as the API does: same decode, preprocessing and backbone."""
+
+    def __init__(self, weights_path: str, class_names_path: str, batch_size: int, bundle_path: str = None):
+        if bundle_path:
+            bundle = ModelBundle.load(bundle_path)
+            self.backend = EagerBackend(len(bundle.class_names), bundle_path, model_name=bundle.model_name,
+                                        state_dict=bundle.state_dict)
+            self.transform = build_transform(bundle.preprocess)
+        else:
+            with open(class_names_path, "r") as f:
+                num_classes = len(json.load(f))
+            self.backend = EagerBackend(num_classes, weights_path)
+            self.transform = build_transform(preprocess_config())
+        # The same identity the API compares against the weights it serves, however they are deployed
+        self.backbone = self.backend.weights_id
+        self.batch_size = batch_size
+
+    def embed(self, paths) -> np.ndarray:
+        vectors = []
+        paths = list(paths)
+        for start in range(0, len(paths), self.batch_size):
+            tensors = []
+            for path in paths[start:start + self.batch_size]:
+                with open(path, "rb") as f:
+                    tensors.append(self.transform(decode_image(f.read(), self.transform.size)))
+            _, embeddings = self.backend.forward_with_embeddings(torch.stack(tensors))
+            vectors.append(embeddings.float().numpy())
+        return np.concatenate(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+
+
+def add(gallery: Gallery, embedder: Embedder, name: str, paths, replace: bool) -> Gallery:
+    paths = list(image_paths(paths))
+    if not paths:
+        raise SystemExit(f"No images given for '{name}'.")
+    if replace:
+        gallery = gallery.remove([name])
+    gallery = gallery.add(name, embedder.embed(paths), embedder.backbone)
+    print(f"Added {len(paths)} images of '{name}'.")
+    return gallery
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Adds, removes and lists the reference characters used when RECOGNITION_MODE=gallery. "
+                    "A running API picks up changes within GALLERY_RELOAD_SECONDS."
+    )
+    parser.add_argument("--gallery", default="gallery.npz")
+    parser.add_argument("--weights", default="anime_character_model.pth")
+    parser.add_argument("--class-names", default="class_names.json", help="Only used to size the classifier head.")
+    parser.add_argument("--bundle", help="Embed with a model bundle (MODEL_BUNDLE_PATH) instead of --weights.")
+    parser.add_argument("--batch-size", type=int, default=32)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add_parser = commands.add_parser("add", help="Add reference images of one character.")
+    add_parser.add_argument("name")
+    add_parser.add_argument("paths", nargs="+", help="Image files and/or directories of images.")
+    add_parser.add_argument("--replace", action="store_true", help="Drop the character's existing images first.")
+
+    import_parser = commands.add_parser("import", help="Add every character folder of an ImageFolder dataset.")
+    import_parser.add_argument("dataset_dir", help="e.g. processed_dataset/train")
+    import_parser.add_argument("--replace", action="store_true")
+
+    remove_parser = commands.add_parser("remove", help="Remove characters.")
+    remove_parser.add_argument("names", nargs="+")
+
+    commands.add_parser("list", help="List characters and their number of reference images.")
+    args = parser.parse_args()
+
+    gallery = Gallery.load(args.gallery) or Gallery.empty()
+    if args.command == "list":
+        for name, count in gallery.counts().items():
+            print(f"{count:>6}  {name}")
+        print(f"{len(gallery.characters)} characters, {len(gallery)} reference images.")
+        raise SystemExit(0)
+
+    if args.command == "remove":
+        missing = set(args.names) - set(gallery.counts())
+        if missing:
+            print(f"Not in the gallery: {', '.join(sorted(missing))}")
+        gallery = gallery.remove(args.names)
+    else:
+        embedder = Embedder(args.weights, args.class_names, args.batch_size, args.bundle)
+        if args.command == "add":
+            gallery = add(gallery, embedder, args.name, args.paths, args.replace)
+        else:
+            for name in sorted(os.listdir(args.dataset_dir)):
+                folder = os.path.join(args.dataset_dir, name)
+                if os.path.isdir(folder) and any(image_paths([folder])):
+                    gallery = add(gallery, embedder, name, [folder], args.replace)
+
+    gallery.save(args.gallery)
+    print(f"Gallery saved to '{args.gallery}': {len(gallery.characters)} characters, {len(gallery)} reference images.")
@@ -0,0 +1,102 @@
+import argparse
+import asyncio
+import json
+import time
+
+from app.core.config import settings
+from app.services import gemini_service, image_providers, similarity_service
+from app.services.precomputed_service import PrecomputedStore, write_artifact
+
+
+async def build_record(character_name: str, top_n: int) -> dict:
+    """Runs the full enrichment pipeline for one class, exactly as /recognize would."""
+    character_details = await gemini_service.get_character_details(character_name)
+    if "error" in character_details:
+        raise RuntimeError(character_details["error"])
+
+    similar_characters = similarity_service.find_similar_characters(
+        predicted_character_name=character_details.get("name"),
+        predicted_character_tags=character_details.get("tags", []),
+        top_n=top_n,
+    )
+
+    image_urls = await asyncio.gather(
+        image_providers.get_character_image_url(character_details.get("name", character_name)),
+        *(image_providers.get_character_image_url(char["name"]) for char in similar_characters),
+    )
+    character_details["image_url"] = image_urls[0]
+    for char, image_url in zip(similar_characters, image_urls[1:]):
+        char["image_url"] = image_url
+
+    return {
+        "name": character_name,
+        "prompt_version": gemini_service.PROMPT_VERSION,
+        "character_details": character_details,
+        "similar_characters": similar_characters,
+    }
+
+
+def is_fresh(record: dict, fetched_at: float, character_name: str, max_age_seconds: float) -> bool:
+    return (
+        record.get("name") == character_name
+        and record.get("prompt_version") == gemini_service.PROMPT_VERSION
+        and time.time() - fetched_at < max_age_seconds
+    )
+
+
+async def precompute(class_names_file: str, output_file: str, max_age_days: float, top_n: int,
+                     concurrency: int, force: bool):
+    with open(class_names_file, "r") as f:
+        class_names = {int(idx): name for idx, name in json.load(f).items()}
+
+    # Keep every existing entry that is still fresh; only stale or new classes are refetched
+    entries = {}
+    existing = PrecomputedStore(output_file)
+    if not force:
+        for class_idx, record, fetched_at in existing.items():
+            name = class_names.get(class_idx)
+            if name is not None and is_fresh(record, fetched_at, name, max_age_days * 24 * 3600):
+                entries[class_idx] = (record, fetched_at)
+    existing.close()
+
+    to_refresh = [idx for idx in sorted(class_names) if idx not in entries]
+    print(f"{len(class_names)} classes: {len(entries)} fresh, {len(to_refresh)} to refresh.")
+
+    # Gemini is only bounded by this semaphore; image lookups share the providers' rate limiters
+    semaphore = asyncio.Semaphore(concurrency)
+    failures = []
+
+    async def refresh(class_idx: int):
+        name = class_names[class_idx]
+        async with semaphore:
+            try:
+                entries[class_idx] = (await build_record(name, top_n), time.time())
+                print(f"  [{class_idx}] {name}: ok")
+            except Exception as e:
+                failures.append(name)
+                print(f"  [{class_idx}] {name}: failed ({e})")
+
+    await asyncio.gather(*(refresh(idx) for idx in to_refresh))
+    await image_providers.close()
+
+    write_artifact(output_file, entries)
+    print(f"Wrote {len(entries)} entries to '{output_file}'.")
+    if failures:
+        print(f"{len(failures)} classes failed and will be retried on the next run: {', '.join(failures)}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Precomputes Gemini details, similar characters and image URLs for every class "
+                    "in class_names.json, so /recognize can serve them with a single lookup."
+    )
+    parser.add_argument("--class-names", default="class_names.json")
+    parser.add_argument("--output", default=settings.PRECOMPUTED_ENRICHMENT_PATH or "precomputed_enrichment.bin")
+    parser.add_argument("--max-age-days", type=float, default=7.0, help="Refresh entries older than this.")
+    parser.add_argument("--top-n", type=int, default=3, help="Number of similar characters to store.")
+    parser.add_argument("--concurrency", type=int, default=2, help="Classes enriched at the same time.")
+    parser.add_argument("--force", action="store_true", help="Refresh every class, ignoring existing entries.")
+    args = parser.parse_args()
+
+    asyncio.run(precompute(args.class_names, args.output, args.max_age_days, args.top_n,
+                           args.concurrency, args.force))
@@ -0,0 +1,128 @@
+import argparse
+import json
+import os
+import random
+from multiprocessing import Pool
+
+import numpy as np
+from PIL import Image
+
+from app.services.image_service import decode_image
+
+# Layout of a sharded dataset directory:
+#   manifest.json   image size, class names and the shard files with their sample counts
+#   index.npz       per sample: label, split (0 = train, 1 = val) and source path
+#   shard-NNNNN.npy uint8 arrays of shape (count, size, size, 3), memory-mapped by train.py
+MANIFEST_FILE = "manifest.json"
+INDEX_FILE = "index.npz"
+SPLITS = {"train": 0, "val": 1}
+
+
+def load_manifest(shards_path: str):
+    """(manifest, index) of a directory written by this script."""
+    with open(os.path.join(shards_path, MANIFEST_FILE), "r") as f:
+        manifest = json.load(f)
+    with np.load(os.path.join(shards_path, INDEX_FILE)) as index:
+        return manifest, {key: index[key] for key in index.files}
+
+
+def list_samples(source_path: str, split_ratio: float, seed: int):
+    """
+    (path, label, split) for every image under `source_path`, one folder per
+    class. Classes are numbered alphabetically, like ImageFolder and
+    generate_class_names.py; each class is split into train/val on its own.
+    """
+    rng = random.Random(seed)
+    classes = sorted(d for d in os.listdir(source_path) if os.path.isdir(os.path.join(source_path, d)))
+    samples = []
+    for label, class_name in enumerate(classes):
+        class_path = os.path.join(source_path, class_name)
+        files = sorted(f for f in os.listdir(class_path) if os.path.isfile(os.path.join(class_path, f)))
+        rng.shuffle(files)
+        split_index = int(len(files) * (1 - split_ratio))
+        samples += [(os.path.join(class_name, f), label, SPLITS["train"] if i < split_index else SPLITS["val"])
+                    for i, f in enumerate(files)]
+    return classes, samples
+
+
+def load_sample(args):
+    """
+    Decodes one image, resizes its shorter side to `size` and center-crops a
+    square (shards need one shape). None if unreadable.
+    """
+    path, size = args
+    try:
+        with open(path, "rb") as f:
+            image = decode_image(f.read(), (size, size))
+    except (OSError, ValueError) as e:
+        print(f"Skipping '{path}': {e}")
+        return None
+    scale = size / min(image.size)
+    width, height = max(size, round(image.width * scale)), max(size, round(image.height * scale))
+    image = image.resize((width, height), Image.BILINEAR)
+    left, top = (width - size) // 2, (height - size) // 2
+    return np.asarray(image.crop((left, top, left + size, top + size)), dtype=np.uint8)
+
+
+def write_shards(source_path: str, output_path: str, size: int, samples_per_shard: int, split_ratio: float,
+                 seed: int, workers: int) -> None:
+    classes, samples = list_samples(source_path, split_ratio, seed)
+    if not samples:
+        raise SystemExit(f"No images found under '{source_path}'.")
+    os.makedirs(output_path, exist_ok=True)
+
+    shards, labels, splits, sources = [], [], [], []
+    with Pool(workers) as pool:
+        for start in range(0, len(samples), samples_per_shard):
+            chunk = samples[start:start + samples_per_shard]
+            arrays = pool.map(load_sample, [(os.path.join(source_path, path), size) for path, _, _ in chunk],
+                              chunksize=16)
+            kept = [(sample, array) for sample, array in zip(chunk, arrays) if array is not None]
+            if not kept:
+                continue
+
+            file_name = f"shard-{len(shards):05d}.npy"
+            shard = np.lib.format.open_memmap(
+                os.path.join(output_path, file_name), mode="w+", dtype=np.uint8, shape=(len(kept), size, size, 3)
+            )
+            for i, (_, array) in enumerate(kept):
+                shard[i] = array
+            shard.flush()
+            del shard
+            shards.append({"file": file_name, "count": len(kept)})
+            for (path, label, split), _ in kept:
+                sources.append(path)
+                labels.append(label)
+                splits.append(split)
+            print(f"Wrote {file_name} ({len(kept)} images, {start + len(chunk)}/{len(samples)} done)")
+
+    np.savez(os.path.join(output_path, INDEX_FILE), labels=np.asarray(labels, dtype=np.int64),
+             splits=np.asarray(splits, dtype=np.uint8), sources=np.asarray(sources))
+    with open(os.path.join(output_path, MANIFEST_FILE), "w") as f:
+        json.dump({
+            "image_size": size, "classes": classes, "shards": shards,
+            "validation_split": split_ratio, "seed": seed,
+        }, f, indent=2)
+    counts = np.bincount(splits, minlength=len(SPLITS))
+    print(f"{len(labels)} images of {len(classes)} classes in {len(shards)} shards "
+          f"({counts[SPLITS['train']]} train, {counts[SPLITS['val']]} val) saved to '{output_path}'")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Decodes and resizes the raw dataset once into memory-mappable uint8 shards for "
+                    "train.py --shards, with the train/val split recorded in an index instead of copied files."
+    )
+    parser.add_argument("--source", default="./dataset", help="One folder of images per class.")
+    parser.add_argument("--output", default="./sharded_dataset")
+    parser.add_argument("--image-size", type=int, default=256,
+                        help="Stored square size; train.py crops 224 from it (shorter side resized, then "
+                             "center-cropped, so the ends of the longer side are dropped).")
+    parser.add_argument("--samples-per-shard", type=int, default=2048)
+    parser.add_argument("--validation-split", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    write_shards(args.source, args.output, args.image_size, args.samples_per_shard, args.validation_split,
+                 args.seed, args.workers)
@@ -0,0 +1,5 @@
+import os
+
+# app.core.config builds its Settings at import time; the tests never reach the real services
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+os.environ.setdefault("MAL_CLIENT_ID", "test")
@@ -0,0 +1,60 @@
+"""
+A Gemini call that cannot connect gives up at its timeout, in the worker
+thread too, so a dead upstream cannot pile up threads retrying in the background.
+"""
+import asyncio
+import socket
+import sys
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.services import gemini_service
+
+TIMEOUT = 1.0
+
+
+@pytest.fixture
+def unreachable_gemini(monkeypatch):
+    """The gRPC client (whose SDK retries UNAVAILABLE by default) pointed at a closed local port."""
+    import google.generativeai as genai
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    genai.configure(api_key="test", transport="grpc", client_options={"api_endpoint": f"127.0.0.1:{port}"})
+    monkeypatch.setattr(gemini_service, "_model", genai.GenerativeModel("gemini-2.5-flash"))
+    monkeypatch.setattr(settings, "GEMINI_TIMEOUT_SECONDS", TIMEOUT)
+    monkeypatch.setattr(settings, "REQUEST_DEADLINE_SECONDS", 0)
+
+
+def _busy_gemini_threads():
+    """Gemini pool threads that are still inside an SDK call."""
+    frames = sys._current_frames()
+    busy = []
+    for thread_id, frame in frames.items():
+        stack = []
+        while frame is not None:
+            stack.append(frame.f_code.co_filename)
+            frame = frame.f_back
+        if any("generativeai" in name or "api_core" in name for name in stack):
+            busy.append(thread_id)
+    return busy
+
+
+def test_unreachable_gemini_frees_its_threads(unreachable_gemini):
+    async def fetch_all():
+        names = [f"Character {i}" for i in range(3)]
+        return await asyncio.gather(*(gemini_service._fetch_character_details(name) for name in names))
+
+    started = time.perf_counter()
+    results = asyncio.run(fetch_all())
+    assert all("error" in details for details in results)
+    assert time.perf_counter() - started < TIMEOUT + 2
+
+    # Every worker thread has returned shortly after the timeout, not kept retrying
+    deadline = time.perf_counter() + TIMEOUT + 2
+    while _busy_gemini_threads() and time.perf_counter() < deadline:
+        time.sleep(0.1)
+    assert _busy_gemini_threads() == []
@@ -0,0 +1,47 @@
+"""
+The Jikan lookups of one request run concurrently against the stub server,
+while the shared TokenBucket still caps how many reach it per second.
+"""
+import asyncio
+
+from app.core.config import Settings
+from app.services.jikan_service import JikanProvider
+from benchmarks.stub_servers import StubServer, jikan_characters_handler
+
+RATE = 5.0
+BURST = 2.0
+LATENCY = 0.3
+LOOKUPS = 8
+
+
+async def _lookups(base_url: str):
+    provider = JikanProvider(Settings(
+        JIKAN_API_BASE_URL=base_url, JIKAN_RATE_LIMIT_PER_SECOND=RATE, JIKAN_RATE_LIMIT_BURST=BURST,
+    ))
+    try:
+        return await asyncio.gather(*(provider.lookup(f"Character {i}") for i in range(LOOKUPS)))
+    finally:
+        await provider.close()
+
+
+def test_lookups_overlap_under_the_rate_limit():
+    with StubServer({"/characters": jikan_characters_handler}, latency=LATENCY) as stub:
+        urls = asyncio.run(_lookups(stub.base_url))
+        times = sorted(stub.request_times)
+
+    assert urls == [f"https://stub.local/jikan/Character {i}.jpg" for i in range(LOOKUPS)]
+    assert len(times) == LOOKUPS
+
+    # Requests overlap: some arrive while an earlier one is still being answered
+    assert any(arrived < times[i - 1][1] for i, (arrived, _) in enumerate(times) if i)
+    # ...and finish well before LOOKUPS serialized requests would
+    assert times[-1][1] - times[0][0] < LOOKUPS * LATENCY
+
+    # No more than the burst plus the refill ever reaches the server within a window
+    arrivals = [arrived for arrived, _ in times]
+    for i, start in enumerate(arrivals):
+        window = 1.0
+        in_window = sum(1 for arrived in arrivals[i:] if arrived - start < window)
+        assert in_window <= BURST + RATE * window + 1e-9
+    # The limiter spaces the requests after the burst out at 1 / RATE (less the first connections' setup time)
+    assert arrivals[-1] - arrivals[0] >= (LOOKUPS - BURST - 1) / RATE
@@ -1,13 +1,23 @@
+import argparse
 import os
+from contextlib import nullcontext
+import numpy as np
 import torch
+import torch.distributed as dist
 import torch.nn as nn
+import torch.nn.functional as F
 import torch.optim as optim
+from torch.nn.parallel import DistributedDataParallel
 from torchvision import datasets, transforms
-from torch.utils.data import DataLoader
+from torchvision.transforms import v2
+from torch.utils.data import DataLoader, Dataset, DistributedSampler
 import timm  
 from tqdm import tqdm
 import shutil
 import random
+import time
+
+from prepare_shards import SPLITS, load_manifest
 
 # --- 1. CONFIGURATION ---
 # IMPORTANT: Adjust these paths and parameters for your setup.
@@ -18,16 +28,36 @@ SOURCE_DATASET_PATH = './dataset'
 # Path where the script will create 'train' and 'val' subfolders
 PROCESSED_DATASET_PATH = './processed_dataset' 
 
+# Pre-decoded alternative to the two above, written by prepare_shards.py (use --shards)
+SHARDED_DATASET_PATH = './sharded_dataset'
+
 # Model Configuration
 MODEL_NAME = 'efficientnet_b0'
 NUM_EPOCHS = 10  # Start with 10-15 and increase if needed
 BATCH_SIZE = 32  # Adjust based on your GPU memory (16, 32, 64)
 LEARNING_RATE = 0.001
 VALIDATION_SPLIT = 0.2 # Use 20% of the data for validation
+NUM_WORKERS = 4  # DataLoader worker processes
+PREFETCH_FACTOR = 4  # Batches each worker prepares ahead (sharded dataset)
+
+NORMALIZE_MEAN = [0.485, 0.456, 0.406]
+NORMALIZE_STD = [0.229, 0.224, 0.225]
 
 # Output file for the trained model
 OUTPUT_MODEL_FILE = 'anime_character_model.pth'
 
+# Full training state after every epoch (for --resume) and the best weights so far
+CHECKPOINT_DIR = './checkpoints'
+LAST_CHECKPOINT_FILE = 'last.pth'
+BEST_WEIGHTS_FILE = 'best.pth'
+
+# Knowledge distillation (--distill): a much smaller student learns from the
+# fine-tuned model above, for the server's cascade mode (CASCADE_ENABLED)
+STUDENT_MODEL_NAME = 'mobilenetv3_small_100'
+STUDENT_OUTPUT_MODEL_FILE = 'anime_character_student.pth'
+DISTILL_TEMPERATURE = 4.0  # Softens the teacher's distribution so the student also learns its near-misses
+DISTILL_ALPHA = 0.7  # Weight of the teacher's soft targets against the true labels
+
 # --- 2. DATA PREPARATION ---
 
 def split_dataset(source_path, processed_path, split_ratio):
@@ -61,113 +91,448 @@ def split_dataset(source_path, processed_path, split_ratio):
             shutil.copy(os.path.join(class_path, f), os.path.join(processed_path, 'val', class_name, f))
     print("Dataset split complete.")
 
-# --- 3. MODEL TRAINING ---
+class ShardedImageDataset(Dataset):
+    """
+    One split ('train' or 'val') of a dataset written by prepare_shards.py.
 
-def train_model():
-    """Main function to run the model training and validation."""
-    
-    # Check for GPU availability
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    print(f"Using device: {device}")
+    Shards are memory-mapped copy-on-write, so every worker shares the same
+    page cache and a sample is a uint8 CHW tensor viewing the mapping; nothing
+    is decoded or copied until `transform` (which operates on tensors) and the
+    collate step. Scaling to float and normalizing happen per batch, in
+    normalize_batch(), so workers hand back 4x less data.
+    """
+
+    def __init__(self, shards_path, split, transform=None):
+        manifest, index = load_manifest(shards_path)
+        self.shards_path = shards_path
+        self.classes = manifest["classes"]
+        self.shard_files = [shard["file"] for shard in manifest["shards"]]
+        offsets = np.cumsum([0] + [shard["count"] for shard in manifest["shards"]])
+
+        samples = np.flatnonzero(index["splits"] == SPLITS[split])
+        self.targets = index["labels"][samples]
+        self._shard_ids = np.searchsorted(offsets, samples, side="right") - 1
+        self._positions = samples - offsets[self._shard_ids]
+        self.transform = transform
+        self._shards = {}  # Mapped lazily, so each worker process opens its own
 
-    # Data augmentation and normalization for training
-    # Just normalization for validation
-    data_transforms = {
+    def __len__(self):
+        return len(self.targets)
+
+    def __getstate__(self):
+        # Workers receive the dataset without any mappings the parent opened
+        return {**self.__dict__, "_shards": {}}
+
+    def _shard(self, shard_id):
+        if shard_id not in self._shards:
+            path = os.path.join(self.shards_path, self.shard_files[shard_id])
+            self._shards[shard_id] = np.load(path, mmap_mode="c")
+        return self._shards[shard_id]
+
+    def __getitem__(self, i):
+        image = torch.from_numpy(self._shard(self._shard_ids[i])[self._positions[i]]).permute(2, 0, 1)
+        if self.transform is not None:
+            image = self.transform(image)
+        return image, int(self.targets[i])
+
+
+def folder_transforms():
+    """Data augmentation and normalization for training, just normalization for validation."""
+    return {
         'train': transforms.Compose([
             transforms.RandomResizedCrop(224),
             transforms.RandomHorizontalFlip(),
             transforms.ToTensor(),
-            transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])
+            transforms.Normalize(NORMALIZE_MEAN, NORMALIZE_STD)
         ]),
         'val': transforms.Compose([
             transforms.Resize(256),
             transforms.CenterCrop(224),
             transforms.ToTensor(),
-            transforms.Normalize([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])
+            transforms.Normalize(NORMALIZE_MEAN, NORMALIZE_STD)
         ]),
     }
-    
+
+
+def shard_transforms():
+    """
+    The same augmentation on uint8 tensors. Shards already hold Resize(256) +
+    CenterCrop(256), so unlike folder_transforms() RandomResizedCrop samples
+    from that center square only: the ends of the longer side never appear in
+    training (validation matches the folders exactly).
+    """
+    return {
+        'train': v2.Compose([
+            v2.RandomResizedCrop(224, antialias=True),
+            v2.RandomHorizontalFlip(),
+        ]),
+        'val': v2.CenterCrop(224),
+    }
+
+
+def normalize_batch(inputs):
+    """Scales and normalizes a uint8 batch from ShardedImageDataset; float batches pass through."""
+    if inputs.dtype != torch.uint8:
+        return inputs
+    mean = torch.tensor(NORMALIZE_MEAN, device=inputs.device).view(1, 3, 1, 1) * 255
+    std = torch.tensor(NORMALIZE_STD, device=inputs.device).view(1, 3, 1, 1) * 255
+    return inputs.float().sub_(mean).div_(std)
+
+
+def build_datasets(shards_path=None, folders_path=PROCESSED_DATASET_PATH):
+    """The train and val datasets: split folders by default, or a sharded dataset directory."""
+    if shards_path:
+        return {x: ShardedImageDataset(shards_path, x, shard_transforms()[x]) for x in ['train', 'val']}
     # Load datasets using ImageFolder
-    image_datasets = {x: datasets.ImageFolder(os.path.join(PROCESSED_DATASET_PATH, x), data_transforms[x])
-                      for x in ['train', 'val']}
+    return {x: datasets.ImageFolder(os.path.join(folders_path, x), folder_transforms()[x])
+            for x in ['train', 'val']}
+
+
+def build_dataloader(dataset, shuffle, num_workers=NUM_WORKERS, pin_memory=False, sampler=None):
+    """Create data loaders to feed data in batches (from `sampler`'s indices when given)"""
+    if not isinstance(dataset, ShardedImageDataset):
+        return DataLoader(dataset, batch_size=BATCH_SIZE, shuffle=sampler is None, sampler=sampler,
+                          num_workers=num_workers)
+    # Workers stay alive between epochs (shard mappings included) and keep several batches queued
+    return DataLoader(
+        dataset, batch_size=BATCH_SIZE, shuffle=shuffle and sampler is None, sampler=sampler,
+        num_workers=num_workers, pin_memory=pin_memory,
+        persistent_workers=num_workers > 0, prefetch_factor=PREFETCH_FACTOR if num_workers > 0 else None,
+    )
+
+
+# --- 3. DISTRIBUTED TRAINING ---
+
+def setup_distributed(threads_per_process=0):
+    """
+    Joins the process group when launched by torchrun (which sets RANK,
+    WORLD_SIZE, MASTER_ADDR and MASTER_PORT) and returns (rank, world size);
+    a plain `python train.py` returns (0, 1). torchrun limits every process
+    to one thread, so each gets `threads_per_process` threads, by default an
+    equal share of this machine's cores.
+    """
+    world_size = int(os.environ.get("WORLD_SIZE", 1))
+    if world_size == 1:
+        return 0, 1
+    local_world_size = int(os.environ.get("LOCAL_WORLD_SIZE", world_size))
+    torch.set_num_threads(threads_per_process or max(1, (os.cpu_count() or 1) // local_world_size))
+    dist.init_process_group(backend="nccl" if torch.cuda.is_available() else "gloo")
+    return dist.get_rank(), world_size
+
+
+def is_main_process():
+    return not dist.is_initialized() or dist.get_rank() == 0
+
+
+def log(*args):
+    """print() on rank 0 only, so a distributed run doesn't repeat every line once per process."""
+    if is_main_process():
+        print(*args)
+
+# --- 4. MODEL TRAINING ---
+
+def rng_states():
+    """
+    The Python, NumPy, torch and CUDA RNG states of every process, in rank
+    order. A collective call under DDP: every rank must make it.
+    """
+    state = {
+        "python": random.getstate(),
+        "numpy": np.random.get_state(),
+        "torch": torch.get_rng_state(),
+        "cuda": torch.cuda.get_rng_state_all() if torch.cuda.is_available() else None,
+    }
+    if not dist.is_initialized():
+        return [state]
+    states = [None] * dist.get_world_size()
+    dist.all_gather_object(states, state)
+    return states
+
+
+def save_checkpoint(path, model, optimizer, epoch, best_val_accuracy, class_names, rng):
+    """Everything needed to resume after `epoch` epochs: weights, optimizer state and every rank's RNG states."""
+    checkpoint = {
+        "model": model.state_dict(),
+        "optimizer": optimizer.state_dict(),
+        "epoch": epoch,
+        "best_val_accuracy": best_val_accuracy,
+        "class_names": class_names,
+        "rng": rng,
+    }
+    # Written beside the target and renamed over it, so a crash mid-save keeps the previous checkpoint
+    torch.save(checkpoint, path + ".tmp")
+    os.replace(path + ".tmp", path)
+
+
+def load_checkpoint(path, model, optimizer, rank=0, world_size=1):
+    """
+    Restores a save_checkpoint() file, each rank getting back its own RNG
+    streams; returns (epochs completed, best validation accuracy).
+    """
+    # Our own file, and the RNG states need more than weights_only allows
+    checkpoint = torch.load(path, map_location="cpu", weights_only=False)
+    model.load_state_dict(checkpoint["model"])
+    optimizer.load_state_dict(checkpoint["optimizer"])
+    states = checkpoint["rng"]
+    if isinstance(states, dict):  # Written before every rank's state was saved
+        states = [states]
+    if len(states) != world_size:
+        # Saved with a different number of processes: fresh, distinct streams per rank, like a new run.
+        # Restoring one rank's state everywhere would give every rank the same augmentation and dropout.
+        random.seed()
+        np.random.seed()
+        torch.seed()
+    else:
+        state = states[rank]
+        random.setstate(state["python"])
+        np.random.set_state(state["numpy"])
+        torch.set_rng_state(state["torch"])
+        if state["cuda"] is not None and torch.cuda.is_available():
+            torch.cuda.set_rng_state_all(state["cuda"])
+    return checkpoint["epoch"], checkpoint["best_val_accuracy"]
+
+
+class DistillationLoss(nn.Module):
+    """
+    Hinton et al.'s distillation loss: KL divergence between the teacher's and
+    the student's temperature-softened distributions (scaled by T^2 so its
+    gradients keep their size), blended with cross-entropy on the true labels.
+    """
+
+    def __init__(self, temperature=DISTILL_TEMPERATURE, alpha=DISTILL_ALPHA):
+        super().__init__()
+        self.temperature = temperature
+        self.alpha = alpha
+
+    def forward(self, outputs, labels, teacher_outputs):
+        soft = F.kl_div(F.log_softmax(outputs.float() / self.temperature, dim=1),
+                        F.log_softmax(teacher_outputs.float() / self.temperature, dim=1),
+                        reduction='batchmean', log_target=True)
+        hard = F.cross_entropy(outputs, labels)
+        return self.alpha * self.temperature ** 2 * soft + (1 - self.alpha) * hard
+
+
+def run_epoch(model, loader, criterion, optimizer, phase, device, bf16=False, channels_last=False,
+              accumulation_steps=1, progress=True, teacher=None):
+    """
+    One pass over `loader`. Returns (loss, accuracy, images/sec), over all
+    processes in a distributed run.
+
+    Loss and correct predictions are summed on the device and only read back
+    once at the end, so steps don't wait on each other. When training, the
+    optimizer steps every `accumulation_steps` batches; under DDP, gradients
+    of the batches in between are accumulated without an all-reduce. With a
+    `teacher`, `criterion` also gets the teacher's logits for each batch.
+    """
+    training = phase == 'train'
+    model.train(training)
+    running_loss = torch.zeros((), device=device)
+    running_corrects = torch.zeros((), dtype=torch.long, device=device)
+    images = 0
+    started = time.perf_counter()
+    optimizer.zero_grad(set_to_none=True)
+
+    # Iterate over data with a progress bar
+    for step, (inputs, labels) in enumerate(tqdm(loader, desc=f"{phase.capitalize()}",
+                                                 disable=not (progress and is_main_process())), start=1):
+        inputs = normalize_batch(inputs.to(device, non_blocking=True))
+        labels = labels.to(device, non_blocking=True)
+        if channels_last:
+            inputs = inputs.contiguous(memory_format=torch.channels_last)
+        stepping = training and (step % accumulation_steps == 0 or step == len(loader))
+        skip_sync = training and not stepping and hasattr(model, "no_sync")
+
+        with model.no_sync() if skip_sync else nullcontext():
+            # Forward pass
+            with torch.set_grad_enabled(training), torch.autocast(device.type, dtype=torch.bfloat16, enabled=bf16):
+                outputs = model(inputs)
+                if teacher is None:
+                    loss = criterion(outputs, labels)
+                else:
+                    with torch.no_grad():
+                        teacher_outputs = teacher(inputs)
+                    loss = criterion(outputs, labels, teacher_outputs)
+
+            # Backward pass + optimize only if in training phase
+            if training:
+                (loss / accumulation_steps).backward()
+        if stepping:
+            optimizer.step()
+            optimizer.zero_grad(set_to_none=True)
+
+        # Statistics
+        running_loss += loss.detach().float() * inputs.size(0)
+        running_corrects += (outputs.argmax(dim=1) == labels).sum()
+        images += inputs.size(0)
+
+    seconds = time.perf_counter() - started
+    totals = torch.stack([running_loss.double(), running_corrects.double(),
+                          torch.tensor(images, dtype=torch.float64, device=device)])
+    if dist.is_initialized():
+        dist.all_reduce(totals)
+    loss_sum, corrects, images = totals.tolist()
+    return loss_sum / images, corrects / images, images / seconds
+
+
+def load_teacher(path, num_classes, device, channels_last=False):
+    """The fine-tuned MODEL_NAME weights at `path`, frozen for distillation."""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Teacher weights '{path}' not found. Train the full model first.")
+    teacher = timm.create_model(MODEL_NAME, pretrained=False, num_classes=num_classes)
+    teacher.load_state_dict(torch.load(path, map_location="cpu", weights_only=True))
+    teacher = teacher.to(device).eval().requires_grad_(False)
+    if channels_last:
+        teacher = teacher.to(memory_format=torch.channels_last)
+    return teacher
+
+
+def train_model(shards_path=None, num_workers=NUM_WORKERS, epochs=NUM_EPOCHS, bf16=False, channels_last=False,
+                compile_model=False, accumulation_steps=1, checkpoint_dir=CHECKPOINT_DIR, resume=False,
+                distill_from=None, student_model=STUDENT_MODEL_NAME, temperature=DISTILL_TEMPERATURE,
+                alpha=DISTILL_ALPHA):
+    """
+    Main function to run the model training and validation. With
+    `distill_from` (the full model's weights), trains `student_model` against
+    that teacher instead and writes STUDENT_OUTPUT_MODEL_FILE.
+    """
     
-    # Create data loaders to feed data in batches
-    dataloaders = {x: DataLoader(image_datasets[x], batch_size=BATCH_SIZE, shuffle=True, num_workers=4)
+    # Check for GPU availability
+    distributed = dist.is_initialized()
+    rank, world_size = (dist.get_rank(), dist.get_world_size()) if distributed else (0, 1)
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    if distributed and device.type == "cuda":
+        device = torch.device("cuda", int(os.environ.get("LOCAL_RANK", 0)))
+    log(f"Using device: {device}" + (f" x {world_size} processes" if distributed else ""))
+
+    image_datasets = build_datasets(shards_path)
+    # Each process trains on its own shard of every epoch; validation is split without padding so counts are exact
+    samplers = {'train': None, 'val': None}
+    if distributed:
+        samplers = {'train': DistributedSampler(image_datasets['train'], shuffle=True),
+                    'val': range(rank, len(image_datasets['val']), world_size)}
+    dataloaders = {x: build_dataloader(image_datasets[x], shuffle=(x == 'train'), num_workers=num_workers,
+                                       pin_memory=device.type == 'cuda', sampler=samplers[x])
                    for x in ['train', 'val']}
     
-    dataset_sizes = {x: len(image_datasets[x]) for x in ['train', 'val']}
     class_names = image_datasets['train'].classes
     num_classes = len(class_names)
-    print(f"Found {num_classes} classes: {', '.join(class_names[:5])}...")
+    log(f"Found {num_classes} classes: {', '.join(class_names[:5])}...")
+    log(f"Effective batch size: {BATCH_SIZE * world_size * accumulation_steps}")
+
+    model_name, output_file, teacher = MODEL_NAME, OUTPUT_MODEL_FILE, None
+    if distill_from:
+        model_name, output_file = student_model, STUDENT_OUTPUT_MODEL_FILE
+        teacher = load_teacher(distill_from, num_classes, device, channels_last)
+        # Kept apart so a student run never resumes from (or clobbers) the full model's checkpoints
+        checkpoint_dir = os.path.join(checkpoint_dir, 'student')
+        log(f"Distilling {MODEL_NAME} ('{distill_from}') into {model_name} (T={temperature}, alpha={alpha}).")
 
-    # Load the pre-trained model
-    model = timm.create_model(MODEL_NAME, pretrained=True, num_classes=num_classes)
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    last_checkpoint = os.path.join(checkpoint_dir, LAST_CHECKPOINT_FILE)
+    best_weights = os.path.join(checkpoint_dir, BEST_WEIGHTS_FILE)
+    resume = resume and os.path.exists(last_checkpoint)
+    if not resume and is_main_process() and os.path.exists(best_weights):
+        os.remove(best_weights)  # Left over from an earlier run
+
+    # Load the pre-trained model (a resumed run gets its weights from the checkpoint)
+    model = timm.create_model(model_name, pretrained=not resume, num_classes=num_classes)
     model = model.to(device)
+    if channels_last:
+        model = model.to(memory_format=torch.channels_last)
 
     # Define loss function and optimizer
-    criterion = nn.CrossEntropyLoss()
+    criterion = DistillationLoss(temperature, alpha) if teacher is not None else nn.CrossEntropyLoss()
     optimizer = optim.Adam(model.parameters(), lr=LEARNING_RATE)
 
     # --- Training Loop ---
-    best_val_accuracy = 0.0
+    start_epoch, best_val_accuracy = 0, 0.0
+    if resume:
+        start_epoch, best_val_accuracy = load_checkpoint(last_checkpoint, model, optimizer, rank, world_size)
+        log(f"Resuming after epoch {start_epoch} (best validation accuracy so far {best_val_accuracy:.4f}).")
+    # Wrapped and compiled after loading; checkpoints are taken from the original module so their keys stay plain
+    train_step_model = model
+    if distributed:
+        train_step_model = DistributedDataParallel(model, device_ids=[device.index] if device.type == "cuda" else None)
+    if compile_model:
+        train_step_model = torch.compile(train_step_model)
 
-    for epoch in range(NUM_EPOCHS):
-        print(f"\n--- Epoch {epoch + 1}/{NUM_EPOCHS} ---")
+    for epoch in range(start_epoch, epochs):
+        log(f"\n--- Epoch {epoch + 1}/{epochs} ---")
+        if samplers['train'] is not None:
+            samplers['train'].set_epoch(epoch)
         
         for phase in ['train', 'val']:
-            if phase == 'train':
-                model.train()  # Set model to training mode
-            else:
-                model.eval()   # Set model to evaluate mode
-
-            running_loss = 0.0
-            running_corrects = 0
-
-            # Iterate over data with a progress bar
-            for inputs, labels in tqdm(dataloaders[phase], desc=f"{phase.capitalize()}"):
-                inputs = inputs.to(device)
-                labels = labels.to(device)
-                
-                optimizer.zero_grad() # Clear gradients
-
-                # Forward pass
-                with torch.set_grad_enabled(phase == 'train'):
-                    outputs = model(inputs)
-                    _, preds = torch.max(outputs, 1)
-                    loss = criterion(outputs, labels)
-
-                    # Backward pass + optimize only if in training phase
-                    if phase == 'train':
-                        loss.backward()
-                        optimizer.step()
-
-                # Statistics
-                running_loss += loss.item() * inputs.size(0)
-                running_corrects += torch.sum(preds == labels.data)
-
-            epoch_loss = running_loss / dataset_sizes[phase]
-            epoch_acc = running_corrects.double() / dataset_sizes[phase]
-
-            print(f"{phase.capitalize()} Loss: {epoch_loss:.4f} Acc: {epoch_acc:.4f}")
+            epoch_loss, epoch_acc, images_per_second = run_epoch(
+                train_step_model, dataloaders[phase], criterion, optimizer, phase, device,
+                bf16=bf16, channels_last=channels_last, accumulation_steps=accumulation_steps, teacher=teacher,
+            )
+            log(f"{phase.capitalize()} Loss: {epoch_loss:.4f} Acc: {epoch_acc:.4f} "
+                f"({images_per_second:.1f} images/sec)")
 
             # Save the model if it has the best validation accuracy so far
+            # (metrics are already all-reduced, so every rank makes the same call; rank 0 writes)
             if phase == 'val' and epoch_acc > best_val_accuracy:
                 best_val_accuracy = epoch_acc
-                torch.save(model.state_dict(), f"best_model_temp.pth")
-                print(f"New best validation accuracy: {best_val_accuracy:.4f}. Model saved.")
+                if is_main_process():
+                    torch.save(model.state_dict(), best_weights)
+                log(f"New best validation accuracy: {best_val_accuracy:.4f}. Model saved.")
 
-    print("\nTraining complete.")
-    print(f"Best Validation Accuracy: {best_val_accuracy:.4f}")
+        # Gathered on every rank, so each can resume its own RNG streams; rank 0 writes
+        rng = rng_states()
+        if is_main_process():
+            save_checkpoint(last_checkpoint, model, optimizer, epoch + 1, best_val_accuracy, class_names, rng)
 
-    # Load the best model weights and save the final model
-    model.load_state_dict(torch.load("best_model_temp.pth"))
-    torch.save(model.state_dict(), OUTPUT_MODEL_FILE)
-    print(f"Best model saved to '{OUTPUT_MODEL_FILE}'")
-    os.remove("best_model_temp.pth") # Clean up temporary file
+    log("\nTraining complete.")
+    log(f"Best Validation Accuracy: {best_val_accuracy:.4f}")
+    if not is_main_process():
+        return
+
+    # Copy the best model weights to the final model file
+    if not os.path.exists(best_weights):
+        print("No epoch improved on the initial validation accuracy; nothing to save.")
+        return
+    shutil.copyfile(best_weights, output_file)
+    print(f"Best model saved to '{output_file}'")
 
 if __name__ == '__main__':
-    # Step 1: Split the raw dataset into train/val folders
-    split_dataset(SOURCE_DATASET_PATH, PROCESSED_DATASET_PATH, VALIDATION_SPLIT)
+    parser = argparse.ArgumentParser(description="Fine-tunes the character classifier.")
+    parser.add_argument("--shards", nargs="?", const=SHARDED_DATASET_PATH, default=None,
+                        help=f"Train from a prepare_shards.py directory (default {SHARDED_DATASET_PATH}) "
+                             f"instead of the split folders.")
+    parser.add_argument("--num-workers", type=int, default=NUM_WORKERS)
+    parser.add_argument("--epochs", type=int, default=NUM_EPOCHS)
+    parser.add_argument("--bf16", action="store_true", help="bfloat16 autocast (fast on CPUs with AVX-512 BF16/AMX).")
+    parser.add_argument("--channels-last", action="store_true", help="NHWC memory format for the model and inputs.")
+    parser.add_argument("--compile", action="store_true", help="torch.compile the model.")
+    parser.add_argument("--accumulation-steps", type=int, default=1,
+                        help="Batches per optimizer step; the effective batch is BATCH_SIZE times this.")
+    parser.add_argument("--checkpoint-dir", default=CHECKPOINT_DIR)
+    parser.add_argument("--resume", action="store_true", help="Continue from the last checkpoint in --checkpoint-dir.")
+    parser.add_argument("--threads-per-process", type=int, default=0,
+                        help="Under torchrun: torch threads per process (default: cores / processes on this node).")
+    parser.add_argument("--distill", action="store_true",
+                        help=f"Train a small student from the full model (writes {STUDENT_OUTPUT_MODEL_FILE}).")
+    parser.add_argument("--distill-from", default=OUTPUT_MODEL_FILE, help="Teacher weights for --distill.")
+    parser.add_argument("--student-model", default=STUDENT_MODEL_NAME, help="timm architecture of the student.")
+    parser.add_argument("--temperature", type=float, default=DISTILL_TEMPERATURE)
+    parser.add_argument("--alpha", type=float, default=DISTILL_ALPHA,
+                        help="Weight of the teacher's soft targets (the rest goes to the true labels).")
+    args = parser.parse_args()
+
+    # Under torchrun every process runs this script; only rank 0 prepares the data and writes files
+    rank, world_size = setup_distributed(args.threads_per_process)
+
+    # Step 1: Split the raw dataset into train/val folders (the sharded dataset records its own split)
+    if not args.shards and rank == 0:
+        split_dataset(SOURCE_DATASET_PATH, PROCESSED_DATASET_PATH, VALIDATION_SPLIT)
+    if world_size > 1:
+        dist.barrier()
     
     # Step 2: Run the training process
-    train_model()
\ No newline at end of file
+    train_model(args.shards, args.num_workers, epochs=args.epochs, bf16=args.bf16, channels_last=args.channels_last,
+                compile_model=args.compile, accumulation_steps=args.accumulation_steps,
+                checkpoint_dir=args.checkpoint_dir, resume=args.resume,
+                distill_from=args.distill_from if args.distill else None, student_model=args.student_model,
+                temperature=args.temperature, alpha=args.alpha)
+    if world_size > 1:
+        dist.destroy_process_group()
\ No newline at end of file